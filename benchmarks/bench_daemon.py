@@ -0,0 +1,75 @@
+"""
+Shell invocation benchmark: `capiscio <args>` exec'ing the core vs forwarded to the daemon.
+
+Each run starts a fresh interpreter (`python -m capiscio.cli`), as a
+pre-commit hook or Makefile would. "exec" sets CAPISCIO_NO_DAEMON=1;
+"daemon" forwards to `capiscio --wrapper-daemon`, which is started for the
+benchmark (and stopped afterwards) unless one is already running. The core
+binary must be cached or downloadable. Results are printed as JSON.
+
+Usage:
+    python benchmarks/bench_daemon.py [--runs 30] [--args validate card.json --schema-only]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+SRC = Path(__file__).resolve().parent.parent / "src"
+sys.path.insert(0, str(SRC))
+
+from capiscio import daemon  # noqa: E402
+
+
+def _time_series(env: dict, argv: list[str], runs: int) -> dict:
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(argv, env=env, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+                       stderr=subprocess.DEVNULL)
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return {
+        "mean_ms": round(statistics.fmean(samples), 1),
+        "p50_ms": round(samples[len(samples) // 2], 1),
+        "p99_ms": round(samples[min(len(samples) - 1, int(len(samples) * 0.99))], 1),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=30)
+    parser.add_argument("--args", nargs="*", default=["--version"], help="core arguments for each run")
+    opts = parser.parse_args()
+
+    env = dict(os.environ, PYTHONPATH=str(SRC))
+    env.pop(daemon.DISABLE_ENV, None)
+    cli = [sys.executable, "-m", "capiscio.cli"]
+    started = daemon.request({"command": "status"}) is None
+    if started:
+        subprocess.run(cli + ["--wrapper-daemon", "--detach"], env=env, check=True)
+    try:
+        results = {
+            "exec": _time_series(dict(env, **{daemon.DISABLE_ENV: "1"}), cli + opts.args, opts.runs),
+            "daemon": _time_series(env, cli + opts.args, opts.runs),
+        }
+    finally:
+        if started:
+            daemon.request({"command": "stop"})
+
+    json.dump({
+        "benchmark": "daemon",
+        "args": opts.args,
+        "python": sys.version.split()[0],
+        "runs": opts.runs,
+        "results": results,
+    }, sys.stdout, indent=2)
+    sys.stdout.write("\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""
+Binary download benchmark: the old iter_content loop vs the buffered fast path.
+
+Serves a payload of --size-mb from a local HTTP server (in a subprocess, so
+its CPU is not counted) and downloads it repeatedly with both copy loops,
+each driving a real rich progress bar rendered to /dev/null:
+
+  iter_content  8 KiB chunks, one f.write and one progress update per chunk
+  readinto      posix_fallocate + one reused 1 MiB buffer + throttled progress
+                (capiscio.manager._preallocate / _stream_to_file)
+
+Reports throughput (MB/s) and client CPU time per MB. Results are printed
+as JSON.
+
+Usage:
+    python benchmarks/bench_download.py [--size-mb 64] [--runs 5]
+"""
+import argparse
+import http.server
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+import requests  # noqa: E402
+from rich.console import Console  # noqa: E402
+from rich.progress import Progress, SpinnerColumn, TextColumn  # noqa: E402
+
+from capiscio.gateway import free_port  # noqa: E402
+from capiscio.manager import _preallocate, _stream_to_file  # noqa: E402
+
+
+def _serve(port: int, size: int) -> None:
+    block = os.urandom(1024 * 1024)
+
+    class Handler(http.server.BaseHTTPRequestHandler):
+        def do_GET(self):
+            self.send_response(200)
+            self.send_header("Content-Type", "application/octet-stream")
+            self.send_header("Content-Length", str(size))
+            self.end_headers()
+            remaining = size
+            while remaining:
+                chunk = block[:min(remaining, len(block))]
+                self.wfile.write(chunk)
+                remaining -= len(chunk)
+
+        def log_message(self, *args):
+            pass
+
+    http.server.ThreadingHTTPServer(("127.0.0.1", port), Handler).serve_forever()
+
+
+def _progress() -> Progress:
+    console = Console(file=open(os.devnull, "w"), force_terminal=True)
+    return Progress(SpinnerColumn(), TextColumn("[progress.description]{task.description}"),
+                    console=console, transient=True)
+
+
+def _iter_content(resp, path: Path) -> None:
+    total = int(resp.headers.get("content-length", 0))
+    with _progress() as progress:
+        task = progress.add_task("Downloading...", total=total)
+        with open(path, "wb") as f:
+            for chunk in resp.iter_content(chunk_size=8192):
+                f.write(chunk)
+                progress.update(task, advance=len(chunk))
+
+
+def _readinto(resp, path: Path) -> None:
+    total = int(resp.headers.get("content-length", 0))
+    with _progress() as progress:
+        task = progress.add_task("Downloading...", total=total)
+        resp.raw.decode_content = True
+        with open(path, "wb") as f:
+            _preallocate(f, total)
+            _stream_to_file(resp.raw, f, lambda done: progress.update(task, completed=done))
+            f.truncate()
+
+
+def _measure(copy, url: str, path: Path, size: int, runs: int) -> dict:
+    mbps, cpu_per_mb = [], []
+    for _ in range(runs):
+        path.unlink(missing_ok=True)
+        wall, cpu = time.perf_counter(), time.process_time()
+        with requests.get(url, stream=True, timeout=60) as resp:
+            resp.raise_for_status()
+            copy(resp, path)
+        wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+        assert path.stat().st_size == size
+        mbps.append(size / 2**20 / wall)
+        cpu_per_mb.append(cpu * 1000 / (size / 2**20))
+    return {
+        "mb_per_s": round(statistics.median(mbps), 1),
+        "cpu_ms_per_mb": round(statistics.median(cpu_per_mb), 3),
+    }
+
+
+def _wait_for_port(port: int, timeout: float = 10.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.5).close()
+            return
+        except OSError:
+            time.sleep(0.05)
+    raise RuntimeError(f"server did not start listening on :{port}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size-mb", type=int, default=64)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--serve", type=int, metavar="PORT", help=argparse.SUPPRESS)
+    opts = parser.parse_args()
+    size = opts.size_mb * 2**20
+
+    if opts.serve:
+        _serve(opts.serve, size)
+        return
+
+    port = free_port()
+    server = subprocess.Popen([sys.executable, __file__, "--serve", str(port), "--size-mb", str(opts.size_mb)])
+    try:
+        _wait_for_port(port)
+        url = f"http://127.0.0.1:{port}/capiscio"
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "capiscio"
+            results = {name: _measure(copy, url, path, size, opts.runs)
+                       for name, copy in (("iter_content", _iter_content), ("readinto", _readinto))}
+    finally:
+        server.kill()
+
+    json.dump({
+        "benchmark": "download",
+        "python": sys.version.split()[0],
+        "size_mb": opts.size_mb,
+        "runs": opts.runs,
+        "results": results,
+    }, sys.stdout, indent=2)
+    sys.stdout.write("\n")
+
+
+if __name__ == "__main__":
+    main()
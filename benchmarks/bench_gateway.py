@@ -0,0 +1,289 @@
+"""
+Gateway load test: throughput, tail latency and resource use of `capiscio gateway start`.
+
+Starts a stub upstream on a local port, launches the gateway in front of it
+(the cached core binary, or the wrapper's supervised mode with --workers),
+and drives it with an open-loop asyncio load generator: requests are
+scheduled at a fixed rate and latency is measured from the scheduled send
+time, so a stalled gateway shows up in the tail instead of silently lowering
+the offered load. Gateway RSS and CPU are sampled from /proc for the whole
+process tree. Results are printed as JSON.
+
+Usage:
+    python benchmarks/bench_gateway.py [--rate 2000] [--duration 10] [--connections 64]
+                                       [--payload 1024] [--badge] [--workers N]
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from capiscio.badges import BadgeSpec, issue_badge  # noqa: E402
+from capiscio.gateway import free_port  # noqa: E402
+from capiscio.manager import download_binary, resolve_core_version  # noqa: E402
+
+
+async def _serve_upstream(port: int, body: bytes) -> None:
+    """Stub agent: answers every request with a fixed JSON body, keep-alive."""
+    response = (b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\nContent-Length: "
+                + str(len(body)).encode() + b"\r\n\r\n" + body)
+
+    async def handle(reader, writer):
+        try:
+            while True:
+                length = 0
+                line = await reader.readline()
+                if not line:
+                    break
+                while (line := await reader.readline()) not in (b"\r\n", b""):
+                    name, _, value = line.partition(b":")
+                    if name.strip().lower() == b"content-length":
+                        length = int(value)
+                if length:
+                    await reader.readexactly(length)
+                writer.write(response)
+                await writer.drain()
+        except (OSError, asyncio.IncompleteReadError):
+            pass
+        writer.close()
+
+    server = await asyncio.start_server(handle, "127.0.0.1", port)
+    async with server:
+        await server.serve_forever()
+
+
+def _percentile(samples: list[float], q: float) -> float:
+    return round(samples[min(len(samples) - 1, int(len(samples) * q))], 3) if samples else float("nan")
+
+
+def _tree(pid: int) -> list[int]:
+    """pid and all its descendants (Linux /proc)."""
+    children: dict[int, list[int]] = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        children.setdefault(ppid, []).append(int(entry))
+    pids, stack = [], [pid]
+    while stack:
+        p = stack.pop()
+        pids.append(p)
+        stack.extend(children.get(p, []))
+    return pids
+
+
+def _usage(pids: list[int]) -> tuple[float, float]:
+    """(rss_mb, cpu_seconds) summed over pids."""
+    page, tick = os.sysconf("SC_PAGE_SIZE"), os.sysconf("SC_CLK_TCK")
+    rss = cpu = 0.0
+    for p in pids:
+        try:
+            with open(f"/proc/{p}/stat") as f:
+                fields = f.read().rsplit(")", 1)[1].split()
+            cpu += (int(fields[11]) + int(fields[12])) / tick
+            rss += int(fields[21]) * page / 2**20
+        except (OSError, IndexError, ValueError):
+            continue
+    return rss, cpu
+
+
+class _Sampler(threading.Thread):
+    def __init__(self, pid: int, interval: float = 0.25):
+        super().__init__(daemon=True)
+        self.pid = pid
+        self.interval = interval
+        self.peak_rss = 0.0
+        self.cpu = (0.0, 0.0)
+        self._done = threading.Event()
+
+    def run(self):
+        start = time.perf_counter()
+        _, cpu0 = _usage(_tree(self.pid))
+        while not self._done.wait(self.interval):
+            rss, cpu = _usage(_tree(self.pid))
+            self.peak_rss = max(self.peak_rss, rss)
+            self.cpu = (cpu - cpu0, time.perf_counter() - start)
+
+    def stop(self) -> dict:
+        self._done.set()
+        self.join()
+        cpu_seconds, wall = self.cpu
+        return {
+            "peak_rss_mb": round(self.peak_rss, 1),
+            "cpu_seconds": round(cpu_seconds, 2),
+            "cpu_percent": round(100 * cpu_seconds / wall, 1) if wall else 0.0,
+        }
+
+
+async def _request(reader, writer, request: bytes) -> bool:
+    writer.write(request)
+    await writer.drain()
+    status = await reader.readline()
+    length = 0
+    while (line := await reader.readline()) not in (b"\r\n", b""):
+        name, _, value = line.partition(b":")
+        if name.strip().lower() == b"content-length":
+            length = int(value)
+    if length:
+        await reader.readexactly(length)
+    return status.split(b" ", 2)[1:2] == [b"200"]
+
+
+async def _load(port: int, rate: float, duration: float, connections: int, request: bytes) -> dict:
+    pool: asyncio.Queue = asyncio.Queue()
+    for _ in range(connections):
+        pool.put_nowait(await asyncio.open_connection("127.0.0.1", port))
+    latencies, errors = [], 0
+    loop = asyncio.get_running_loop()
+
+    async def one(scheduled: float) -> None:
+        nonlocal errors
+        try:
+            conn = await asyncio.wait_for(pool.get(), 30)
+        except asyncio.TimeoutError:
+            errors += 1
+            return
+        try:
+            ok = await _request(*conn, request)
+        except (OSError, asyncio.IncompleteReadError, ValueError):
+            ok = False
+            conn[1].close()
+            try:
+                conn = await asyncio.open_connection("127.0.0.1", port)
+            except OSError:
+                conn = None
+        if conn is not None:
+            pool.put_nowait(conn)
+        if ok:
+            latencies.append((loop.time() - scheduled) * 1000)
+        else:
+            errors += 1
+
+    start = loop.time()
+    total = int(rate * duration)
+    tasks = []
+    for i in range(total):
+        scheduled = start + i / rate
+        delay = scheduled - loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.create_task(one(scheduled)))
+    await asyncio.gather(*tasks)
+    elapsed = loop.time() - start
+    while not pool.empty():
+        pool.get_nowait()[1].close()
+
+    latencies.sort()
+    return {
+        "requests": total,
+        "errors": errors,
+        "rps": round(len(latencies) / elapsed, 1),
+        "latency_ms": {
+            "p50": _percentile(latencies, 0.50),
+            "p99": _percentile(latencies, 0.99),
+            "p999": _percentile(latencies, 0.999),
+            "max": round(latencies[-1], 3) if latencies else float("nan"),
+        },
+    }
+
+
+def _wait_for_port(port: int, timeout: float = 15.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.5).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"gateway did not start listening on :{port}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rate", type=float, default=2000, help="offered load, requests/second")
+    parser.add_argument("--duration", type=float, default=10, help="seconds of load")
+    parser.add_argument("--connections", type=int, default=64, help="keep-alive connections")
+    parser.add_argument("--payload", type=int, default=1024, help="request body bytes (0 for GET)")
+    parser.add_argument("--response", type=int, default=256, help="upstream response body bytes")
+    parser.add_argument("--badge", action="store_true", help="send a self-signed badge with every request")
+    parser.add_argument("--workers", type=int, help="run the wrapper's supervised mode with N workers")
+    parser.add_argument("--gateway-args", nargs="*", default=[], help="extra core gateway flags")
+    parser.add_argument("--serve-upstream", type=int, metavar="PORT", help=argparse.SUPPRESS)
+    opts = parser.parse_args()
+
+    body = json.dumps({"pad": "x" * max(0, opts.response - 11)}).encode()
+    if opts.serve_upstream:
+        asyncio.run(_serve_upstream(opts.serve_upstream, body))
+        return
+
+    # The stub runs in its own process so it does not share a GIL with the load generator
+    upstream_port = free_port()
+    upstream = subprocess.Popen([sys.executable, __file__, "--serve-upstream", str(upstream_port),
+                                 "--response", str(opts.response)])
+    _wait_for_port(upstream_port)
+    target = f"http://127.0.0.1:{upstream_port}"
+
+    port = free_port()
+    binary = str(download_binary(resolve_core_version()))
+    gateway_args = ["--port", str(port), "--target", target] + opts.gateway_args
+    if opts.workers:
+        argv = [sys.executable, "-m", "capiscio.cli", "gateway", "start", "--workers", str(opts.workers)] + gateway_args
+    else:
+        argv = [binary, "gateway", "start"] + gateway_args
+    gateway = subprocess.Popen(argv, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                               env={**os.environ, "PYTHONPATH": str(Path(__file__).resolve().parent.parent / "src")})
+    try:
+        _wait_for_port(port)
+        headers = [f"Host: 127.0.0.1:{port}", "Connection: keep-alive"]
+        if opts.badge:
+            headers.append(f"X-Capiscio-Badge: {issue_badge(BadgeSpec(self_sign=True)).token}")
+        method = "POST" if opts.payload else "GET"
+        if opts.payload:
+            headers += ["Content-Type: application/json", f"Content-Length: {opts.payload}"]
+        request = (f"{method} / HTTP/1.1\r\n" + "\r\n".join(headers) + "\r\n\r\n").encode() + b"x" * opts.payload
+
+        sampler = _Sampler(gateway.pid)
+        sampler.start()
+        load = asyncio.run(_load(port, opts.rate, opts.duration, opts.connections, request))
+        resources = sampler.stop()
+    finally:
+        gateway.terminate()
+        try:
+            gateway.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            gateway.kill()
+        upstream.kill()
+
+    json.dump({
+        "benchmark": "gateway",
+        "core_version": resolve_core_version(),
+        "python": sys.version.split()[0],
+        "config": {
+            "rate": opts.rate,
+            "duration_s": opts.duration,
+            "connections": opts.connections,
+            "payload_bytes": opts.payload,
+            "response_bytes": opts.response,
+            "badge": opts.badge,
+            "workers": opts.workers or 1,
+        },
+        **load,
+        "gateway": resources,
+    }, sys.stdout, indent=2)
+    sys.stdout.write("\n")
+
+
+if __name__ == "__main__":
+    main()
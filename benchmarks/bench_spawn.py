@@ -0,0 +1,91 @@
+"""
+Spawn latency benchmark: capiscio.process (posix_spawn) vs subprocess.Popen.
+
+The parent inflates its RSS with a touched ballast buffer before each series,
+so the effect of parent heap size on launch latency is visible. Results are
+printed as JSON.
+
+Usage:
+    python benchmarks/bench_spawn.py [--rss-mb 0 512 2048] [--runs 50] [--binary /bin/true]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from capiscio import process  # noqa: E402
+
+
+def _rss_mb() -> float:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except OSError:
+        return float("nan")
+
+
+def _time_series(launch, runs: int) -> dict:
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        launch()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return {
+        "mean_ms": round(statistics.fmean(samples), 3),
+        "p50_ms": round(samples[len(samples) // 2], 3),
+        "p99_ms": round(samples[min(len(samples) - 1, int(len(samples) * 0.99))], 3),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rss-mb", type=int, nargs="+", default=[0, 512, 2048])
+    parser.add_argument("--runs", type=int, default=50)
+    parser.add_argument("--binary", default="/bin/true", help="executable to launch (e.g. the cached capiscio-core)")
+    parser.add_argument("--args", nargs="*", default=[], help="arguments for the executable")
+    opts = parser.parse_args()
+
+    argv = [opts.binary] + opts.args
+    ballast = []
+    results = []
+    for target in sorted(opts.rss_mb):
+        missing = target - sum(len(b) for b in ballast) // 2**20
+        if missing > 0:
+            chunk = bytearray(missing * 2**20)
+            chunk[::4096] = b"\x01" * len(chunk[::4096])  # touch every page so it is resident
+            ballast.append(chunk)
+
+        def popen():
+            subprocess.Popen(argv, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE,
+                             stderr=subprocess.PIPE).communicate()
+
+        def posix_spawn():
+            process.run(argv)
+
+        results.append({
+            "target_rss_mb": target,
+            "parent_rss_mb": round(_rss_mb(), 1),
+            "subprocess_popen": _time_series(popen, opts.runs),
+            "capiscio_process": _time_series(posix_spawn, opts.runs),
+        })
+
+    json.dump({
+        "benchmark": "spawn",
+        "binary": opts.binary,
+        "posix_spawn": process.HAVE_POSIX_SPAWN,
+        "python": sys.version.split()[0],
+        "runs": opts.runs,
+        "results": results,
+    }, sys.stdout, indent=2)
+    sys.stdout.write("\n")
+
+
+if __name__ == "__main__":
+    main()
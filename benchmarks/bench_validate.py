@@ -0,0 +1,144 @@
+"""
+Validation throughput benchmark over a synthetic corpus.
+
+Generates (or reuses) a seeded corpus from benchmarks/corpus.py and measures
+three modes:
+
+  single   one `capiscio validate <card>` process per card, sequentially
+  batch    capiscio.batch.run_batch over the whole corpus with --jobs workers
+  cached   the same batch run with the incremental index warm (no core runs)
+
+Each mode reports cards/second, per-card latency percentiles and peak RSS
+of the wrapper and of the core children. Results are printed as JSON.
+
+Usage:
+    python benchmarks/bench_validate.py [--count 500] [--seed 1] [--jobs 8]
+                                        [--corpus DIR] [--modes single batch cached]
+                                        [--args --schema-only]
+"""
+import argparse
+import json
+import resource
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import corpus  # noqa: E402
+from capiscio import batch  # noqa: E402
+from capiscio.limits import default_jobs  # noqa: E402
+from capiscio.manager import download_binary, resolve_core_version  # noqa: E402
+
+
+def _peak_rss_mb(who: int) -> float:
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    rss = resource.getrusage(who).ru_maxrss
+    return round(rss / (2**20 if sys.platform == "darwin" else 2**10), 1)
+
+
+def _summary(latencies: list[float], elapsed: float) -> dict:
+    latencies = sorted(latencies)
+
+    def pct(q: float) -> float:
+        return round(latencies[min(len(latencies) - 1, int(len(latencies) * q))], 3) if latencies else float("nan")
+
+    return {
+        "cards": len(latencies),
+        "seconds": round(elapsed, 3),
+        "cards_per_second": round(len(latencies) / elapsed, 1) if elapsed else float("nan"),
+        "latency_ms": {"p50": pct(0.5), "p90": pct(0.9), "p99": pct(0.99), "max": pct(1.0)},
+        "peak_rss_mb": {"wrapper": _peak_rss_mb(resource.RUSAGE_SELF),
+                        "core": _peak_rss_mb(resource.RUSAGE_CHILDREN)},
+    }
+
+
+def _timed_batch(cards: list[Path], core_args: list[str], jobs: int, index_path=None) -> tuple[list, list[float], float]:
+    """run_batch with per-card timing (validate_card is wrapped for the duration)."""
+    latencies = []
+    original = batch.validate_card
+
+    def timed(*args, **kwargs):
+        t0 = time.perf_counter()
+        try:
+            return original(*args, **kwargs)
+        finally:
+            latencies.append((time.perf_counter() - t0) * 1000)
+
+    batch.validate_card = timed
+    try:
+        start = time.perf_counter()
+        results = batch.run_batch([str(c) for c in cards], core_args, incremental=index_path is not None,
+                                  index_path=index_path, jobs=jobs)
+        elapsed = time.perf_counter() - start
+    finally:
+        batch.validate_card = original
+    if index_path is not None:
+        # Cards answered from the index never reach validate_card
+        latencies += [0.0] * sum(1 for r in results if r.cached)
+    return results, latencies, elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", type=Path, help="existing corpus directory (default: generate a temporary one)")
+    parser.add_argument("--count", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--skills", type=int, nargs=2, default=[1, 20], metavar=("MIN", "MAX"))
+    parser.add_argument("--description-bytes", type=int, default=200)
+    parser.add_argument("--invalid", type=float, default=0.2)
+    parser.add_argument("--jobs", type=int, default=default_jobs())
+    parser.add_argument("--modes", nargs="+", default=["single", "batch", "cached"],
+                        choices=["single", "batch", "cached"])
+    parser.add_argument("--args", nargs="*", default=["--schema-only"], help="core validate flags")
+    opts = parser.parse_args()
+
+    download_binary(resolve_core_version())
+    with tempfile.TemporaryDirectory(prefix="capiscio-bench-") as tmp:
+        root = opts.corpus or Path(tmp) / "corpus"
+        if opts.corpus is None:
+            corpus.generate(root, opts.count, opts.seed, tuple(opts.skills), opts.description_bytes, opts.invalid)
+        cards = sorted((root / "cards").glob("*.json"))
+        sizes = [c.stat().st_size for c in cards]
+
+        modes = {}
+        if "single" in opts.modes:
+            latencies = []
+            start = time.perf_counter()
+            for card in cards:
+                t0 = time.perf_counter()
+                batch.validate_card(str(card), opts.args)
+                latencies.append((time.perf_counter() - t0) * 1000)
+            modes["single"] = _summary(latencies, time.perf_counter() - start)
+        if "batch" in opts.modes:
+            _, latencies, elapsed = _timed_batch(cards, opts.args, opts.jobs)
+            modes["batch"] = _summary(latencies, elapsed)
+        if "cached" in opts.modes:
+            index_path = Path(tmp) / "index.json"
+            _timed_batch(cards, opts.args, opts.jobs, index_path)  # populate
+            _, latencies, elapsed = _timed_batch(cards, opts.args, opts.jobs, index_path)
+            modes["cached"] = _summary(latencies, elapsed)
+
+    json.dump({
+        "benchmark": "validate",
+        "core_version": resolve_core_version(),
+        "python": sys.version.split()[0],
+        "corpus": {
+            "path": str(opts.corpus) if opts.corpus else None,
+            "seed": opts.seed,
+            "cards": len(cards),
+            "invalid_fraction": opts.invalid,
+            "mean_bytes": round(sum(sizes) / len(sizes), 1) if sizes else 0,
+            "max_bytes": max(sizes, default=0),
+        },
+        "jobs": opts.jobs,
+        "core_args": opts.args,
+        "modes": modes,
+    }, sys.stdout, indent=2)
+    sys.stdout.write("\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""
+Deterministic synthetic A2A agent-card corpus.
+
+The same seed and options always produce byte-identical files, so a corpus
+can be regenerated anywhere instead of being checked in. Cards are written
+to <out>/cards/ and a manifest describing each card (expected validity,
+injected error, size, skill count) to <out>/manifest.json.
+
+Usage:
+    python benchmarks/corpus.py OUT [--count 1000] [--seed 1] [--skills 1 20]
+                                    [--description-bytes 200] [--invalid 0.2]
+                                    [--errors missing_name,bad_url,...]
+"""
+import argparse
+import json
+import random
+import string
+import sys
+from pathlib import Path
+
+# Each error kind maps a valid card (dict) to its invalid variant; "malformed"
+# and "empty" are produced at the byte level in render().
+ERRORS = {
+    "missing_name": lambda card, rng: card.pop("name"),
+    "missing_url": lambda card, rng: card.pop("url"),
+    "bad_url": lambda card, rng: card.__setitem__("url", "not a url"),
+    "bad_protocol_version": lambda card, rng: card.__setitem__("protocolVersion", rng.choice(["", "one", 3])),
+    "skills_not_list": lambda card, rng: card.__setitem__("skills", {"id": "x"}),
+    "missing_skill_id": lambda card, rng: card["skills"][0].pop("id") if card["skills"] else card.pop("skills"),
+    "wrong_types": lambda card, rng: card["capabilities"].__setitem__("streaming", "yes"),
+    "malformed": None,
+    "empty": None,
+}
+
+WORDS = ("agent", "billing", "search", "invoice", "travel", "weather", "ledger", "inventory",
+         "support", "routing", "summarise", "translate", "schedule", "report", "audit", "policy")
+
+
+def _text(rng: random.Random, size: int) -> str:
+    words = []
+    length = 0
+    while length < size:
+        word = rng.choice(WORDS)
+        words.append(word)
+        length += len(word) + 1
+    return " ".join(words)[:size]
+
+
+def _slug(rng: random.Random, n: int = 8) -> str:
+    return "".join(rng.choice(string.ascii_lowercase) for _ in range(n))
+
+
+def valid_card(rng: random.Random, index: int, skills: int, description_bytes: int) -> dict:
+    """A schema-valid A2A agent card."""
+    host = f"{_slug(rng)}-{index}.example.com"
+    return {
+        "protocolVersion": "1.3.0",
+        "version": f"1.{rng.randrange(10)}.{rng.randrange(10)}",
+        "name": f"{rng.choice(WORDS).title()} Agent {index}",
+        "description": _text(rng, description_bytes),
+        "url": f"https://{host}/a2a",
+        "capabilities": {"streaming": rng.random() < 0.5, "pushNotifications": rng.random() < 0.2},
+        "defaultInputModes": ["text/plain"],
+        "defaultOutputModes": ["text/plain", "application/json"],
+        "skills": [
+            {
+                "id": f"skill-{s}-{_slug(rng, 4)}",
+                "name": f"{rng.choice(WORDS).title()} {s}",
+                "description": _text(rng, max(16, description_bytes // 4)),
+                "tags": rng.sample(WORDS, 3),
+            }
+            for s in range(skills)
+        ],
+        "provider": {"organization": f"{rng.choice(WORDS).title()} Org", "url": f"https://{host}"},
+    }
+
+
+def render(card: dict, error: str, rng: random.Random) -> bytes:
+    """Serialise a card, applying byte-level errors."""
+    if error == "empty":
+        return b""
+    data = json.dumps(card, indent=2).encode()
+    if error == "malformed":
+        return data[: rng.randrange(1, max(2, len(data) - 1))]
+    return data
+
+
+def generate(
+    out: Path,
+    count: int = 1000,
+    seed: int = 1,
+    skills: tuple[int, int] = (1, 20),
+    description_bytes: int = 200,
+    invalid: float = 0.2,
+    errors: tuple[str, ...] = tuple(ERRORS),
+) -> list[dict]:
+    """Write the corpus under out and return its manifest entries."""
+    unknown = set(errors) - set(ERRORS)
+    if unknown:
+        raise ValueError(f"Unknown error kinds: {', '.join(sorted(unknown))}")
+    rng = random.Random(seed)
+    cards_dir = out / "cards"
+    cards_dir.mkdir(parents=True, exist_ok=True)
+    manifest = []
+    for index in range(count):
+        card = valid_card(rng, index, rng.randint(*skills), description_bytes)
+        error = rng.choice(errors) if errors and rng.random() < invalid else None
+        if error and ERRORS[error] is not None:
+            ERRORS[error](card, rng)
+        data = render(card, error, rng)
+        path = cards_dir / f"card-{index:06d}.json"
+        path.write_bytes(data)
+        manifest.append({
+            "path": str(path.relative_to(out)),
+            "valid": error is None,
+            "error": error,
+            "bytes": len(data),
+            "skills": len(card["skills"]) if isinstance(card.get("skills"), list) else 0,
+        })
+    with open(out / "manifest.json", "w", encoding="utf-8") as f:
+        json.dump({"seed": seed, "count": count, "cards": manifest}, f, indent=1)
+    return manifest
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("out", type=Path)
+    parser.add_argument("--count", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--skills", type=int, nargs=2, default=[1, 20], metavar=("MIN", "MAX"))
+    parser.add_argument("--description-bytes", type=int, default=200)
+    parser.add_argument("--invalid", type=float, default=0.2, help="fraction of invalid cards")
+    parser.add_argument("--errors", default=",".join(ERRORS), help="comma-separated error kinds to inject")
+    opts = parser.parse_args()
+
+    manifest = generate(opts.out, opts.count, opts.seed, tuple(opts.skills), opts.description_bytes,
+                        opts.invalid, tuple(e for e in opts.errors.split(",") if e))
+    invalid = sum(1 for entry in manifest if not entry["valid"])
+    print(f"Wrote {len(manifest)} cards ({invalid} invalid) to {opts.out / 'cards'}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
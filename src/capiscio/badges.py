@@ -0,0 +1,546 @@
+"""
+Badge verification and issuance for library callers.
+
+Services that check the same badge on every request would otherwise pay a
+core launch plus signature verification each time. verify_badge() runs
+`capiscio badge verify` once per distinct (token, options) and caches the
+outcome in an in-process LRU, optionally backed by a directory on disk.
+
+A successful verification is cached until the earlier of the token's `exp`
+claim and max_ttl (so revocations are picked up within max_ttl). Failures
+are cached for negative_ttl. Only a hash of the token is used as the key;
+tokens themselves are never written to disk.
+
+BadgePool keeps short-lived badges issued ahead of time so callers on a
+request path never wait for `capiscio badge issue`, and issue_many() issues
+large batches in input order with bounded memory.
+"""
+import sys
+import json
+import time
+import heapq
+import hashlib
+import logging
+import argparse
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, IO, Iterable, Iterator, Optional, Union
+
+from rich.console import Console
+
+from capiscio.files import write_json
+from capiscio.limits import default_jobs
+from capiscio.manager import download_binary, resolve_core_version, run_core_captured
+from capiscio.store import ResultStore
+from capiscio.trust import TrustKeyCache, decode_claims, default_trust_cache
+
+console = Console(stderr=True)
+logger = logging.getLogger(__name__)
+
+# Configuration
+CACHE_SIZE = 4096
+MAX_TTL = 300.0       # upper bound for caching a valid badge, in seconds
+NEGATIVE_TTL = 30.0   # how long an invalid badge stays cached
+DEFAULT_BADGE_LIFETIME = 600.0
+MIN_REMAINING = 1.0   # pooled badges this close to expiry are not handed out
+RETRY_MAX = 60.0
+
+
+@dataclass(frozen=True, slots=True)
+class BadgeVerification:
+    """Outcome of verifying one badge."""
+
+    valid: bool
+    claims: dict = field(default_factory=dict)
+    error: str = ""
+    cached: bool = False
+
+    @property
+    def expires_at(self) -> Optional[float]:
+        exp = self.claims.get("exp")
+        return float(exp) if isinstance(exp, (int, float)) else None
+
+
+def verify_options(accept_self_signed: bool = False, offline: bool = False,
+                   audience: Optional[str] = None) -> list[str]:
+    """Core flags for `badge verify`; also part of the cache key."""
+    options = []
+    if accept_self_signed:
+        options.append("--accept-self-signed")
+    if offline:
+        options.append("--offline")
+    if audience:
+        options += ["--audience", audience]
+    return options
+
+
+class VerificationCache:
+    """
+    LRU of badge verification outcomes, safe to share between threads.
+
+    With cache_dir set, entries are also written there (one small JSON file
+    per key) so separate processes and restarts share results.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = CACHE_SIZE,
+        max_ttl: float = MAX_TTL,
+        negative_ttl: float = NEGATIVE_TTL,
+        cache_dir: Optional[Path] = None,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.maxsize = maxsize
+        self.max_ttl = max_ttl
+        self.negative_ttl = negative_ttl
+        self.cache_dir = Path(cache_dir) if cache_dir is not None else None
+        if self.cache_dir is not None:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.clock = clock
+        self._entries: OrderedDict[str, tuple[float, BadgeVerification]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(token: str, options: list[str], core_version: Optional[str] = None) -> str:
+        """Cache key for a token and its verification options."""
+        core_version = core_version or resolve_core_version()
+        token_hash = hashlib.sha256(token.encode()).hexdigest()
+        return hashlib.sha256(json.dumps([token_hash, options, core_version]).encode()).hexdigest()[:32]
+
+    def expiry(self, result: BadgeVerification, now: float) -> float:
+        """When a freshly computed result stops being served from the cache."""
+        if not result.valid:
+            return now + self.negative_ttl
+        expires_at = result.expires_at
+        return now + self.max_ttl if expires_at is None else min(now + self.max_ttl, expires_at)
+
+    def get(self, key: str) -> Optional[BadgeVerification]:
+        now = self.clock()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._entries.move_to_end(key)
+                    return entry[1]
+                del self._entries[key]
+        if self.cache_dir is None:
+            return None
+        entry = self._read(key, now)
+        if entry is not None:
+            self._remember(key, *entry)
+            return entry[1]
+        return None
+
+    def put(self, key: str, result: BadgeVerification) -> None:
+        expires_at = self.expiry(result, self.clock())
+        result = BadgeVerification(result.valid, result.claims, result.error, cached=True)
+        self._remember(key, expires_at, result)
+        if self.cache_dir is not None:
+            self._write(key, expires_at, result)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+        if self.cache_dir is not None:
+            for path in self.cache_dir.glob("*.json"):
+                path.unlink(missing_ok=True)
+
+    def _remember(self, key: str, expires_at: float, result: BadgeVerification) -> None:
+        with self._lock:
+            self._entries[key] = (expires_at, result)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def _read(self, key: str, now: float) -> Optional[tuple[float, BadgeVerification]]:
+        path = self.cache_dir / f"{key}.json"
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            expires_at = float(data["expiresAt"])
+            result = BadgeVerification(bool(data["valid"]), data.get("claims", {}), data.get("error", ""), cached=True)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, KeyError, TypeError):
+            path.unlink(missing_ok=True)
+            return None
+        if expires_at <= now:
+            path.unlink(missing_ok=True)
+            return None
+        return expires_at, result
+
+    def _write(self, key: str, expires_at: float, result: BadgeVerification) -> None:
+        try:
+            write_json(self.cache_dir / f"{key}.json", {
+                "expiresAt": expires_at, "valid": result.valid, "claims": result.claims, "error": result.error,
+            })
+        except OSError as e:
+            logger.debug(f"Could not persist badge verification: {e}")
+
+
+_default_cache: Optional[VerificationCache] = None
+_default_cache_lock = threading.Lock()
+
+
+def default_cache() -> VerificationCache:
+    """The in-process verification cache used when none is passed."""
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = VerificationCache()
+        return _default_cache
+
+
+def verify_badge(
+    token: str,
+    accept_self_signed: bool = False,
+    offline: bool = False,
+    audience: Optional[str] = None,
+    cache: Optional[VerificationCache] = None,
+    use_cache: bool = True,
+    trust: Optional[TrustKeyCache] = None,
+    use_trust_cache: bool = True,
+    store: Optional[ResultStore] = None,
+) -> BadgeVerification:
+    """
+    Verify a badge with capiscio-core, serving repeat checks from the cache.
+
+    For online verification the issuer's signing key is taken from the
+    trust-key cache (see capiscio.trust) and handed to the core with
+    `--key ... --offline`, so no network request is made per verification.
+    Badges whose key cannot be resolved are verified online by the core.
+    Errors launching the core propagate and are never cached. With a store,
+    every outcome (cached or not) is also recorded as a kind="badge" row.
+    """
+    options = verify_options(accept_self_signed, offline, audience)
+    if use_cache:
+        cache = cache or default_cache()
+        key = cache.key(token, options)
+        hit = cache.get(key)
+        if hit is not None:
+            _store_verification(store, hit)
+            return hit
+
+    core_options = options
+    if not offline and use_trust_cache:
+        key_file = (trust or default_trust_cache()).key_file(token)
+        if key_file is not None:
+            core_options = options + ["--key", str(key_file), "--offline"]
+    proc = run_core_captured(["badge", "verify", token] + core_options)
+    if proc.returncode == 0:
+        result = BadgeVerification(True, decode_claims(token))
+    else:
+        result = BadgeVerification(False, decode_claims(token), (proc.stderr or proc.stdout).strip())
+    if use_cache:
+        cache.put(key, result)
+    _store_verification(store, result)
+    return result
+
+
+def _store_verification(store: Optional[ResultStore], result: BadgeVerification) -> None:
+    if store is None:
+        return
+    store.add(
+        agent=str(result.claims.get("sub") or result.claims.get("iss") or ""),
+        status="pass" if result.valid else "fail",
+        kind="badge",
+        error_count=0 if result.valid else 1,
+        detail=json.dumps([result.error]) if result.error else None,
+    )
+
+
+def parse_duration(value) -> float:
+    """Turn 600, '600', '45s', '10m', '2h' or '1d' into seconds."""
+    if isinstance(value, (int, float)):
+        return float(value)
+    units = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+    value = str(value).strip()
+    if value and value[-1] in units:
+        return float(value[:-1]) * units[value[-1]]
+    return float(value)
+
+
+@dataclass(frozen=True, slots=True)
+class BadgeSpec:
+    """Parameters for one `capiscio badge issue` call."""
+
+    domain: Optional[str] = None
+    audience: Optional[str] = None
+    exp: float = DEFAULT_BADGE_LIFETIME
+    key: Optional[str] = None
+    self_sign: bool = False
+
+    @classmethod
+    def from_dict(cls, data: dict, defaults: Optional["BadgeSpec"] = None) -> "BadgeSpec":
+        """Build a spec from a {"domain", "aud", "exp", "key", "selfSign"} record."""
+        defaults = defaults or cls()
+        exp = data.get("exp")
+        return cls(
+            domain=data.get("domain", defaults.domain),
+            audience=data.get("aud", data.get("audience", defaults.audience)),
+            exp=parse_duration(exp) if exp is not None else defaults.exp,
+            key=data.get("key", defaults.key),
+            self_sign=bool(data.get("selfSign", defaults.self_sign)),
+        )
+
+    def args(self) -> list[str]:
+        args = ["badge", "issue", "--exp", f"{int(self.exp)}s"]
+        if self.domain:
+            args += ["--domain", self.domain]
+        if self.audience:
+            args += ["--aud", self.audience]
+        if self.key:
+            args += ["--key", self.key]
+        if self.self_sign:
+            args.append("--self-sign")
+        return args
+
+
+@dataclass(frozen=True, slots=True)
+class Badge:
+    """An issued badge and its validity window."""
+
+    token: str
+    issued_at: float
+    expires_at: float
+
+    @property
+    def lifetime(self) -> float:
+        return self.expires_at - self.issued_at
+
+
+def issue_badge(spec: BadgeSpec, clock: Callable[[], float] = time.time) -> Badge:
+    """Issue one badge with capiscio-core; raises RuntimeError if the core fails."""
+    issued_at = clock()
+    proc = run_core_captured(spec.args())
+    lines = [line.strip() for line in proc.stdout.splitlines() if line.strip()]
+    if proc.returncode != 0 or not lines:
+        raise RuntimeError(f"badge issue failed ({proc.returncode}): {(proc.stderr or proc.stdout).strip()}")
+    token = lines[-1]
+    exp = decode_claims(token).get("exp")
+    expires_at = float(exp) if isinstance(exp, (int, float)) else issued_at + spec.exp
+    return Badge(token, issued_at, expires_at)
+
+
+class BadgePool:
+    """
+    Keeps `size` valid badges ready per (domain, audience).
+
+    A single scheduler thread re-issues each badge once it is refresh_at of
+    the way through its lifetime, on at most `workers` concurrent core runs,
+    so a wave of expiring badges queues instead of stampeding the core.
+    get() never issues on the caller's thread: it returns a ready badge,
+    round-robin, or waits for the first one of a new (domain, audience).
+    """
+
+    def __init__(
+        self,
+        size: int = 2,
+        exp: float = DEFAULT_BADGE_LIFETIME,
+        refresh_at: float = 0.7,
+        key: Optional[str] = None,
+        self_sign: bool = False,
+        workers: int = 2,
+        issue: Callable[[BadgeSpec], Badge] = issue_badge,
+        clock: Callable[[], float] = time.time,
+    ):
+        if not 0 < refresh_at < 1:
+            raise ValueError("refresh_at must be between 0 and 1")
+        self.size = max(1, size)
+        self.exp = exp
+        self.refresh_at = refresh_at
+        self.key = key
+        self.self_sign = self_sign
+        self.issue = issue
+        self.clock = clock
+        self._slots: dict[tuple, list[Optional[Badge]]] = {}
+        self._cursors: dict[tuple, int] = {}
+        self._errors: dict[tuple, str] = {}
+        self._queue: list[tuple[float, int, tuple, int, int]] = []  # (due, seq, group, slot, attempt)
+        self._seq = 0
+        self._cond = threading.Condition()
+        self._closed = False
+        self._pool = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="capiscio-badges")
+        self._thread = threading.Thread(target=self._schedule, name="capiscio-badge-pool", daemon=True)
+        self._thread.start()
+
+    def __enter__(self) -> "BadgePool":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def _push(self, due: float, group: tuple, slot: int, attempt: int = 0) -> None:
+        heapq.heappush(self._queue, (due, self._seq, group, slot, attempt))
+        self._seq += 1
+
+    def _ready(self, group: tuple, now: float) -> Optional[Badge]:
+        slots = self._slots[group]
+        start = self._cursors[group]
+        for i in range(self.size):
+            badge = slots[(start + i) % self.size]
+            if badge is not None and badge.expires_at > now + MIN_REMAINING:
+                self._cursors[group] = (start + i + 1) % self.size
+                return badge
+        return None
+
+    def get(self, domain: Optional[str] = None, audience: Optional[str] = None, timeout: float = 30.0) -> str:
+        """Return a valid badge token for (domain, audience)."""
+        group = (domain, audience)
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            if group not in self._slots:
+                self._slots[group] = [None] * self.size
+                self._cursors[group] = 0
+                now = self.clock()
+                for slot in range(self.size):
+                    self._push(now, group, slot)
+                self._cond.notify_all()
+            while True:
+                badge = self._ready(group, self.clock())
+                if badge is not None:
+                    return badge.token
+                remaining = deadline - time.monotonic()
+                if self._closed or remaining <= 0:
+                    error = self._errors.get(group, "timed out waiting for a badge")
+                    raise RuntimeError(f"No badge available for {group}: {error}")
+                self._cond.wait(remaining)
+
+    def _schedule(self) -> None:
+        with self._cond:
+            while not self._closed:
+                now = self.clock()
+                if not self._queue or self._queue[0][0] > now:
+                    wait = 1.0 if not self._queue else min(1.0, self._queue[0][0] - now)
+                    self._cond.wait(wait)
+                    continue
+                _, _, group, slot, attempt = heapq.heappop(self._queue)
+                self._pool.submit(self._refresh, group, slot, attempt)
+
+    def _refresh(self, group: tuple, slot: int, attempt: int) -> None:
+        spec = BadgeSpec(group[0], group[1], self.exp, self.key, self.self_sign)
+        try:
+            badge = self.issue(spec)
+        except Exception as e:
+            logger.warning(f"Badge refresh for {group} failed: {e}")
+            with self._cond:
+                self._errors[group] = str(e)
+                self._push(self.clock() + min(RETRY_MAX, 2 ** attempt), group, slot, attempt + 1)
+                self._cond.notify_all()
+            return
+        with self._cond:
+            self._slots[group][slot] = badge
+            self._errors.pop(group, None)
+            due = badge.issued_at + badge.lifetime * self.refresh_at
+            self._push(max(due, self.clock() + MIN_REMAINING), group, slot)
+            self._cond.notify_all()
+
+    def close(self) -> None:
+        """Stop refreshing; outstanding issuances finish in the background."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join()
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+def issue_many(
+    specs: Iterable[BadgeSpec],
+    jobs: Optional[int] = None,
+    issue: Callable[[BadgeSpec], Badge] = issue_badge,
+    return_exceptions: bool = False,
+) -> Iterator[Union[Badge, Exception]]:
+    """
+    Issue a badge per spec on `jobs` workers, yielding them in input order.
+
+    specs is consumed lazily and at most a few issuances per worker are in
+    flight, so memory stays flat however long the input is. With
+    return_exceptions=True a failed issuance yields its exception instead
+    of raising.
+    """
+    jobs = max(1, jobs or default_jobs())
+    window = jobs * 4
+    pending: deque = deque()
+    if issue is issue_badge:
+        download_binary(resolve_core_version())  # resolve once, not in every worker
+    with ThreadPoolExecutor(max_workers=jobs, thread_name_prefix="capiscio-issue") as pool:
+        def drain_one():
+            future = pending.popleft()
+            try:
+                return future.result()
+            except Exception as e:
+                if not return_exceptions:
+                    for rest in pending:
+                        rest.cancel()
+                    raise
+                return e
+
+        for spec in specs:
+            pending.append(pool.submit(issue, spec))
+            if len(pending) >= window:
+                yield drain_one()
+        while pending:
+            yield drain_one()
+
+
+def _read_specs(stream: IO[str], defaults: BadgeSpec) -> Iterator[BadgeSpec]:
+    for number, line in enumerate(stream, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield BadgeSpec.from_dict(json.loads(line), defaults)
+        except (ValueError, TypeError, AttributeError) as e:
+            raise ValueError(f"line {number}: invalid badge spec: {e}") from None
+
+
+def run_issue_cli(args: list[str]) -> int:
+    """Entry point for `capiscio badge issue --from-file <specs.ndjson> [options]`."""
+    parser = argparse.ArgumentParser(prog="capiscio badge issue",
+                                     description="Issue one badge per NDJSON spec line, in input order.")
+    parser.add_argument("--from-file", required=True, metavar="PATH",
+                        help='NDJSON specs: {"domain", "aud", "exp", "key"} per line ("-" for stdin)')
+    parser.add_argument("--output", metavar="PATH", help="write NDJSON results here instead of stdout")
+    parser.add_argument("--jobs", type=int, help="concurrent core runs (default: CPU count)")
+    parser.add_argument("--exp", default=f"{int(DEFAULT_BADGE_LIFETIME)}s", help="default lifetime, e.g. 10m")
+    parser.add_argument("--key", help="default signing key")
+    parser.add_argument("--self-sign", action="store_true", help="self-sign specs that name no key")
+    opts = parser.parse_args(args)
+
+    source: Optional[IO[str]] = None
+    out: Optional[IO[str]] = None
+    failed = 0
+    specs: deque = deque()  # only the in-flight window is retained
+
+    def tracked() -> Iterator[BadgeSpec]:
+        for spec in _read_specs(source, defaults):
+            specs.append(spec)
+            yield spec
+
+    try:
+        defaults = BadgeSpec(exp=parse_duration(opts.exp), key=opts.key, self_sign=opts.self_sign)
+        source = sys.stdin if opts.from_file == "-" else open(opts.from_file, "r", encoding="utf-8")
+        out = open(opts.output, "w", encoding="utf-8") if opts.output else sys.stdout
+        for index, outcome in enumerate(issue_many(tracked(), opts.jobs, return_exceptions=True)):
+            spec = specs.popleft()
+            record = {"index": index, "domain": spec.domain}
+            if isinstance(outcome, Exception):
+                failed += 1
+                record["error"] = str(outcome)
+            else:
+                record.update({"token": outcome.token, "expiresAt": outcome.expires_at})
+            out.write(json.dumps(record, separators=(",", ":")) + "\n")
+    except Exception as e:
+        console.print(f"[bold red]Error:[/bold red] {e}")
+        return 1
+    finally:
+        if source is not None and source is not sys.stdin:
+            source.close()
+        if out is not None and out is not sys.stdout:
+            out.close()
+    if failed:
+        console.print(f"[bold red]{failed} badge(s) failed[/bold red]")
+    return 1 if failed else 0
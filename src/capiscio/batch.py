@@ -0,0 +1,482 @@
+"""
+Batch validation of many agent cards with an optional incremental index.
+
+The index records (path, size, mtime_ns, sha256) for every card together with
+the last core result, keyed by the core version and the core flags in use.
+Unchanged cards reuse their stored result; only added or modified cards are
+sent to capiscio-core.
+"""
+import os
+import sys
+import json
+import hashlib
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, asdict
+from pathlib import Path
+from typing import Optional
+
+from rich.console import Console
+
+from capiscio.breaker import NetworkUnavailable
+from capiscio.fetch import CardCache
+from capiscio.files import write_json
+from capiscio.limits import default_jobs, record_core_rss
+from capiscio.manager import download_binary, get_state_dir, resolve_core_version, run_core_captured
+from capiscio.precheck import Rejection, check_file, render
+from capiscio.sharding import parse_shard, select
+from capiscio.store import ResultStore
+
+console = Console(stderr=True)
+logger = logging.getLogger(__name__)
+
+# Configuration
+INDEX_FORMAT = 2  # 2: entries keyed by resolved path
+INCREMENTAL_FLAG = "--incremental"
+SHARD_FLAG = "--shard"
+STORE_FLAG = "--store"
+LIVE_FLAGS = ("--test-live",)
+
+
+@dataclass
+class CardResult:
+    """Outcome of validating a single card, fresh or reused from the index."""
+
+    target: str
+    returncode: int
+    stdout: str
+    stderr: str
+    cached: bool = False
+    usage: Optional[dict] = None  # resources used by the core run; None when reused
+
+    def to_record(self) -> dict:
+        """Render as a JSON-serialisable batch record."""
+        record = {
+            "target": self.target,
+            "exitCode": self.returncode,
+            "cached": self.cached,
+        }
+        try:
+            record["result"] = json.loads(self.stdout) if self.stdout.strip() else None
+        except json.JSONDecodeError:
+            record["result"] = None
+            record["stdout"] = self.stdout
+        if self.stderr:
+            record["stderr"] = self.stderr
+        if self.usage is not None:
+            record["usage"] = self.usage
+        return record
+
+
+@dataclass
+class IndexEntry:
+    """Stored fingerprint and last result for one card."""
+
+    size: int
+    mtime_ns: int
+    digest: str
+    returncode: int
+    stdout: str
+    stderr: str
+
+
+def file_digest(path: Path) -> str:
+    """SHA-256 hex digest of a file's contents."""
+    sha256 = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(65536), b""):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+def default_index_path() -> Path:
+    """Index location for the current working directory (one per checkout)."""
+    key = hashlib.sha256(str(Path.cwd().resolve()).encode()).hexdigest()[:16]
+    return get_state_dir("index") / f"{key}.json"
+
+
+class ValidationIndex:
+    """
+    On-disk index of validated cards, keyed by resolved path so runs from
+    different working directories or with different target spellings share
+    entries.
+
+    The whole index is invalidated when the core version or the core flags
+    change, since either can change the outcome for an unchanged file.
+    """
+
+    def __init__(self, path: Path, core_version: str, core_args: list[str]):
+        self.path = path
+        self.core_version = core_version
+        self.core_args = list(core_args)
+        self.entries: dict[str, IndexEntry] = {}
+        self._dirty = False
+
+    def load(self) -> "ValidationIndex":
+        """Load entries from disk, discarding them if the header does not match."""
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return self
+        except (OSError, json.JSONDecodeError) as e:
+            logger.warning(f"Ignoring unreadable validation index {self.path}: {e}")
+            return self
+
+        if (
+            data.get("format") != INDEX_FORMAT
+            or data.get("coreVersion") != self.core_version
+            or data.get("coreArgs") != self.core_args
+        ):
+            logger.info("Validation index is stale (core version or flags changed); starting fresh")
+            self._dirty = True
+            return self
+
+        for key, raw in data.get("entries", {}).items():
+            try:
+                self.entries[key] = IndexEntry(**raw)
+            except TypeError:
+                self._dirty = True
+        return self
+
+    def lookup(self, path: Path) -> Optional[IndexEntry]:
+        """
+        Return the stored entry if the file is unchanged, else None.
+
+        A matching (size, mtime_ns) is trusted without reading the file. If
+        only the stat data changed, the content hash decides, and the entry's
+        stat data is refreshed so the next run takes the fast path again.
+        """
+        entry = self.entries.get(_index_key(path))
+        if entry is None:
+            return None
+        try:
+            st = path.stat()
+        except OSError:
+            return None
+        if st.st_size == entry.size and st.st_mtime_ns == entry.mtime_ns:
+            return entry
+        if st.st_size != entry.size:
+            return None
+        if file_digest(path) != entry.digest:
+            return None
+        entry.mtime_ns = st.st_mtime_ns
+        self._dirty = True
+        return entry
+
+    def record(self, path: Path, digest: str, st: os.stat_result, result: CardResult) -> None:
+        """Store the fingerprint and result for a freshly validated card."""
+        self.entries[_index_key(path)] = IndexEntry(
+            size=st.st_size,
+            mtime_ns=st.st_mtime_ns,
+            digest=digest,
+            returncode=result.returncode,
+            stdout=result.stdout,
+            stderr=result.stderr,
+        )
+        self._dirty = True
+
+    def prune(self, scanned: list[Path]) -> None:
+        """
+        Drop entries for files that no longer exist under the scanned paths.
+
+        Entries outside this run's targets are left alone, so validating a
+        subset of the tree does not forget the rest of it.
+        """
+        roots = [Path(_index_key(path)) for path in scanned]
+        stale = [
+            key for key in self.entries
+            if any(root == Path(key) or root in Path(key).parents for root in roots)
+            and not os.path.exists(key)
+        ]
+        for key in stale:
+            del self.entries[key]
+        if stale:
+            self._dirty = True
+
+    def save(self) -> None:
+        """Atomically write the index back to disk if anything changed."""
+        if not self._dirty:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        payload = {
+            "format": INDEX_FORMAT,
+            "coreVersion": self.core_version,
+            "coreArgs": self.core_args,
+            "entries": {key: asdict(entry) for key, entry in self.entries.items()},
+        }
+        write_json(self.path, payload)
+        self._dirty = False
+
+
+def _index_key(path: Path) -> str:
+    return str(path.resolve())
+
+
+def is_remote(target: str) -> bool:
+    """True for http(s) targets that cannot be fingerprinted locally."""
+    return target.startswith(("http://", "https://"))
+
+
+def split_args(args: list[str]) -> tuple[list[str], list[str]]:
+    """
+    Split validate arguments into (targets, core_flags).
+
+    Targets are positional arguments naming an existing file or directory, or
+    an http(s) URL. Flags, and the value following a `--flag` without `=`,
+    are forwarded to the core unchanged. Raises ValueError for any other
+    positional argument, and for one that looks like a card path
+    (`*.json` or containing a path separator) but does not exist, so a
+    mistyped path is reported instead of being passed to every core run.
+    """
+    targets: list[str] = []
+    core_flags: list[str] = []
+    previous = ""
+    for arg in args:
+        if arg.startswith("-"):
+            core_flags.append(arg)
+        elif is_remote(arg) or os.path.exists(arg):
+            targets.append(arg)
+        elif _looks_like_path(arg) or not (previous.startswith("-") and "=" not in previous):
+            raise ValueError(f"no such file or directory: {arg}")
+        else:
+            core_flags.append(arg)  # value of the preceding flag
+        previous = arg
+    return targets, core_flags
+
+
+def _looks_like_path(arg: str) -> bool:
+    return arg.endswith(".json") or "/" in arg or os.sep in arg
+
+
+def discover_cards(targets: list[str]) -> list[str]:
+    """Expand directories to the JSON files they contain, preserving order."""
+    cards: list[str] = []
+    seen: set[str] = set()
+    for target in targets:
+        if not is_remote(target) and os.path.isdir(target):
+            found = sorted(str(p) for p in Path(target).rglob("*.json") if p.is_file())
+        else:
+            found = [target]
+        for card in found:
+            if card not in seen:
+                seen.add(card)
+                cards.append(card)
+    return cards
+
+
+def validate_card(target: str, core_args: list[str], card_cache: Optional[CardCache] = None) -> CardResult:
+    """
+    Run core validation for one card.
+
+    Empty and non-JSON inputs are rejected in Python (see
+    capiscio.precheck) without a core launch.
+
+    Remote targets go through card_cache when given: the core validates the
+    cached file, and an unchanged card reuses its stored result. Live
+    endpoint tests need the real URL, so they always bypass the cache. A
+    card that cannot be fetched fails on its own, like a core rejection,
+    instead of aborting the batch.
+    """
+    if card_cache is not None and is_remote(target) and not any(flag in core_args for flag in LIVE_FLAGS):
+        try:
+            card = card_cache.fetch(target)
+        except (OSError, ValueError, NetworkUnavailable) as e:
+            # requests' exceptions are OSErrors; ValueError covers oversized bodies
+            rejection = Rejection("FETCH_FAILED", f"could not fetch agent card: {e}")
+            stdout, stderr = render(rejection, core_args, target)
+            return CardResult(target, 1, stdout, stderr)
+        stored = card_cache.get_result(card, resolve_core_version(), core_args)
+        if stored is not None:
+            return CardResult(target, stored["returncode"], stored["stdout"], stored["stderr"], cached=True)
+        rejected = _precheck(target, card.path, core_args)
+        if rejected is not None:
+            return rejected
+        proc = run_core_captured(["validate", str(card.path)] + core_args)
+        card_cache.put_result(card, resolve_core_version(), core_args, {
+            "returncode": proc.returncode, "stdout": proc.stdout, "stderr": proc.stderr,
+        })
+        return CardResult(target, proc.returncode, proc.stdout, proc.stderr, usage=_usage(proc))
+    if not is_remote(target):
+        rejected = _precheck(target, Path(target), core_args)
+        if rejected is not None:
+            return rejected
+    proc = run_core_captured(["validate", target] + core_args)
+    return CardResult(target, proc.returncode, proc.stdout, proc.stderr, usage=_usage(proc))
+
+
+def _precheck(target: str, path: Path, core_args: list[str]) -> Optional[CardResult]:
+    """A failed CardResult for inputs that cannot be cards, without launching the core."""
+    rejection = check_file(path)
+    if rejection is None:
+        return None
+    stdout, stderr = render(rejection, core_args, target)
+    return CardResult(target, 1, stdout, stderr)
+
+
+def _usage(proc) -> Optional[dict]:
+    usage = getattr(proc, "usage", None)
+    return usage.to_dict() if usage is not None else None
+
+
+def run_batch(
+    targets: list[str],
+    core_args: list[str],
+    incremental: bool = False,
+    index_path: Optional[Path] = None,
+    jobs: Optional[int] = None,
+    card_cache: Optional[CardCache] = None,
+    shard: Optional[tuple[int, int]] = None,
+    store: Optional[ResultStore] = None,
+) -> list[CardResult]:
+    """
+    Validate every card under targets and return results in input order.
+
+    With incremental=True, cards whose fingerprint matches the index reuse
+    their stored result and only added or modified cards reach the core.
+    Remote cards are fetched through card_cache when one is given. With
+    shard=(i, N), only the cards rendezvous-hashed to shard i are validated.
+    With a store, every result of the run (reused ones included) is recorded.
+    """
+    cards = discover_cards(targets)
+    if shard is not None:
+        cards = select(cards, shard)
+    index: Optional[ValidationIndex] = None
+    if incremental:
+        index = ValidationIndex(index_path or default_index_path(), resolve_core_version(), core_args).load()
+
+    results: dict[str, CardResult] = {}
+    pending: list[tuple[str, Optional[str], Optional[os.stat_result]]] = []
+    for card in cards:
+        if index is not None and not is_remote(card):
+            path = Path(card)
+            entry = index.lookup(path)
+            if entry is not None:
+                results[card] = CardResult(card, entry.returncode, entry.stdout, entry.stderr, cached=True)
+                continue
+            try:
+                st = path.stat()
+                pending.append((card, file_digest(path), st))
+            except OSError:
+                pending.append((card, None, None))
+        else:
+            pending.append((card, None, None))
+
+    if pending:
+        # Resolve the binary once so parallel workers never race on a first download
+        download_binary(resolve_core_version())
+        workers = max(1, min(jobs or default_jobs(), len(pending)))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            fresh = pool.map(lambda item: validate_card(item[0], core_args, card_cache), pending)
+            for (card, digest, st), result in zip(pending, fresh):
+                results[card] = result
+                if index is not None and digest is not None and st is not None:
+                    index.record(Path(card), digest, st, result)
+        peak = max((r.usage["maxRssKb"] for r in results.values() if r.usage and r.usage.get("maxRssKb")), default=0)
+        if peak:
+            record_core_rss(peak)
+
+    if index is not None:
+        index.prune([Path(target) for target in targets if not is_remote(target)])
+        try:
+            index.save()
+        except OSError as e:
+            logger.warning(f"Could not save validation index {index.path}: {e}")
+
+    ordered = [results[card] for card in cards]
+    if store is not None:
+        for result in ordered:
+            store.add_record(result.to_record())
+    return ordered
+
+
+def report(results: list[CardResult], json_output: bool) -> int:
+    """Print the combined outcome and return the batch exit code."""
+    failed = [r for r in results if r.returncode != 0]
+    if json_output:
+        for result in results:
+            sys.stdout.write(json.dumps(result.to_record(), separators=(",", ":")) + "\n")
+    else:
+        for result in results:
+            # Fresh results are always shown; reused ones only while still failing
+            if not result.cached or result.returncode != 0:
+                sys.stdout.write(result.stdout)
+                sys.stderr.write(result.stderr)
+        reused = sum(1 for r in results if r.cached)
+        status = "[red]FAILED[/red]" if failed else "[green]PASSED[/green]"
+        console.print(
+            f"{status} {len(results)} card(s): {len(results) - reused} validated, "
+            f"{reused} unchanged, {len(failed)} failed"
+        )
+    sys.stdout.flush()
+    return max((r.returncode for r in failed), default=0)
+
+
+def extract_shard(args: list[str]) -> tuple[Optional[tuple[int, int]], list[str]]:
+    """Remove `--shard i/N` (or `--shard=i/N`) from args and parse it."""
+    rest: list[str] = []
+    shard = None
+    i = 0
+    while i < len(args):
+        if args[i] == SHARD_FLAG and i + 1 < len(args):
+            shard = parse_shard(args[i + 1])
+            i += 2
+            continue
+        if args[i].startswith(SHARD_FLAG + "="):
+            shard = parse_shard(args[i].split("=", 1)[1])
+        else:
+            rest.append(args[i])
+        i += 1
+    return shard, rest
+
+
+def extract_store(args: list[str]) -> tuple[Optional[str], list[str]]:
+    """
+    Remove `--store` (default database) or `--store=DB` from args.
+
+    Returns the database path ("" for the default) or None when absent. A
+    separate value is not accepted since it would be ambiguous with a card path.
+    """
+    rest: list[str] = []
+    db = None
+    for arg in args:
+        if arg == STORE_FLAG:
+            db = ""
+        elif arg.startswith(STORE_FLAG + "="):
+            db = arg.split("=", 1)[1]
+        else:
+            rest.append(arg)
+    return db, rest
+
+
+def run_batch_cli(args: list[str]) -> int:
+    """Entry point for `capiscio validate [--incremental] [--shard i/N] [--store[=DB]] <paths...> [core flags]`."""
+    incremental = INCREMENTAL_FLAG in args
+    args = [a for a in args if a != INCREMENTAL_FLAG]
+    db, args = extract_store(args)
+    try:
+        shard, args = extract_shard(args)
+    except ValueError as e:
+        console.print(f"[bold red]Error:[/bold red] {e}")
+        return 1
+    try:
+        targets, core_args = split_args(args)
+    except ValueError as e:
+        console.print(f"[bold red]Error:[/bold red] {e}")
+        return 1
+    if not targets:
+        console.print("[bold red]Error:[/bold red] no agent card files or directories given")
+        return 1
+    store = None
+    try:
+        card_cache = CardCache() if any(is_remote(t) for t in targets) else None
+        store = ResultStore(Path(db) if db else None) if db is not None else None
+        results = run_batch(targets, core_args, incremental=incremental, card_cache=card_cache, shard=shard,
+                            store=store)
+    except Exception as e:
+        console.print(f"[bold red]Error:[/bold red] {e}")
+        return 1
+    finally:
+        if store is not None:
+            store.close()
+    return report(results, json_output="--json" in core_args)
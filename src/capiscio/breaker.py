@@ -0,0 +1,135 @@
+"""
+Offline mode and a per-host network circuit breaker.
+
+With CAPISCIO_OFFLINE=1 the wrapper never opens a network connection. In
+addition, a connection failure or timeout against a host opens that host's
+breaker: the state is kept in the cache dir, so every later run (in any
+process) fails within milliseconds instead of waiting out the same timeout.
+After a cooldown one run is let through as a half-open probe; its success
+closes the breaker, its failure re-opens it for another cooldown.
+"""
+import os
+import json
+import time
+import hashlib
+import logging
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Iterator, Optional
+from urllib.parse import urlsplit
+
+import requests
+
+from capiscio.files import write_json
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+OFFLINE_ENV = "CAPISCIO_OFFLINE"
+COOLDOWN_ENV = "CAPISCIO_BREAKER_COOLDOWN"
+DEFAULT_COOLDOWN = 300.0
+PROBE_WINDOW = 90.0  # while a probe is in flight, other runs keep failing fast
+
+# Only failures to reach the host trip the breaker; HTTP errors do not
+NETWORK_ERRORS = (requests.exceptions.ConnectionError, requests.exceptions.Timeout)
+
+
+class NetworkUnavailable(RuntimeError):
+    """Raised instead of attempting a connection that is known (or configured) to fail."""
+
+
+def is_offline() -> bool:
+    return os.environ.get(OFFLINE_ENV, "").lower() in ("1", "true", "yes")
+
+
+def origin(url: str) -> str:
+    """The breaker key for url: scheme://host:port, so other services on the host are unaffected."""
+    parts = urlsplit(url)
+    port = parts.port or {"http": 80, "https": 443}.get(parts.scheme)
+    return f"{parts.scheme}://{parts.hostname}:{port}" if parts.hostname else url
+
+
+def default_state_dir() -> Path:
+    from capiscio.manager import get_state_dir
+    return get_state_dir("breaker")
+
+
+class CircuitBreaker:
+    """Per-origin connection-failure breaker persisted as small JSON files."""
+
+    def __init__(
+        self,
+        state_dir: Optional[Path] = None,
+        cooldown: Optional[float] = None,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.state_dir = Path(state_dir) if state_dir is not None else default_state_dir()
+        if cooldown is None:
+            try:
+                cooldown = float(os.environ.get(COOLDOWN_ENV) or DEFAULT_COOLDOWN)
+            except ValueError:
+                cooldown = DEFAULT_COOLDOWN
+        self.cooldown = cooldown
+        self.clock = clock
+
+    def _path(self, host: str) -> Path:
+        return self.state_dir / f"{hashlib.sha256(host.encode()).hexdigest()[:16]}.json"
+
+    def _read(self, host: str) -> dict:
+        try:
+            with open(self._path(host), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write(self, host: str, state: dict) -> None:
+        try:
+            self.state_dir.mkdir(parents=True, exist_ok=True)
+            write_json(self._path(host), state)
+        except OSError as e:
+            logger.debug(f"Could not persist breaker state for {host}: {e}")
+
+    def check(self, host: str) -> None:
+        """Raise NetworkUnavailable if host must not be contacted right now."""
+        if is_offline():
+            raise NetworkUnavailable(f"{OFFLINE_ENV} is set; not contacting {host}")
+        state = self._read(host)
+        opened_at = state.get("openedAt")
+        if opened_at is None:
+            return
+        now = self.clock()
+        retry_at = opened_at + self.cooldown
+        if now < retry_at or now < state.get("probeAt", 0) + PROBE_WINDOW:
+            raise NetworkUnavailable(
+                f"{host} was unreachable {now - opened_at:.0f}s ago ({state.get('error', 'connection failed')}); "
+                f"not retrying for another {max(retry_at, state.get('probeAt', 0) + PROBE_WINDOW) - now:.0f}s"
+            )
+        # Half-open: this run is the probe
+        state["probeAt"] = now
+        self._write(host, state)
+
+    def success(self, host: str) -> None:
+        try:
+            self._path(host).unlink()
+        except FileNotFoundError:
+            pass
+
+    def failure(self, host: str, error: Exception) -> None:
+        state = self._read(host)
+        self._write(host, {
+            "host": host,
+            "openedAt": self.clock(),
+            "failures": state.get("failures", 0) + 1,
+            "error": f"{type(error).__name__}: {error}"[:300],
+        })
+
+    @contextmanager
+    def guard(self, host: str) -> Iterator[None]:
+        """Check the breaker, then record the outcome of the network calls in the block."""
+        self.check(host)
+        try:
+            yield
+        except NETWORK_ERRORS as e:
+            self.failure(host, e)
+            raise
+        self.success(host)
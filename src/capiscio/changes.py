@@ -0,0 +1,160 @@
+"""
+Change-only reporting for repeated monitoring runs.
+
+Each agent's last result is reduced to a compact fingerprint (status, trust
+level, and a hash of the issue set). A new result is emitted only when its
+fingerprint differs from the previous one, tagged with the kind of
+transition. A full snapshot of all fingerprints is emitted periodically so
+downstream consumers can resynchronise, and the fingerprints are persisted
+so a restarted monitor does not re-announce every agent.
+"""
+import json
+import time
+import hashlib
+import logging
+import threading
+from dataclasses import dataclass, asdict
+from pathlib import Path
+from typing import Callable, Optional
+
+from capiscio.files import write_json
+from capiscio.results import ValidationResult
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+DEFAULT_SNAPSHOT_INTERVAL = 3600.0
+
+NEW = "new"
+FAILURE = "failure"
+RECOVERY = "recovery"
+TRUST_CHANGED = "trust_changed"
+ISSUES_CHANGED = "issues_changed"
+
+
+@dataclass(frozen=True, slots=True)
+class Fingerprint:
+    """The parts of a result whose change is worth reporting."""
+
+    success: bool
+    trust_level: Optional[int]
+    issues: str
+
+    @classmethod
+    def of(cls, result: ValidationResult) -> "Fingerprint":
+        digest = hashlib.blake2b(digest_size=8)
+        for issue in sorted((i.severity, i.code or "", i.field or "", i.message) for i in result.issues):
+            digest.update("\x1f".join(issue).encode())
+            digest.update(b"\x1e")
+        return cls(
+            success=result.success,
+            trust_level=result.trust_level.level if result.trust_level else None,
+            issues=digest.hexdigest(),
+        )
+
+
+def classify(previous: Optional[Fingerprint], current: Fingerprint) -> Optional[str]:
+    """Return the transition kind, or None if nothing reportable changed."""
+    if previous is None:
+        return NEW
+    if previous.success and not current.success:
+        return FAILURE
+    if not previous.success and current.success:
+        return RECOVERY
+    if previous.trust_level != current.trust_level:
+        return TRUST_CHANGED
+    if previous.issues != current.issues:
+        return ISSUES_CHANGED
+    return None
+
+
+class ChangeTracker:
+    """
+    Filters a stream of result records down to transitions.
+
+    Wrap a sink with filter(): records whose fingerprint is unchanged are
+    dropped, transitions are forwarded with "change" and "previous" fields,
+    and every snapshot_interval seconds a {"snapshot": true, ...} record with
+    all current fingerprints is forwarded as well.
+    """
+
+    def __init__(
+        self,
+        state_path: Optional[Path] = None,
+        snapshot_interval: float = DEFAULT_SNAPSHOT_INTERVAL,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.state_path = state_path
+        self.snapshot_interval = snapshot_interval
+        self.clock = clock
+        self.fingerprints: dict[str, Fingerprint] = {}
+        self._lock = threading.Lock()
+        self._last_snapshot = clock()
+        self._dirty = False
+        if state_path is not None:
+            self._load()
+
+    def _load(self) -> None:
+        try:
+            with open(self.state_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self.fingerprints = {agent: Fingerprint(**fp) for agent, fp in data.get("agents", {}).items()}
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, TypeError) as e:
+            logger.warning(f"Ignoring unreadable change-tracker state {self.state_path}: {e}")
+
+    def save(self) -> None:
+        """Persist fingerprints so a restart continues from the same baseline."""
+        if self.state_path is None or not self._dirty:
+            return
+        with self._lock:
+            payload = {"agents": {agent: asdict(fp) for agent, fp in self.fingerprints.items()}}
+            self._dirty = False
+        self.state_path.parent.mkdir(parents=True, exist_ok=True)
+        write_json(self.state_path, payload)
+
+    def observe(self, record: dict) -> Optional[dict]:
+        """Return the record annotated with its transition, or None if unchanged."""
+        agent = record.get("agent") or record.get("target") or ""
+        current = Fingerprint.of(ValidationResult.from_dict(record))
+        with self._lock:
+            previous = self.fingerprints.get(agent)
+            kind = classify(previous, current)
+            if kind is None:
+                return None
+            self.fingerprints[agent] = current
+            self._dirty = True
+        annotated = dict(record)
+        annotated["change"] = kind
+        if previous is not None:
+            annotated["previous"] = {"success": previous.success, "trustLevel": previous.trust_level}
+        return annotated
+
+    def snapshot(self) -> dict:
+        """A full-state record of every agent's current fingerprint."""
+        with self._lock:
+            agents = {
+                agent: {"success": fp.success, "trustLevel": fp.trust_level, "issues": fp.issues}
+                for agent, fp in self.fingerprints.items()
+            }
+        return {"snapshot": True, "timestamp": self.clock(), "agents": agents}
+
+    def filter(self, sink: Callable[[dict], None]) -> Callable[[dict], None]:
+        """Wrap sink so it only receives transitions and periodic snapshots."""
+
+        def forward(record: dict) -> None:
+            change = self.observe(record)
+            if change is not None:
+                sink(change)
+            now = self.clock()
+            due = False
+            with self._lock:
+                if now - self._last_snapshot >= self.snapshot_interval:
+                    self._last_snapshot = now
+                    due = True
+            if due:
+                sink(self.snapshot())
+                self.save()
+
+        return forward
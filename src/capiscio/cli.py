@@ -1,7 +1,7 @@
+import os
 import sys
 import shutil
 from rich.console import Console
-from capiscio.manager import run_core, get_cache_dir
 
 console = Console()
 
@@ -17,6 +17,7 @@ def main():
     # Handle wrapper-specific maintenance commands
     if len(args) > 0:
         if args[0] == "--wrapper-clean":
+            from capiscio.manager import get_cache_dir
             try:
                 cache_dir = get_cache_dir()
                 if cache_dir.exists():
@@ -37,13 +38,89 @@ def main():
             except Exception:
                 console.print("capiscio-python wrapper (unknown version)")
             sys.exit(0)
-        
+
+        elif args[0] == "--wrapper-info":
+            from capiscio.limits import run_info_cli
+            sys.exit(run_info_cli(args[1:]))
+
+        elif args[0] == "--wrapper-daemon":
+            from capiscio.daemon import run_daemon_cli
+            sys.exit(run_daemon_cli(args[1:]))
+
+        elif args[0] in ("--wrapper-prefetch", "--wrapper-import"):
+            from pathlib import Path
+            from rich.markup import escape
+            from capiscio.manager import download_binary, import_binary, resolve_core_version
+            try:
+                if args[0] == "--wrapper-prefetch":
+                    path = download_binary(resolve_core_version())
+                elif len(args) in (2, 3):
+                    path = import_binary(Path(args[1]), Path(args[2]) if len(args) == 3 else None)
+                else:
+                    console.print("[red]Usage:[/red] capiscio --wrapper-import <binary> [checksums.txt]")
+                    sys.exit(2)
+                    return
+                console.print(f"[green]Core binary ready:[/green] {path}")
+                sys.exit(0)
+            except Exception as e:
+                console.print(f"[red]Failed to install core binary:[/red] {escape(str(e))}")
+                sys.exit(1)
+
         # If we handled a wrapper command, we shouldn't reach here if we used sys.exit
         # But if we didn't use sys.exit (e.g. in a test mock), we need to return
         if args[0].startswith("--wrapper-"):
              return
 
-    # Delegate to the core binary
+        # Wrapper-side batch mode for validate (incremental index, sharding, results store)
+        if args[0] == "validate" and any(
+            a in ("--incremental", "--shard", "--store") or a.startswith(("--shard=", "--store="))
+            for a in args[1:]
+        ):
+            from capiscio.batch import run_batch_cli
+            sys.exit(run_batch_cli(args[1:]))
+            return
+
+        if args[:2] == ["badge", "issue"] and any(
+            a == "--from-file" or a.startswith("--from-file=") for a in args[2:]
+        ):
+            from capiscio.badges import run_issue_cli
+            sys.exit(run_issue_cli(args[2:]))
+            return
+
+        if args[:2] == ["gateway", "start"] and any(
+            a == "--workers" or a.startswith("--workers=") for a in args[2:]
+        ):
+            from capiscio.gateway import run_gateway_cli
+            sys.exit(run_gateway_cli(args[2:]))
+            return
+
+        if args[0] == "watch":
+            from capiscio.watch import run_watch_cli
+            sys.exit(run_watch_cli(args[1:]))
+            return
+
+        if args[0] == "monitor":
+            from capiscio.monitor import run_monitor_cli
+            sys.exit(run_monitor_cli(args[1:]))
+            return
+
+        if args[0] == "results":
+            from capiscio.store import run_results_cli
+            sys.exit(run_results_cli(args[1:]))
+            return
+
+    # Hand the run to a daemon if one is listening (capiscio --wrapper-daemon)
+    from capiscio.daemon import forward
+    code = forward(args)
+    if code is not None:
+        # Like exec, skip interpreter teardown; the core has already written everything
+        sys.stdout.flush()
+        sys.stderr.flush()
+        os._exit(code)
+        return
+
+    # Delegate to the core binary (imported here so forwarding never pays for requests)
+    from capiscio.manager import run_core
     sys.exit(run_core(args))
 
 if __name__ == "__main__":
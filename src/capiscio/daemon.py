@@ -0,0 +1,445 @@
+"""
+Opt-in local daemon for shell-driven core runs.
+
+Pre-commit hooks, Makefiles and scripts start a fresh `capiscio` for every
+card. Before it can exec the core, each start imports requests and the
+download machinery, resolves the core version and stats the binary cache.
+`capiscio --wrapper-daemon` does that work once. It listens on a per-user
+Unix domain socket in the cache directory (the directory is mode 0700, and
+the peer's uid is checked where the platform reports it). The client side
+of this module imports only the standard library and platformdirs.
+
+cli.main() offers every run it would otherwise exec to the daemon through
+forward(). The request carries argv, cwd and the environment, and the
+client's stdin/stdout/stderr file descriptors travel with it over
+SCM_RIGHTS. The daemon spawns the core directly on those descriptors, so
+terminals, pipes and redirections behave exactly as with exec. The client
+relays SIGINT/SIGTERM/SIGHUP to the core and exits with the core's status.
+If no daemon is listening, or the daemon declines (different core version,
+binary missing), the client falls back to the normal exec path.
+
+The core has no resident mode, so every run is still a new core process.
+What the daemon keeps warm is the wrapper-side work around the launch.
+
+The daemon exits after idle_timeout seconds without a request.
+"""
+import os
+import sys
+import json
+import time
+import errno
+import signal
+import socket
+import struct
+import logging
+import threading
+from pathlib import Path
+from typing import Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+DISABLE_ENV = "CAPISCIO_NO_DAEMON"  # "1" never forwards to a running daemon
+SOCKET_NAME = "daemon.sock"
+DEFAULT_IDLE_TIMEOUT = 900.0
+ACCEPT_POLL = 1.0           # how often the accept loop checks for idleness and shutdown
+CONNECT_TIMEOUT = 1.0
+START_TIMEOUT = 10.0        # how long --detach waits for the new daemon to answer
+MAX_MESSAGE = 1024 * 1024   # argv plus environment
+FORWARDED_SIGNALS = ("SIGINT", "SIGTERM", "SIGHUP")
+
+HAVE_FD_PASSING = hasattr(socket, "AF_UNIX") and hasattr(socket, "send_fds") and sys.platform != "win32"
+
+
+def socket_path() -> Path:
+    """
+    The per-user daemon socket, in get_state_dir("daemon").
+
+    Only the path is computed: clients just look for the socket, and the
+    private directory is created by CoreDaemon.bind().
+    """
+    # Resolved without capiscio.manager: forwarding must not pay for importing requests
+    from platformdirs import user_cache_dir
+    return Path(user_cache_dir("capiscio", "capiscio")) / "daemon" / SOCKET_NAME
+
+
+def _send(sock: socket.socket, message: dict, fds: tuple[int, ...] = ()) -> None:
+    data = json.dumps(message).encode() + b"\n"
+    if fds:
+        # The descriptors ride on the first segment; the rest of a large request follows normally
+        sent = socket.send_fds(sock, [data], list(fds))
+        data = data[sent:]
+    if data:
+        sock.sendall(data)
+
+
+class _Reader:
+    """Newline-delimited JSON messages from a stream socket, optionally with descriptors on the first."""
+
+    def __init__(self, sock: socket.socket):
+        self.sock = sock
+        self.buffer = bytearray()
+
+    def read(self, with_fds: bool = False) -> tuple[Optional[dict], list[int]]:
+        fds: list[int] = []
+        while b"\n" not in self.buffer:
+            if with_fds and not fds:
+                data, received, _, _ = socket.recv_fds(self.sock, 65536, 3)
+                fds.extend(received)
+            else:
+                data = self.sock.recv(65536)
+            if not data:
+                for fd in fds:
+                    os.close(fd)
+                return None, []
+            self.buffer += data
+            if len(self.buffer) > MAX_MESSAGE:
+                for fd in fds:
+                    os.close(fd)
+                raise ValueError(f"message exceeds {MAX_MESSAGE} bytes")
+        line, _, rest = bytes(self.buffer).partition(b"\n")
+        self.buffer = bytearray(rest)
+        return json.loads(line), fds
+
+
+def _connect(path: Path) -> Optional[socket.socket]:
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.settimeout(CONNECT_TIMEOUT)
+    try:
+        sock.connect(str(path))
+    except OSError:
+        sock.close()
+        return None
+    sock.settimeout(None)
+    return sock
+
+
+def request(message: dict, path: Optional[Path] = None) -> Optional[dict]:
+    """Send a control message (status, stop) and return the reply, or None if no daemon is listening."""
+    if not HAVE_FD_PASSING:
+        return None
+    sock = _connect(path or socket_path())
+    if sock is None:
+        return None
+    with sock:
+        _send(sock, message)
+        reply, _ = _Reader(sock).read()
+        return reply
+
+
+def forward(args: list[str], path: Optional[Path] = None) -> Optional[int]:
+    """
+    Run the core through a listening daemon on our stdio and return its exit code.
+
+    Returns None, having run nothing, when there is no daemon, the daemon
+    declines, or forwarding is disabled; the caller then execs the core itself.
+    """
+    if not HAVE_FD_PASSING or os.environ.get(DISABLE_ENV, "").strip() == "1":
+        return None
+    path = path or socket_path()
+    if not path.exists():
+        return None
+    sock = _connect(path)
+    if sock is None:
+        return None
+
+    with sock:
+        sys.stdout.flush()
+        sys.stderr.flush()
+        try:
+            _send(sock, {"argv": args, "cwd": os.getcwd(), "env": dict(os.environ)}, fds=(0, 1, 2))
+        except OSError as e:
+            logger.debug(f"Could not forward to the daemon: {e}")
+            return None
+
+        def relay(signum, frame):
+            try:
+                _send(sock, {"signal": signum})
+            except OSError:
+                pass
+
+        previous = {}
+        for name in FORWARDED_SIGNALS:
+            if hasattr(signal, name):
+                sig = getattr(signal, name)
+                previous[sig] = signal.signal(sig, relay)
+        try:
+            reply, _ = _Reader(sock).read()
+        except (OSError, ValueError) as e:
+            reply = None
+            logger.debug(f"Lost the daemon connection: {e}")
+        finally:
+            for sig, handler in previous.items():
+                signal.signal(sig, handler)
+
+    if reply is None:
+        print("Error: the capiscio daemon closed the connection before the core exited", file=sys.stderr)
+        return 1
+    if "declined" in reply:
+        logger.debug(f"Daemon declined the run: {reply['declined']}")
+        return None
+    code = int(reply["exit"])
+    # Like a shell, report death by signal N as 128 + N
+    return 128 - code if code < 0 else code
+
+
+def _peer_uid(conn: socket.socket) -> Optional[int]:
+    if hasattr(socket, "SO_PEERCRED"):
+        creds = conn.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize("3i"))
+        return struct.unpack("3i", creds)[1]
+    return None
+
+
+class CoreDaemon:
+    """
+    Serves forwarded core runs on a Unix socket until stopped or idle.
+
+    binary is the resolved core executable; requests for any other core
+    version are declined so the client runs its own.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        binary: Path,
+        version: str,
+        idle_timeout: float = DEFAULT_IDLE_TIMEOUT,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.path = Path(path)
+        self.binary = Path(binary)
+        self.version = version
+        self.idle_timeout = idle_timeout
+        self.clock = clock
+        self.active = 0
+        self.served = 0
+        self.last_activity = clock()
+        self._stopping = threading.Event()
+        self._lock = threading.Lock()
+        self._server: Optional[socket.socket] = None
+        self._inode: Optional[int] = None
+
+    def bind(self) -> None:
+        """Listen on path, replacing a stale socket left by a daemon that died."""
+        self.path.parent.mkdir(mode=0o700, parents=True, exist_ok=True)
+        if self.path.exists():
+            if _connect(self.path) is not None:
+                raise RuntimeError(f"a daemon is already listening on {self.path}")
+            self.path.unlink()
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            old_umask = os.umask(0o077)
+            try:
+                server.bind(str(self.path))
+            finally:
+                os.umask(old_umask)
+            server.listen(64)
+        except OSError:
+            server.close()
+            raise
+        server.settimeout(ACCEPT_POLL)
+        self._server = server
+        self._inode = os.stat(self.path).st_ino
+
+    def idle(self) -> bool:
+        with self._lock:
+            return self.active == 0 and self.clock() - self.last_activity >= self.idle_timeout
+
+    def stop(self) -> None:
+        self._stopping.set()
+
+    def serve_forever(self) -> None:
+        """Accept connections until stop() is called or the daemon has been idle for idle_timeout."""
+        if self._server is None:
+            self.bind()
+        try:
+            while not self._stopping.is_set():
+                try:
+                    conn, _ = self._server.accept()
+                except socket.timeout:
+                    if self.idle():
+                        logger.info(f"Idle for {self.idle_timeout:.0f}s, shutting down")
+                        break
+                    continue
+                except OSError as e:
+                    if e.errno == errno.EINTR:
+                        continue
+                    raise
+                conn.settimeout(None)
+                threading.Thread(target=self._handle, args=(conn,), name="capiscio-daemon-conn", daemon=True).start()
+        finally:
+            self.close()
+
+    def close(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            self._server = None
+        # Only remove the socket if it is still ours and not a successor's
+        try:
+            if os.stat(self.path).st_ino == self._inode:
+                self.path.unlink()
+        except OSError:
+            pass
+
+    def _handle(self, conn: socket.socket) -> None:
+        with self._lock:
+            self.active += 1
+            self.last_activity = self.clock()
+        fds: list[int] = []
+        try:
+            with conn:
+                uid = _peer_uid(conn)
+                if uid is not None and uid != os.getuid():
+                    logger.warning(f"Rejected a connection from uid {uid}")
+                    return
+                reader = _Reader(conn)
+                message, fds = reader.read(with_fds=True)
+                if message is None:
+                    return
+                if message.get("command") == "status":
+                    _send(conn, {"pid": os.getpid(), "version": self.version, "active": self.active - 1,
+                                 "served": self.served, "idleTimeout": self.idle_timeout})
+                elif message.get("command") == "stop":
+                    self.stop()
+                    _send(conn, {"stopping": True})
+                elif "argv" in message:
+                    self._run(conn, reader, message, fds)
+                else:
+                    _send(conn, {"declined": "unknown request"})
+        except (OSError, ValueError) as e:
+            logger.debug(f"Daemon connection failed: {e}")
+        finally:
+            for fd in fds:
+                try:
+                    os.close(fd)
+                except OSError:
+                    pass
+            with self._lock:
+                self.active -= 1
+                self.last_activity = self.clock()
+
+    def _run(self, conn: socket.socket, reader: _Reader, message: dict, fds: list[int]) -> None:
+        import subprocess
+        from capiscio.manager import resolve_core_version
+
+        try:
+            version = resolve_core_version(message.get("env") or {})
+        except RuntimeError as e:
+            version = str(e)
+        if version != self.version:
+            _send(conn, {"declined": f"daemon serves core v{self.version}, not {version}"})
+            return
+        if len(fds) != 3:
+            _send(conn, {"declined": "expected stdin, stdout and stderr descriptors"})
+            return
+        try:
+            proc = subprocess.Popen(
+                [str(self.binary)] + [str(a) for a in message["argv"]],
+                stdin=fds[0], stdout=fds[1], stderr=fds[2],
+                cwd=message.get("cwd"), env=message.get("env"),
+            )
+        except OSError as e:
+            _send(conn, {"declined": f"could not start the core: {e}"})
+            return
+        for fd in fds:
+            os.close(fd)
+        fds.clear()
+
+        def relay_signals() -> None:
+            # Ctrl-C reaches the client's process group, not ours, so the client relays it.
+            # The client going away before the core exits is treated as a hangup.
+            while True:
+                try:
+                    msg, _ = reader.read()
+                except (OSError, ValueError):
+                    msg = None
+                if proc.poll() is not None:
+                    return
+                if msg is None:
+                    proc.send_signal(signal.SIGHUP if hasattr(signal, "SIGHUP") else signal.SIGTERM)
+                    return
+                if "signal" in msg:
+                    proc.send_signal(int(msg["signal"]))
+
+        threading.Thread(target=relay_signals, name=f"capiscio-daemon-signals-{proc.pid}", daemon=True).start()
+        code = proc.wait()
+        with self._lock:
+            self.served += 1
+        _send(conn, {"exit": code})
+        # Wake the signal relay, which is blocked reading from the client
+        conn.shutdown(socket.SHUT_RDWR)
+
+
+def run_daemon_cli(args: list[str]) -> int:
+    """Entry point for `capiscio --wrapper-daemon [--idle-timeout S] [--detach | --status | --stop]`."""
+    from rich.console import Console
+    from capiscio.manager import download_binary, resolve_core_version
+
+    console = Console(stderr=True)
+    if not HAVE_FD_PASSING:
+        console.print("[bold red]Error:[/bold red] the daemon needs Unix domain sockets with descriptor passing")
+        return 1
+
+    idle_timeout = DEFAULT_IDLE_TIMEOUT
+    flags = set()
+    i = 0
+    while i < len(args):
+        if args[i] == "--idle-timeout" and i + 1 < len(args):
+            idle_timeout = float(args[i + 1])
+            i += 1
+        elif args[i].startswith("--idle-timeout="):
+            idle_timeout = float(args[i].split("=", 1)[1])
+        elif args[i] in ("--detach", "--status", "--stop"):
+            flags.add(args[i])
+        else:
+            console.print(f"[bold red]Error:[/bold red] unknown daemon option {args[i]}")
+            return 2
+        i += 1
+
+    path = socket_path()
+    if "--status" in flags or "--stop" in flags:
+        reply = request({"command": "stop" if "--stop" in flags else "status"}, path)
+        if reply is None:
+            console.print("[yellow]No daemon is running.[/yellow]")
+            return 1
+        if "--stop" in flags:
+            console.print("[green]Daemon stopping.[/green]")
+        else:
+            print(json.dumps(reply, indent=2))
+        return 0
+
+    try:
+        version = resolve_core_version()
+        binary = download_binary(version)
+    except Exception as e:
+        console.print(f"[bold red]Error:[/bold red] {e}")
+        return 1
+
+    if "--detach" in flags:
+        import subprocess
+        subprocess.Popen(
+            [sys.executable, "-m", "capiscio.cli", "--wrapper-daemon", "--idle-timeout", str(idle_timeout)],
+            stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+            start_new_session=True,
+        )
+        deadline = time.monotonic() + START_TIMEOUT
+        while time.monotonic() < deadline:
+            if request({"command": "status"}, path) is not None:
+                console.print(f"[green]Daemon listening on[/green] {path}")
+                return 0
+            time.sleep(0.05)
+        console.print("[bold red]Error:[/bold red] the daemon did not start")
+        return 1
+
+    daemon = CoreDaemon(path, binary, version, idle_timeout)
+    try:
+        daemon.bind()
+    except (OSError, RuntimeError) as e:
+        console.print(f"[bold red]Error:[/bold red] {e}")
+        return 1
+    for name in ("SIGTERM", "SIGINT"):
+        signal.signal(getattr(signal, name), lambda signum, frame: daemon.stop())
+    console.print(f"[cyan]Daemon for core v{version} listening on {path} "
+                  f"(exits after {idle_timeout:.0f}s idle)[/cyan]")
+    daemon.serve_forever()
+    return 0
@@ -0,0 +1,210 @@
+"""
+Conditional-GET cache for remote agent cards.
+
+Batch and monitor modes fetch remote cards themselves through one pooled
+HTTP session and hand the cached file to the core. Responses are stored on
+disk with their validators (ETag / Last-Modified) and freshness
+(Cache-Control max-age / Expires): fresh entries are served without a
+request, stale ones are revalidated with If-None-Match / If-Modified-Since.
+Validation results are stored per content digest, core version and flags,
+so an unchanged card (a 304, or a 200 with identical bytes) reuses its
+previous result instead of spawning the core.
+
+Requests go through the per-origin circuit breaker (capiscio.breaker). With
+CAPISCIO_OFFLINE=1 a cached body is served as-is; while an origin's breaker
+is open, or offline with nothing cached, the fetch fails immediately with
+NetworkUnavailable.
+"""
+import json
+import time
+import hashlib
+import logging
+import threading
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+from pathlib import Path
+from typing import Optional
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from capiscio.breaker import CircuitBreaker, NetworkUnavailable, is_offline, origin
+from capiscio.files import atomic_write, write_json
+from capiscio.manager import get_state_dir
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+WELL_KNOWN_PATH = "/.well-known/agent-card.json"
+FETCH_TIMEOUT = 15
+POOL_SIZE = 32
+MAX_CARD_SIZE = 8 * 1024 * 1024
+MAX_STORED_RESULTS = 8  # per URL; older (digest, version, flags) combinations are evicted
+
+
+def card_url(target: str) -> str:
+    """Resolve an agent base URL to its card URL (explicit .json URLs are kept)."""
+    parts = urlsplit(target)
+    if parts.path.endswith(".json"):
+        return target
+    return target.rstrip("/") + WELL_KNOWN_PATH
+
+
+def freshness(headers, now: float) -> tuple[Optional[float], bool, bool]:
+    """Return (expires_at, no_store, no_cache) from response headers."""
+    directives = {}
+    for part in headers.get("Cache-Control", "").split(","):
+        name, _, value = part.strip().partition("=")
+        if name:
+            directives[name.lower()] = value.strip('"')
+    no_store = "no-store" in directives
+    no_cache = "no-cache" in directives
+    if "max-age" in directives:
+        try:
+            age = float(headers.get("Age", 0) or 0)
+            return now + max(0.0, float(directives["max-age"]) - age), no_store, no_cache
+        except ValueError:
+            pass
+    if "Expires" in headers:
+        try:
+            return parsedate_to_datetime(headers["Expires"]).timestamp(), no_store, no_cache
+        except (TypeError, ValueError):
+            return now, no_store, no_cache
+    return None, no_store, no_cache
+
+
+@dataclass
+class CachedCard:
+    """A remote card available as a local file."""
+
+    url: str
+    path: Path
+    digest: str
+    status: str  # "fresh" (no request), "revalidated" (304), "downloaded" (200), "offline" (stale, no request)
+
+
+class CardCache:
+    """
+    On-disk HTTP cache for agent cards, shared across threads.
+
+    Each URL maps to <key>.json (body) and <key>.meta (validators, freshness
+    and stored results). Requests for the same URL are serialised; different
+    URLs proceed in parallel over the pooled session.
+    """
+
+    def __init__(self, cache_dir: Optional[Path] = None, session: Optional[requests.Session] = None,
+                 breaker: Optional[CircuitBreaker] = None):
+        self.breaker = breaker or CircuitBreaker()
+        self.cache_dir = Path(cache_dir) if cache_dir is not None else get_state_dir("cards")
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            session.headers["Accept"] = "application/json"
+        self.session = session
+        self._locks: dict[str, threading.Lock] = {}
+        self._locks_guard = threading.Lock()
+
+    def _key(self, url: str) -> str:
+        return hashlib.sha256(url.encode()).hexdigest()[:32]
+
+    def _lock(self, key: str) -> threading.Lock:
+        with self._locks_guard:
+            return self._locks.setdefault(key, threading.Lock())
+
+    def _read_meta(self, key: str) -> dict:
+        try:
+            with open(self.cache_dir / f"{key}.meta", "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write_meta(self, key: str, meta: dict) -> None:
+        write_json(self.cache_dir / f"{key}.meta", meta)
+
+    def fetch(self, target: str) -> CachedCard:
+        """Return a local copy of the card for target, using the network only when needed."""
+        url = card_url(target)
+        key = self._key(url)
+        body_path = self.cache_dir / f"{key}.json"
+        with self._lock(key):
+            meta = self._read_meta(key)
+            now = time.time()
+            have_body = bool(meta) and body_path.exists()
+            if have_body and not meta.get("noCache") and (meta.get("expiresAt") or 0) > now:
+                return CachedCard(url, body_path, meta["digest"], "fresh")
+
+            headers = {}
+            if have_body and meta.get("etag"):
+                headers["If-None-Match"] = meta["etag"]
+            if have_body and meta.get("lastModified"):
+                headers["If-Modified-Since"] = meta["lastModified"]
+
+            try:
+                with self.breaker.guard(origin(url)), \
+                     self.session.get(url, headers=headers, timeout=FETCH_TIMEOUT, stream=True) as resp:
+                    expires_at, no_store, no_cache = freshness(resp.headers, now)
+                    if resp.status_code == 304 and have_body:
+                        meta.update({"expiresAt": expires_at, "noCache": no_cache, "checkedAt": now})
+                        if resp.headers.get("ETag"):
+                            meta["etag"] = resp.headers["ETag"]
+                        self._write_meta(key, meta)
+                        return CachedCard(url, body_path, meta["digest"], "revalidated")
+                    resp.raise_for_status()
+                    body = resp.raw.read(MAX_CARD_SIZE + 1, decode_content=True)
+                    if len(body) > MAX_CARD_SIZE:
+                        raise ValueError(f"Agent card at {url} exceeds {MAX_CARD_SIZE} bytes")
+            except NetworkUnavailable as e:
+                # A stale copy stands in only when offline mode was asked for; a
+                # tripped breaker must not turn a dead agent into a passing card
+                if not (have_body and is_offline()):
+                    raise
+                logger.debug(f"Serving cached card for {url}: {e}")
+                return CachedCard(url, body_path, meta["digest"], "offline")
+
+            digest = hashlib.sha256(body).hexdigest()
+            atomic_write(body_path, body)
+            results = meta.get("results", {}) if meta.get("digest") == digest else {}
+            if no_store:
+                # Keep the body for this run's core invocation but never serve it as fresh
+                expires_at, no_cache = None, True
+            self._write_meta(key, {
+                "url": url,
+                "digest": digest,
+                "etag": None if no_store else resp.headers.get("ETag"),
+                "lastModified": None if no_store else resp.headers.get("Last-Modified"),
+                "expiresAt": expires_at,
+                "noCache": no_cache,
+                "checkedAt": now,
+                "results": results,
+            })
+            return CachedCard(url, body_path, digest, "downloaded")
+
+    @staticmethod
+    def _result_key(digest: str, core_version: str, core_args: list[str]) -> str:
+        return hashlib.sha256(json.dumps([digest, core_version, core_args]).encode()).hexdigest()[:32]
+
+    def get_result(self, card: CachedCard, core_version: str, core_args: list[str]) -> Optional[dict]:
+        """Stored {returncode, stdout, stderr} for this exact content, core version and flags."""
+        key = self._key(card.url)
+        with self._lock(key):
+            meta = self._read_meta(key)
+        if meta.get("digest") != card.digest:
+            return None
+        return meta.get("results", {}).get(self._result_key(card.digest, core_version, core_args))
+
+    def put_result(self, card: CachedCard, core_version: str, core_args: list[str], result: dict) -> None:
+        """Remember a validation result for this content, core version and flags."""
+        key = self._key(card.url)
+        with self._lock(key):
+            meta = self._read_meta(key)
+            if meta.get("digest") != card.digest:
+                return
+            results = meta.setdefault("results", {})
+            results[self._result_key(card.digest, core_version, core_args)] = result
+            while len(results) > MAX_STORED_RESULTS:
+                results.pop(next(iter(results)))
+            self._write_meta(key, meta)
@@ -0,0 +1,31 @@
+"""
+Atomic file writes for the wrapper's on-disk caches and state files.
+
+Caches in the user cache dir are shared by concurrent processes (xdist
+workers, parallel CI jobs, the monitor and ad-hoc runs), so readers must
+never see a half-written file. Data is written to a temporary file next to
+the target, unique per process and thread, and moved into place with
+os.replace().
+"""
+import os
+import json
+import threading
+from pathlib import Path
+from typing import Any, Union
+
+
+def atomic_write(path: Path, data: Union[bytes, str]) -> None:
+    """Replace path with data in one step; the parent directory must exist."""
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        with open(tmp_path, "wb") as f:
+            f.write(data.encode("utf-8") if isinstance(data, str) else data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+
+
+def write_json(path: Path, value: Any) -> None:
+    """atomic_write() a compact JSON document."""
+    atomic_write(path, json.dumps(value, separators=(",", ":")))
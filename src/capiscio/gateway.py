@@ -0,0 +1,296 @@
+"""
+Supervised multi-process gateway.
+
+`capiscio gateway start --workers N ...` runs N core gateway processes, each
+on its own loopback port, behind a small built-in TCP balancer listening on
+the requested --port (on 127.0.0.1 unless --host names a wider address). The supervisor health-checks every worker, takes
+unhealthy ones out of rotation, restarts crashed workers with exponential
+backoff and shuts everything down gracefully on SIGTERM/SIGINT.
+
+Without --workers the wrapper still execs the core gateway directly.
+"""
+import sys
+import time
+import signal
+import socket
+import asyncio
+import logging
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+from rich.console import Console
+
+from capiscio.limits import default_jobs
+from capiscio.manager import download_binary, resolve_core_version
+
+console = Console(stderr=True)
+logger = logging.getLogger(__name__)
+
+# Configuration
+WORKERS_FLAG = "--workers"
+DEFAULT_PORT = 8080
+DEFAULT_HOST = "127.0.0.1"  # --host 0.0.0.0 to accept connections from other machines
+HEALTH_INTERVAL = 2.0
+HEALTH_TIMEOUT = 1.0
+BACKOFF_INITIAL = 0.5
+BACKOFF_MAX = 30.0
+STABLE_AFTER = 30.0      # uptime after which a worker's backoff resets
+MAX_RESTARTS = 10        # consecutive quick failures before a worker is given up
+SHUTDOWN_GRACE = 10.0
+COPY_BUFFER = 64 * 1024
+
+
+def free_port(host: str = "127.0.0.1") -> int:
+    """An ephemeral port that is free right now."""
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind((host, 0))
+        return s.getsockname()[1]
+
+
+def split_gateway_args(args: list[str]) -> tuple[int, str, int, list[str]]:
+    """Split `gateway start` arguments into (workers, host, port, remaining core args)."""
+    workers, host, port, rest = 1, DEFAULT_HOST, DEFAULT_PORT, []
+    i = 0
+    while i < len(args):
+        arg = args[i]
+        name, eq, value = arg.partition("=")
+        if name in (WORKERS_FLAG, "--host", "--port"):
+            if not eq:
+                if i + 1 >= len(args):
+                    raise ValueError(f"{name} requires a value")
+                value = args[i + 1]
+                i += 1
+            if name == WORKERS_FLAG:
+                workers = default_jobs() if value == "auto" else int(value)
+            elif name == "--host":
+                host = value
+            else:
+                port = int(value)
+        else:
+            rest.append(arg)
+        i += 1
+    if workers < 1:
+        raise ValueError("--workers must be at least 1")
+    return workers, host, port, rest
+
+
+@dataclass
+class Worker:
+    """One supervised gateway process."""
+
+    index: int
+    port: int
+    process: Optional[asyncio.subprocess.Process] = None
+    healthy: bool = False
+    active: int = 0
+    restarts: int = 0
+    started_at: float = 0.0
+    given_up: bool = False
+
+
+class Supervisor:
+    """
+    Runs gateway workers behind a least-connections TCP balancer.
+
+    command(port) returns the argv for a worker listening on port; each
+    start gets a freshly picked port. Workers are only routed to after their
+    first successful health check. A worker that fails max_restarts times in
+    a row without staying up is given up; once every worker has been given
+    up the supervisor stops and sets failed.
+    """
+
+    def __init__(
+        self,
+        command: Callable[[int], list[str]],
+        workers: int,
+        port: int,
+        host: str = DEFAULT_HOST,
+        health_interval: float = HEALTH_INTERVAL,
+        grace: float = SHUTDOWN_GRACE,
+        max_restarts: int = MAX_RESTARTS,
+    ):
+        self.command = command
+        self.port = port
+        self.host = host
+        self.health_interval = health_interval
+        self.grace = grace
+        self.max_restarts = max_restarts
+        self.failed = False
+        self.workers = [Worker(i, 0) for i in range(workers)]
+        self._stopping: Optional[asyncio.Event] = None
+        self._ready: Optional[asyncio.Event] = None
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    async def _spawn(self, worker: Worker) -> None:
+        # A fresh port: the previous one may still be held by the dead worker's
+        # sockets, or taken by another process in the meantime
+        worker.healthy = False
+        worker.port = free_port()
+        worker.started_at = time.monotonic()
+        worker.process = await asyncio.create_subprocess_exec(*self.command(worker.port), stdin=asyncio.subprocess.DEVNULL)
+
+    async def _supervise(self, worker: Worker) -> None:
+        backoff = BACKOFF_INITIAL
+        failures = 0
+        while not self._stopping.is_set():
+            try:
+                await self._spawn(worker)
+            except Exception as e:
+                outcome = f"could not be started: {e}"
+            else:
+                outcome = f"exited ({await worker.process.wait()})"
+            worker.healthy = False
+            if self._stopping.is_set():
+                return
+            if time.monotonic() - worker.started_at >= STABLE_AFTER:
+                backoff, failures = BACKOFF_INITIAL, 0
+            failures += 1
+            if failures > self.max_restarts:
+                console.print(f"[bold red]Gateway worker {worker.index} {outcome}; giving up after "
+                              f"{self.max_restarts} restart(s)[/bold red]")
+                worker.given_up = True
+                if all(w.given_up for w in self.workers):
+                    self.failed = True
+                    self._stopping.set()
+                return
+            worker.restarts += 1
+            console.print(f"[yellow]Gateway worker {worker.index} {outcome}; restarting in {backoff:.1f}s[/yellow]")
+            try:
+                await asyncio.wait_for(self._stopping.wait(), backoff)
+                return
+            except asyncio.TimeoutError:
+                pass
+            backoff = min(BACKOFF_MAX, backoff * 2)
+
+    async def _check(self, worker: Worker) -> bool:
+        if worker.process is None or worker.process.returncode is not None:
+            return False
+        try:
+            _, writer = await asyncio.wait_for(asyncio.open_connection("127.0.0.1", worker.port), HEALTH_TIMEOUT)
+        except (OSError, asyncio.TimeoutError):
+            return False
+        writer.close()
+        return True
+
+    async def _health(self) -> None:
+        while not self._stopping.is_set():
+            results = await asyncio.gather(*(self._check(w) for w in self.workers))
+            for worker, ok in zip(self.workers, results):
+                if worker.healthy and not ok:
+                    console.print(f"[yellow]Gateway worker {worker.index} failed its health check[/yellow]")
+                worker.healthy = ok
+            if any(results):
+                self._ready.set()
+            try:
+                await asyncio.wait_for(self._stopping.wait(), self.health_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    def _pick(self) -> Optional[Worker]:
+        healthy = [w for w in self.workers if w.healthy]
+        return min(healthy, key=lambda w: w.active) if healthy else None
+
+    @staticmethod
+    async def _pipe(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while data := await reader.read(COPY_BUFFER):
+                writer.write(data)
+                await writer.drain()
+            if writer.can_write_eof():
+                writer.write_eof()
+        except (ConnectionError, OSError):
+            pass
+
+    async def _handle(self, client_reader: asyncio.StreamReader, client_writer: asyncio.StreamWriter) -> None:
+        worker = self._pick()
+        if worker is None:
+            client_writer.write(b"HTTP/1.1 503 Service Unavailable\r\nContent-Length: 0\r\nConnection: close\r\n\r\n")
+            try:
+                await client_writer.drain()
+                # Consume the pending request so closing does not turn into a reset
+                await asyncio.wait_for(client_reader.read(COPY_BUFFER), HEALTH_TIMEOUT)
+            except (ConnectionError, OSError, asyncio.TimeoutError):
+                pass
+            client_writer.close()
+            return
+        worker.active += 1
+        try:
+            try:
+                upstream_reader, upstream_writer = await asyncio.open_connection("127.0.0.1", worker.port)
+            except OSError:
+                worker.healthy = False
+                client_writer.close()
+                return
+            await asyncio.gather(
+                self._pipe(client_reader, upstream_writer),
+                self._pipe(upstream_reader, client_writer),
+            )
+            upstream_writer.close()
+            client_writer.close()
+        finally:
+            worker.active -= 1
+
+    async def _shutdown(self) -> None:
+        if self._server is not None:
+            self._server.close()
+        running = [w.process for w in self.workers if w.process is not None and w.process.returncode is None]
+        for proc in running:
+            proc.send_signal(signal.SIGTERM)
+        try:
+            await asyncio.wait_for(asyncio.gather(*(p.wait() for p in running)), self.grace)
+        except asyncio.TimeoutError:
+            for proc in running:
+                if proc.returncode is None:
+                    proc.kill()
+            await asyncio.gather(*(p.wait() for p in running))
+
+    def stop(self) -> None:
+        """Request a graceful shutdown; safe to call from signal handlers on the loop."""
+        if self._stopping is not None:
+            self._stopping.set()
+
+    async def wait_ready(self) -> None:
+        """Wait until at least one worker has passed a health check."""
+        await self._ready.wait()
+
+    async def run(self) -> None:
+        self._stopping = asyncio.Event()
+        self._ready = asyncio.Event()
+        supervisors = [asyncio.create_task(self._supervise(w)) for w in self.workers]
+        health = asyncio.create_task(self._health())
+        try:
+            self._server = await asyncio.start_server(self._handle, self.host, self.port, reuse_address=True)
+            await self._stopping.wait()
+        finally:
+            self._stopping.set()
+            await self._shutdown()
+            await asyncio.gather(health, *supervisors, return_exceptions=True)
+
+
+def run_gateway_cli(args: list[str]) -> int:
+    """Entry point for `capiscio gateway start --workers N [--host H] [--port P] [core flags]`."""
+    try:
+        workers, host, port, core_args = split_gateway_args(args)
+        binary = str(download_binary(resolve_core_version()))
+    except Exception as e:
+        console.print(f"[bold red]Error:[/bold red] {e}")
+        return 1
+
+    supervisor = Supervisor(lambda p: [binary, "gateway", "start", "--port", str(p)] + core_args, workers, port, host)
+
+    async def main() -> None:
+        loop = asyncio.get_running_loop()
+        if sys.platform != "win32":
+            for sig in (signal.SIGTERM, signal.SIGINT):
+                loop.add_signal_handler(sig, supervisor.stop)
+        console.print(f"[cyan]Gateway listening on {host}:{port} with {workers} worker(s)[/cyan]")
+        await supervisor.run()
+
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
+    if supervisor.failed:
+        console.print("[bold red]Error:[/bold red] no gateway worker could be kept running")
+        return 1
+    return 0
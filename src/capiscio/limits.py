@@ -0,0 +1,247 @@
+"""
+Container-aware default concurrency.
+
+os.cpu_count() reports every CPU on the node, so in a pod with a 2-CPU quota
+on a 64-core host a pool sized from it runs 64 core processes that are then
+throttled. detect() combines:
+
+- the scheduler affinity mask (os.sched_getaffinity; cpusets, taskset),
+- the cgroup CPU quota (v2 `cpu.max`, v1 `cpu.cfs_quota_us`/`cpu.cfs_period_us`),
+  taking the tightest limit from the process's cgroup up to the root,
+- the cgroup memory limit (v2 `memory.max`, v1 `memory.limit_in_bytes`),
+  less some headroom, divided by the peak RSS observed for one core run,
+
+into the default number of concurrent core runs. CAPISCIO_JOBS overrides
+the result, and `capiscio --wrapper-info` prints it.
+"""
+import os
+import json
+import math
+import logging
+import threading
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Iterator, Optional
+
+from capiscio.files import write_json
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+JOBS_ENV = "CAPISCIO_JOBS"
+CGROUP_ROOT = Path("/sys/fs/cgroup")
+PROC_CGROUP = Path("/proc/self/cgroup")
+DEFAULT_CORE_RSS = 48 * 1024 * 1024   # assumed peak RSS of one core run until one has been observed
+UNLIMITED = 1 << 60                   # cgroup v1 reports "no limit" as a huge page-aligned number
+IO_JOBS_PER_CPU = 4                   # network-bound pools (monitor) may oversubscribe the CPUs
+MAX_IO_JOBS = 32
+MEMORY_HEADROOM = 0.75                # share of the memory limit core runs may use (page cache, the wrapper)
+
+
+def _read(path: Path) -> Optional[str]:
+    try:
+        return path.read_text().strip()
+    except OSError:
+        return None
+
+
+def cgroup_paths(proc_cgroup: Path = PROC_CGROUP) -> dict[str, str]:
+    """Map each cgroup controller to this process's cgroup path ("" for the v2 unified hierarchy)."""
+    paths = {}
+    for line in (_read(proc_cgroup) or "").splitlines():
+        parts = line.split(":", 2)
+        if len(parts) != 3:
+            continue
+        _, controllers, path = parts
+        for controller in controllers.split(",") if controllers else [""]:
+            paths[controller] = path
+    return paths
+
+
+def _ancestors(root: Path, path: str) -> Iterator[Path]:
+    """root/path and its parents up to root (the process's cgroup may not be visible in a container)."""
+    current = root / path.lstrip("/")
+    while True:
+        yield current
+        if current == root or root not in current.parents:
+            return
+        current = current.parent
+
+
+def cgroup_cpu_limit(root: Path = CGROUP_ROOT, proc_cgroup: Path = PROC_CGROUP) -> Optional[float]:
+    """The tightest CPU quota (in CPUs) applying to this process, or None if unlimited."""
+    paths = cgroup_paths(proc_cgroup)
+    limits = []
+    if "" in paths:
+        for directory in _ancestors(root, paths[""]):
+            fields = (_read(directory / "cpu.max") or "").split()
+            if len(fields) == 2 and fields[0] != "max":
+                try:
+                    limits.append(int(fields[0]) / int(fields[1]))
+                except (ValueError, ZeroDivisionError):
+                    pass
+    if "cpu" in paths:
+        for directory in _ancestors(root / "cpu", paths["cpu"]):
+            try:
+                quota = int(_read(directory / "cpu.cfs_quota_us") or -1)
+                period = int(_read(directory / "cpu.cfs_period_us") or 0)
+            except ValueError:
+                continue
+            if quota > 0 and period > 0:
+                limits.append(quota / period)
+    return min(limits) if limits else None
+
+
+def cgroup_memory(root: Path = CGROUP_ROOT, proc_cgroup: Path = PROC_CGROUP) -> tuple[Optional[int], Optional[int]]:
+    """(limit, current usage) in bytes of the tightest memory limit applying to this process."""
+    paths = cgroup_paths(proc_cgroup)
+    candidates = []
+    if "" in paths:
+        for directory in _ancestors(root, paths[""]):
+            candidates.append((_read(directory / "memory.max"), _read(directory / "memory.current")))
+    if "memory" in paths:
+        for directory in _ancestors(root / "memory", paths["memory"]):
+            candidates.append((_read(directory / "memory.limit_in_bytes"), _read(directory / "memory.usage_in_bytes")))
+    best: tuple[Optional[int], Optional[int]] = (None, None)
+    for limit, current in candidates:
+        if not limit or not limit.isdigit() or int(limit) >= UNLIMITED:
+            continue
+        if best[0] is None or int(limit) < best[0]:
+            best = (int(limit), int(current) if current and current.isdigit() else None)
+    return best
+
+
+def _rss_state_path() -> Path:
+    from capiscio.manager import get_state_dir
+    return get_state_dir("limits") / "core-rss.json"
+
+
+def observed_core_rss() -> Optional[int]:
+    """Peak RSS in bytes seen for a single core run, if any has been recorded."""
+    try:
+        with open(_rss_state_path(), "r", encoding="utf-8") as f:
+            return int(json.load(f)["maxRssKb"]) * 1024
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+
+def record_core_rss(max_rss_kb: int) -> None:
+    """Remember a core run's peak RSS if it is the largest seen so far."""
+    known = observed_core_rss()
+    if known is not None and max_rss_kb * 1024 <= known:
+        return
+    try:
+        write_json(_rss_state_path(), {"maxRssKb": max_rss_kb})
+    except OSError as e:
+        logger.debug(f"Could not record core RSS: {e}")
+
+
+@dataclass(frozen=True, slots=True)
+class Limits:
+    """Detected CPU and memory limits and the concurrency derived from them."""
+
+    host_cpus: int
+    affinity_cpus: Optional[int]
+    cgroup_cpus: Optional[float]
+    memory_limit: Optional[int]
+    memory_current: Optional[int]
+    core_rss: int
+    core_rss_observed: bool
+    cpus: int
+    memory_jobs: Optional[int]
+    jobs: int
+    override: Optional[int] = None
+
+    def to_dict(self) -> dict:
+        return {"".join(w.title() if i else w for i, w in enumerate(k.split("_"))): v for k, v in asdict(self).items()}
+
+
+def detect(root: Path = CGROUP_ROOT, proc_cgroup: Path = PROC_CGROUP, core_rss: Optional[int] = None) -> Limits:
+    """Work out the CPUs and memory actually available to this process."""
+    host = os.cpu_count() or 1
+    affinity = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else None
+    quota = cgroup_cpu_limit(root, proc_cgroup)
+    cpus = min(c for c in (host, affinity, math.ceil(quota) if quota else None) if c)
+
+    observed = observed_core_rss() if core_rss is None else core_rss
+    rss = observed or DEFAULT_CORE_RSS
+    limit, current = cgroup_memory(root, proc_cgroup)
+    memory_jobs = None
+    if limit is not None:
+        memory_jobs = max(1, int(limit * MEMORY_HEADROOM) // rss)
+
+    jobs = max(1, min(cpus, memory_jobs or cpus))
+    override = None
+    raw = os.environ.get(JOBS_ENV, "").strip()
+    if raw:
+        try:
+            override = max(1, int(raw))
+        except ValueError:
+            logger.warning(f"Ignoring invalid {JOBS_ENV}={raw!r}")
+    return Limits(
+        host_cpus=host,
+        affinity_cpus=affinity,
+        cgroup_cpus=quota,
+        memory_limit=limit,
+        memory_current=current,
+        core_rss=rss,
+        core_rss_observed=observed is not None,
+        cpus=cpus,
+        memory_jobs=memory_jobs,
+        jobs=override or jobs,
+        override=override,
+    )
+
+
+_detected: Optional[Limits] = None
+_detected_lock = threading.Lock()
+
+
+def current_limits() -> Limits:
+    """Limits for this process, detected once."""
+    global _detected
+    with _detected_lock:
+        if _detected is None:
+            _detected = detect()
+        return _detected
+
+
+def default_jobs() -> int:
+    """Default number of concurrent core runs."""
+    return current_limits().jobs
+
+
+def default_io_jobs() -> int:
+    """Default concurrency for network-bound pools, which may exceed the CPU count."""
+    return min(MAX_IO_JOBS, current_limits().cpus * IO_JOBS_PER_CPU)
+
+
+def run_info_cli(args: list[str]) -> int:
+    """Entry point for `capiscio --wrapper-info [--json]`."""
+    from rich.console import Console
+    from capiscio.manager import resolve_core_version
+
+    try:
+        core_version = resolve_core_version()
+    except RuntimeError as e:
+        Console(stderr=True).print(f"[bold red]Error:[/bold red] {e}")
+        return 1
+    info = current_limits()
+    if "--json" in args:
+        print(json.dumps({"coreVersion": core_version, **info.to_dict()}, indent=2))
+        return 0
+
+    def mib(value: Optional[int]) -> str:
+        return "unlimited" if value is None else f"{value / 2**20:.0f} MiB"
+
+    console = Console()
+    console.print(f"Core version:        v{core_version}")
+    console.print(f"Host CPUs:           {info.host_cpus}")
+    console.print(f"Affinity CPUs:       {info.affinity_cpus if info.affinity_cpus is not None else 'n/a'}")
+    console.print(f"cgroup CPU quota:    {info.cgroup_cpus if info.cgroup_cpus is not None else 'unlimited'}")
+    console.print(f"Memory limit:        {mib(info.memory_limit)} ({mib(info.memory_current)} in use)"
+                  if info.memory_limit is not None else "Memory limit:        unlimited")
+    console.print(f"Core RSS per run:    {mib(info.core_rss)} ({'observed' if info.core_rss_observed else 'default estimate'})")
+    console.print(f"Effective CPUs:      {info.cpus}")
+    console.print(f"Default jobs:        {info.jobs}" + (f" ({JOBS_ENV})" if info.override else ""))
+    return 0
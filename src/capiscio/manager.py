@@ -1,5 +1,8 @@
 import os
+import re
 import sys
+import json
+import time
 import hashlib
 import platform
 import stat
@@ -11,9 +14,15 @@ from typing import Optional, Tuple
 
 import requests
 from platformdirs import user_cache_dir
+from urllib3.exceptions import DecodeError, ProtocolError, ReadTimeoutError
 from rich.console import Console
+from rich.markup import escape
 from rich.progress import Progress, SpinnerColumn, TextColumn
 
+from capiscio import process
+from capiscio.breaker import CircuitBreaker, NetworkUnavailable, NETWORK_ERRORS, is_offline
+from capiscio.files import write_json
+
 console = Console()
 logger = logging.getLogger(__name__)
 
@@ -21,6 +30,18 @@ logger = logging.getLogger(__name__)
 CORE_VERSION = "2.7.0"  # The version of the core binary to download
 GITHUB_REPO = "capiscio/capiscio-core"
 BINARY_NAME = "capiscio"
+CORE_VERSION_ENV = "CAPISCIO_CORE_VERSION"  # overrides CORE_VERSION
+UPDATE_CHECK_ENV = "CAPISCIO_UPDATE_CHECK"  # opt-in background check for newer core releases
+UPDATE_CHECK_TTL_ENV = "CAPISCIO_UPDATE_CHECK_TTL"
+UPDATE_CHECK_TTL = 24 * 3600
+DOWNLOAD_BUFFER = 1024 * 1024  # one reused read buffer for the binary download
+PROGRESS_INTERVAL = 0.1  # seconds between progress bar updates
+GITHUB_HOST = "github.com"
+OFFLINE_HINT = (
+    "Prefetch it on a connected machine with `capiscio --wrapper-prefetch` and copy the cache directory, "
+    "or install a downloaded binary with `capiscio --wrapper-import <binary> [checksums.txt]`."
+)
+_VERSION_RE = re.compile(r"^\d+\.\d+\.\d+(?:[-+][0-9A-Za-z.-]+)?$")
 
 def get_platform_info() -> Tuple[str, str]:
     """
@@ -61,6 +82,92 @@ def get_cache_dir() -> Path:
     cache_dir.mkdir(parents=True, exist_ok=True)
     return cache_dir
 
+def get_state_dir(name: str) -> Path:
+    """Get a wrapper state directory (indexes, caches) next to the binary cache."""
+    state_dir = Path(user_cache_dir("capiscio", "capiscio")) / name
+    state_dir.mkdir(parents=True, exist_ok=True)
+    return state_dir
+
+def resolve_core_version(environ: Optional[dict] = None) -> str:
+    """The core version to use: CAPISCIO_CORE_VERSION if set (in environ, default os.environ), else CORE_VERSION."""
+    version = (os.environ if environ is None else environ).get(CORE_VERSION_ENV, "").strip()
+    if not version:
+        return CORE_VERSION
+    version = version[1:] if version.startswith("v") else version
+    # The version names a cache directory and a release URL, so only accept plain semver
+    if not _VERSION_RE.match(version):
+        raise RuntimeError(f"Invalid {CORE_VERSION_ENV} {version!r}; expected a release version such as 2.7.0")
+    return version
+
+def _version_tuple(version: str) -> tuple:
+    return tuple(int(part) for part in re.findall(r"\d+", version.split("-")[0].split("+")[0])[:3])
+
+def _update_state_path() -> Path:
+    return get_state_dir("update") / "latest.json"
+
+def _read_update_state() -> dict:
+    try:
+        with open(_update_state_path(), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def _write_update_state(state: dict) -> None:
+    write_json(_update_state_path(), state)
+
+def check_latest_release(timeout: float = 10) -> Optional[str]:
+    """Look up the latest core release on GitHub and record it in the cache dir."""
+    state = _read_update_state()
+    state["checkedAt"] = time.time()
+    try:
+        resp = requests.get(f"https://api.github.com/repos/{GITHUB_REPO}/releases/latest", timeout=timeout,
+                            headers={"Accept": "application/vnd.github+json"})
+        resp.raise_for_status()
+        state["latest"] = str(resp.json()["tag_name"]).lstrip("v")
+        state.pop("error", None)
+    except (requests.exceptions.RequestException, ValueError, KeyError) as e:
+        state["error"] = str(e)
+    _write_update_state(state)
+    return state.get("latest")
+
+def maybe_check_for_updates(current: str) -> None:
+    """
+    Opt-in (CAPISCIO_UPDATE_CHECK=1) update notice that never blocks on the network.
+
+    A notice is printed from the result cached by an earlier check. When that
+    result is older than the TTL, a detached background process refreshes it
+    for next time; the state file is stamped first so concurrent runs do not
+    start duplicate checks.
+    """
+    if os.environ.get(UPDATE_CHECK_ENV, "").lower() not in ("1", "true", "yes") or is_offline():
+        return
+    try:
+        ttl = float(os.environ.get(UPDATE_CHECK_TTL_ENV) or UPDATE_CHECK_TTL)
+    except ValueError:
+        ttl = UPDATE_CHECK_TTL
+    try:
+        state = _read_update_state()
+        latest = state.get("latest")
+        if latest and _version_tuple(latest) > _version_tuple(current):
+            Console(stderr=True).print(
+                f"[yellow]capiscio-core v{latest} is available (using v{current}); "
+                f"try it with {CORE_VERSION_ENV}={latest}[/yellow]"
+            )
+        if time.time() - state.get("checkedAt", 0) < ttl:
+            return
+        state["checkedAt"] = time.time()
+        _write_update_state(state)
+        kwargs = {"stdin": subprocess.DEVNULL, "stdout": subprocess.DEVNULL, "stderr": subprocess.DEVNULL,
+                  "close_fds": True}
+        if platform.system() == "Windows":
+            kwargs["creationflags"] = subprocess.DETACHED_PROCESS | subprocess.CREATE_NEW_PROCESS_GROUP
+        else:
+            kwargs["start_new_session"] = True
+        subprocess.Popen([sys.executable, "-c", "from capiscio.manager import check_latest_release; "
+                          "check_latest_release()"], **kwargs)
+    except Exception as e:
+        logger.debug(f"Update check skipped: {e}")
+
 def get_binary_path(version: str) -> Path:
     """Get the full path to the binary for a specific version."""
     os_name, arch_name = get_platform_info()
@@ -89,6 +196,8 @@ def _fetch_expected_checksum(version: str, filename: str) -> Tuple[Optional[str]
             logger.warning(f"Binary {filename} not found in checksums.txt")
             return None, "entry_missing"
     except requests.exceptions.RequestException as e:
+        if isinstance(e, NETWORK_ERRORS):
+            CircuitBreaker().failure(GITHUB_HOST, e)
         logger.warning(f"Could not fetch checksums.txt: {e}")
         return None, "fetch_failed"
 
@@ -104,6 +213,44 @@ def _verify_checksum(file_path: Path, expected_hash: str) -> bool:
         return False
     return True
 
+def _preallocate(f, size: int) -> None:
+    """Reserve size bytes for f up front so the download is written into one extent (best effort)."""
+    if size <= 0 or not hasattr(os, "posix_fallocate"):
+        return
+    try:
+        os.posix_fallocate(f.fileno(), 0, size)
+    except OSError as e:
+        logger.debug(f"posix_fallocate unavailable: {e}")
+
+def _stream_to_file(raw, f, on_progress=None, buffer_size: int = DOWNLOAD_BUFFER) -> int:
+    """
+    Copy a raw response stream into f through one reused buffer.
+
+    on_progress(bytes_so_far) is called at most every PROGRESS_INTERVAL
+    seconds, plus once at the end. Returns the number of bytes written.
+    urllib3 errors from the raw stream are raised as the requests exceptions
+    iter_content() would raise, so a dropped or stalled transfer is handled
+    (and counted by the breaker) like any other connection failure.
+    """
+    buf = bytearray(buffer_size)
+    view = memoryview(buf)
+    written = 0
+    last_update = time.monotonic()
+    try:
+        while n := raw.readinto(buf):
+            f.write(view[:n])
+            written += n
+            if on_progress is not None and time.monotonic() - last_update >= PROGRESS_INTERVAL:
+                on_progress(written)
+                last_update = time.monotonic()
+    except (ProtocolError, ReadTimeoutError) as e:
+        raise requests.exceptions.ConnectionError(e) from e
+    except DecodeError as e:
+        raise requests.exceptions.ContentDecodingError(e) from e
+    if on_progress is not None:
+        on_progress(written)
+    return written
+
 def download_binary(version: str) -> Path:
     """
     Download the binary for the current platform and version.
@@ -118,7 +265,15 @@ def download_binary(version: str) -> Path:
 
     # Construct URL
     # Assuming standard GitHub release naming convention
-    url = f"https://github.com/{GITHUB_REPO}/releases/download/v{version}/{filename}"
+    url = f"https://{GITHUB_HOST}/{GITHUB_REPO}/releases/download/v{version}/{filename}"
+
+    # Fail fast instead of waiting out the download timeout when offline or recently unreachable
+    breaker = CircuitBreaker()
+    try:
+        breaker.check(GITHUB_HOST)
+    except NetworkUnavailable as e:
+        raise NetworkUnavailable(f"capiscio-core v{version} is not cached and cannot be downloaded: {e}. "
+                                 f"{OFFLINE_HINT}") from None
     
     console.print(f"[cyan]Downloading CapiscIO Core v{version} for {os_name}/{arch_name}...[/cyan]")
     
@@ -137,10 +292,13 @@ def download_binary(version: str) -> Path:
             ) as progress:
                 task = progress.add_task(f"Downloading...", total=total_size)
                 
+                r.raw.decode_content = True
                 with open(target_path, 'wb') as f:
-                    for chunk in r.iter_content(chunk_size=8192):
-                        f.write(chunk)
-                        progress.update(task, advance=len(chunk))
+                    _preallocate(f, total_size)
+                    _stream_to_file(r.raw, f, lambda done: progress.update(task, completed=done))
+                    # Drop any preallocated tail (e.g. Content-Length of an encoded body)
+                    f.truncate()
+        breaker.success(GITHUB_HOST)
         
         # Verify checksum BEFORE making executable (security: validate before trust)
         #
@@ -195,28 +353,77 @@ def download_binary(version: str) -> Path:
     except requests.exceptions.RequestException as e:
         if target_path.exists():
             target_path.unlink()
+        if isinstance(e, NETWORK_ERRORS):
+            breaker.failure(GITHUB_HOST, e)
+            raise RuntimeError(f"Failed to download binary from {url}: {e}. {OFFLINE_HINT}")
         raise RuntimeError(f"Failed to download binary from {url}: {e}")
     except Exception as e:
         if target_path.exists():
             target_path.unlink()
         raise RuntimeError(f"Failed to install binary: {e}")
 
+def import_binary(source: Path, checksums: Optional[Path] = None, version: Optional[str] = None) -> Path:
+    """
+    Install a core binary obtained out of band (air-gapped hosts) into the cache.
+
+    The binary is verified against the release checksums.txt when one is given;
+    without it CAPISCIO_SKIP_CHECKSUM must be set, as for a normal download.
+    """
+    version = version or resolve_core_version()
+    target_path = get_binary_path(version)
+    if checksums is not None:
+        expected_hash = None
+        for line in Path(checksums).read_text(encoding="utf-8").splitlines():
+            parts = line.split()
+            if len(parts) == 2 and parts[1] == target_path.name:
+                expected_hash = parts[0]
+        if expected_hash is None:
+            raise RuntimeError(f"No entry for {target_path.name} in {checksums}")
+        if not _verify_checksum(Path(source), expected_hash):
+            raise RuntimeError(f"{source} does not match the checksum for {target_path.name} in {checksums}")
+    elif os.environ.get("CAPISCIO_SKIP_CHECKSUM", "").lower() not in ("1", "true", "yes"):
+        raise RuntimeError(
+            "Cannot verify binary integrity without checksums.txt. "
+            "Pass the release checksums.txt or set CAPISCIO_SKIP_CHECKSUM=true to bypass."
+        )
+
+    target_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = target_path.with_name(f"{target_path.name}.{os.getpid()}.tmp")
+    shutil.copyfile(source, tmp_path)
+    st = os.stat(tmp_path)
+    os.chmod(tmp_path, st.st_mode | stat.S_IEXEC)
+    os.replace(tmp_path, target_path)
+    return target_path
+
 def run_core(args: list[str]) -> int:
     """
     Ensure binary exists and run it with provided args.
     Returns exit code.
     """
     try:
-        binary_path = download_binary(CORE_VERSION)
+        version = resolve_core_version()
+        binary_path = download_binary(version)
+        maybe_check_for_updates(version)
         
         # Replace the current process with the binary
         # This is cleaner than subprocess for a wrapper
         if platform.system() == "Windows":
-            return subprocess.call([str(binary_path)] + args)
+            return process.run_inherited([str(binary_path)] + args)
         else:
             os.execv(str(binary_path), [str(binary_path)] + args)
             return 0 # Should not be reached
             
     except Exception as e:
-        console.print(f"[bold red]Error:[/bold red] {e}")
+        console.print(f"[bold red]Error:[/bold red] {escape(str(e))}")
         return 1
+
+def run_core_captured(args: list[str], version: Optional[str] = None) -> subprocess.CompletedProcess:
+    """
+    Run the core binary as a child process and capture its output.
+
+    Unlike run_core this never replaces the current process, so it is
+    suitable for wrapper-side modes (batch, watch) and library callers. The
+    child is started with posix_spawn where available (see capiscio.process).
+    """
+    binary_path = download_binary(version or resolve_core_version())
+    return process.run([str(binary_path)] + args)
@@ -0,0 +1,364 @@
+"""
+Fleet monitoring: scheduled live checks for many agents from one process.
+
+A fleet manifest lists agents with per-agent intervals and core flags. The
+scheduler spreads first runs across each interval, adds jitter to every
+later run, enforces a per-host token bucket so checks never burst the same
+host, and caps the number of concurrent core runs globally. Results are
+appended to an NDJSON stream as each check finishes; each record carries
+its start `timestamp` and a `finishedAt` that never decreases along the
+stream, which is what capiscio.sharding.merge orders shard outputs by.
+
+Manifest (JSON):
+
+    {
+      "concurrency": 8,
+      "jitter": 0.1,
+      "hostRate": 1.0,
+      "hostBurst": 2,
+      "defaults": {"interval": 300, "args": ["--test-live"]},
+      "agents": [
+        {"name": "billing", "url": "https://billing.example.com", "interval": 60}
+      ]
+    }
+"""
+import sys
+import json
+import time
+import heapq
+import hashlib
+import argparse
+import random
+import signal
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, IO, Optional
+from urllib.parse import urlsplit
+
+from rich.console import Console
+
+from capiscio.batch import CardResult, validate_card
+from capiscio.changes import ChangeTracker, DEFAULT_SNAPSHOT_INTERVAL
+from capiscio.fetch import CardCache
+from capiscio.limits import default_io_jobs
+from capiscio.manager import download_binary, get_state_dir, resolve_core_version
+from capiscio.sharding import parse_shard, select
+
+console = Console(stderr=True)
+logger = logging.getLogger(__name__)
+
+# Configuration
+DEFAULT_INTERVAL = 300.0
+DEFAULT_JITTER = 0.1       # fraction of the interval
+DEFAULT_HOST_RATE = 1.0    # checks per second per host
+DEFAULT_HOST_BURST = 2
+
+
+@dataclass
+class Agent:
+    """One monitored agent from the fleet manifest."""
+
+    name: str
+    target: str
+    interval: float = DEFAULT_INTERVAL
+    args: list[str] = field(default_factory=list)
+
+    @property
+    def host(self) -> str:
+        return urlsplit(self.target).netloc or self.target
+
+
+@dataclass
+class Fleet:
+    """Parsed fleet manifest."""
+
+    agents: list[Agent]
+    concurrency: int = 4
+    jitter: float = DEFAULT_JITTER
+    host_rate: float = DEFAULT_HOST_RATE
+    host_burst: int = DEFAULT_HOST_BURST
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Fleet":
+        defaults = data.get("defaults", {})
+        agents = []
+        names: set[str] = set()
+        for i, raw in enumerate(data.get("agents", [])):
+            target = raw.get("url") or raw.get("target")
+            if not target:
+                raise ValueError(f"agents[{i}] has no url")
+            name = raw.get("name") or target
+            # Records, stored results and change tracking are all keyed by name
+            if name in names:
+                raise ValueError(f"agents[{i}]: duplicate agent name {name!r}; give each entry a unique name")
+            names.add(name)
+            agents.append(Agent(
+                name=name,
+                target=target,
+                interval=float(raw.get("interval", defaults.get("interval", DEFAULT_INTERVAL))),
+                args=list(raw.get("args", defaults.get("args", []))),
+            ))
+        return cls(
+            agents=agents,
+            concurrency=int(data.get("concurrency", default_io_jobs())),
+            jitter=float(data.get("jitter", DEFAULT_JITTER)),
+            host_rate=float(data.get("hostRate", DEFAULT_HOST_RATE)),
+            host_burst=int(data.get("hostBurst", DEFAULT_HOST_BURST)),
+        )
+
+    @classmethod
+    def load(cls, path: Path) -> "Fleet":
+        with open(path, "r", encoding="utf-8") as f:
+            return cls.from_dict(json.load(f))
+
+
+class TokenBucket:
+    """Classic token bucket; refills at `rate` tokens/second up to `burst`."""
+
+    def __init__(self, rate: float, burst: int, now: float):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.tokens = float(self.burst)
+        self.updated = now
+
+    def take(self, now: float) -> float:
+        """Take a token if available; return 0, or the seconds until one is."""
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        if self.rate <= 0:
+            return float("inf")
+        return (1 - self.tokens) / self.rate
+
+
+_card_cache: Optional[CardCache] = None
+_card_cache_lock = threading.Lock()
+
+
+def shared_card_cache() -> CardCache:
+    """The conditional-GET card cache shared by all monitor workers."""
+    global _card_cache
+    with _card_cache_lock:
+        if _card_cache is None:
+            _card_cache = CardCache()
+        return _card_cache
+
+
+def default_check(agent: Agent) -> CardResult:
+    """Run a core validation for an agent with JSON output."""
+    args = list(agent.args)
+    if "--json" not in args:
+        args.append("--json")
+    return validate_card(agent.target, args, shared_card_cache())
+
+
+class ResultWriter:
+    """Appends one NDJSON record per finished check; safe to call from worker threads."""
+
+    def __init__(self, stream: IO[str]):
+        self.stream = stream
+        self._lock = threading.Lock()
+
+    def write(self, record: dict) -> None:
+        line = json.dumps(record, separators=(",", ":")) + "\n"
+        with self._lock:
+            self.stream.write(line)
+            self.stream.flush()
+
+
+class Monitor:
+    """
+    Schedules agent checks onto a bounded worker pool.
+
+    The scheduler thread only dispatches; it never blocks on a check. An
+    agent is never checked twice concurrently, and a host whose bucket is
+    empty has its checks deferred rather than queued behind the pool. The
+    sink is called for one record at a time, in finishedAt order. failed
+    counts the completed checks that did not pass.
+    """
+
+    def __init__(
+        self,
+        fleet: Fleet,
+        sink: Callable[[dict], None],
+        check: Callable[[Agent], CardResult] = default_check,
+        rng: Optional[random.Random] = None,
+        clock: Callable[[], float] = time.monotonic,
+        on_tick: Optional[Callable[[], None]] = None,
+    ):
+        self.fleet = fleet
+        self.sink = sink
+        self.on_tick = on_tick
+        self.check = check
+        self.rng = rng or random.Random()
+        self.clock = clock
+        self._buckets: dict[str, TokenBucket] = {}
+        self._slots = threading.BoundedSemaphore(max(1, fleet.concurrency))
+        self._wake = threading.Condition()
+        self._running: set[str] = set()
+        self._completed = 0
+        self.failed = 0
+        self._sink_lock = threading.Lock()
+        self._finished_at = 0.0
+
+    def _jittered(self, interval: float) -> float:
+        spread = interval * self.fleet.jitter
+        return max(0.0, interval + self.rng.uniform(-spread, spread))
+
+    def _bucket(self, host: str, now: float) -> TokenBucket:
+        bucket = self._buckets.get(host)
+        if bucket is None:
+            bucket = self._buckets[host] = TokenBucket(self.fleet.host_rate, self.fleet.host_burst, now)
+        return bucket
+
+    def _execute(self, agent: Agent) -> None:
+        started = time.time()
+        t0 = time.perf_counter()
+        try:
+            result = self.check(agent)
+        except Exception as e:
+            result = CardResult(agent.target, 1, "", f"{type(e).__name__}: {e}")
+        record = result.to_record()
+        record.update({
+            "agent": agent.name,
+            "timestamp": started,
+            "durationMs": round((time.perf_counter() - t0) * 1000, 3),
+        })
+        try:
+            with self._sink_lock:
+                # Stamped under the lock (and never stepping back) so the stream stays sorted
+                self._finished_at = max(self._finished_at, time.time())
+                record["finishedAt"] = self._finished_at
+                self.sink(record)
+        finally:
+            with self._wake:
+                self._running.discard(agent.name)
+                self._completed += 1
+                if result.returncode != 0:
+                    self.failed += 1
+                self._wake.notify_all()
+            self._slots.release()
+
+    def run(self, stop: Optional[threading.Event] = None, once: bool = False) -> int:
+        """
+        Run until stop is set (or, with once=True, until every agent ran once).
+
+        on_tick, if given, is called from the scheduler thread at least once
+        a second. Returns the number of completed checks.
+        """
+        stop = stop or threading.Event()
+        now = self.clock()
+        queue: list[tuple[float, int, Agent]] = []
+        for seq, agent in enumerate(self.fleet.agents):
+            # Spread first runs over the interval so the fleet does not fire in lockstep
+            first = 0.0 if once else self.rng.uniform(0, agent.interval)
+            heapq.heappush(queue, (now + first, seq, agent))
+        seq = len(queue)
+
+        with ThreadPoolExecutor(max_workers=max(1, self.fleet.concurrency), thread_name_prefix="capiscio-monitor") as pool:
+            while queue and not stop.is_set():
+                if self.on_tick is not None:
+                    self.on_tick()
+                due, _, agent = queue[0]
+                now = self.clock()
+                if due > now:
+                    with self._wake:
+                        self._wake.wait(min(due - now, 1.0))
+                    continue
+                heapq.heappop(queue)
+
+                if agent.name in self._running:
+                    heapq.heappush(queue, (now + min(1.0, agent.interval), seq, agent))
+                    seq += 1
+                    continue
+                wait = self._bucket(agent.host, now).take(now)
+                if wait > 0:
+                    heapq.heappush(queue, (now + wait, seq, agent))
+                    seq += 1
+                    continue
+                while not self._slots.acquire(timeout=0.5):
+                    if stop.is_set():
+                        break
+                if stop.is_set():
+                    break
+
+                with self._wake:
+                    self._running.add(agent.name)
+                pool.submit(self._execute, agent)
+                if not once:
+                    heapq.heappush(queue, (now + self._jittered(agent.interval), seq, agent))
+                    seq += 1
+        return self._completed
+
+
+def state_path_for(manifest: Path) -> Path:
+    """Change-tracker state file for a manifest, in the user cache dir."""
+    key = hashlib.sha256(str(manifest.resolve()).encode()).hexdigest()[:16]
+    return get_state_dir("monitor") / f"{key}.json"
+
+
+def run_monitor_cli(args: list[str]) -> int:
+    """Entry point for `capiscio monitor <manifest.json> [options]`."""
+    parser = argparse.ArgumentParser(prog="capiscio monitor", description="Scheduled checks for a fleet of agents.")
+    parser.add_argument("manifest", type=Path, help="fleet manifest (JSON)")
+    parser.add_argument("--once", action="store_true", help="check every agent once, then exit")
+    parser.add_argument("--output", help="append NDJSON records to this file instead of stdout")
+    parser.add_argument("--store", nargs="?", const="", metavar="DB", help="also persist results to the results store")
+    parser.add_argument("--changes-only", action="store_true",
+                        help="emit only transitions (failures, recoveries, trust or issue changes)")
+    parser.add_argument("--shard", metavar="i/N", help="only monitor the agents rendezvous-hashed to shard i of N")
+    parser.add_argument("--snapshot-interval", type=float, default=DEFAULT_SNAPSHOT_INTERVAL, metavar="SECONDS",
+                        help="with --changes-only, emit a full state snapshot this often")
+    opts = parser.parse_args(args)
+
+    try:
+        fleet = Fleet.load(opts.manifest)
+        if opts.shard:
+            fleet.agents = select(fleet.agents, parse_shard(opts.shard), key=lambda agent: agent.name)
+        download_binary(resolve_core_version())
+    except Exception as e:
+        console.print(f"[bold red]Error:[/bold red] {e}")
+        return 1
+
+    stream = open(opts.output, "a", encoding="utf-8") if opts.output else sys.stdout
+    writer = ResultWriter(stream)
+    store = None
+    if opts.store is not None:
+        from capiscio.store import ResultStore
+        store = ResultStore(Path(opts.store) if opts.store else None)
+
+    def sink(record: dict) -> None:
+        writer.write(record)
+        if store is not None and not record.get("snapshot"):
+            store.add_record(record)
+
+    tracker = None
+    if opts.changes_only:
+        tracker = ChangeTracker(state_path_for(opts.manifest), snapshot_interval=opts.snapshot_interval)
+        sink = tracker.filter(sink)
+    stop = threading.Event()
+    previous_sigterm = None
+    if threading.current_thread() is threading.main_thread():
+        # Stop like Ctrl-C so in-flight checks finish and the store and tracker are saved below
+        previous_sigterm = signal.signal(signal.SIGTERM, lambda signum, frame: stop.set())
+    try:
+        monitor = Monitor(fleet, sink, on_tick=store.flush_if_due if store is not None else None)
+        console.print(f"[cyan]Monitoring {len(fleet.agents)} agent(s), concurrency {fleet.concurrency}[/cyan]")
+        monitor.run(stop=stop, once=opts.once)
+        return 1 if opts.once and monitor.failed else 0
+    except KeyboardInterrupt:
+        return 0
+    finally:
+        if previous_sigterm is not None:
+            signal.signal(signal.SIGTERM, previous_sigterm)
+        if tracker is not None:
+            tracker.save()
+        if store is not None:
+            store.close()
+        if opts.output:
+            stream.close()
@@ -0,0 +1,95 @@
+"""
+Cheap Python-side rejection of inputs that cannot be agent cards.
+
+Empty, truncated and non-JSON files would otherwise each cost a full core
+launch just to be rejected. check_file() decides from a single parse (orjson when installed, else the stdlib) whether a card is
+worth sending to the core, and render() formats a rejection like the core's
+own output for the same flags, so callers can emit it immediately.
+
+The check only rejects what the core is certain to reject as well: inputs
+it is unsure about (undecodable UTF-8, pathological nesting, unreadable
+files) are passed through so the core reports them itself. Local files have
+no size limit here; only remote fetches are capped (capiscio.fetch).
+"""
+import json
+import logging
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+try:
+    import orjson
+    # Older releases use a recursive parser that crashes on deeply nested input
+    if tuple(int(p) for p in orjson.__version__.split(".")[:2]) < (3, 9):
+        orjson = None
+except (ImportError, ValueError):  # optional: pip install capiscio[fast]
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE = b" \t\r\n"
+
+
+@dataclass(frozen=True, slots=True)
+class Rejection:
+    """Why an input was rejected without running the core."""
+
+    code: str
+    message: str
+
+
+def _loads(data: bytes):
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def check_bytes(data: bytes) -> Optional[Rejection]:
+    """Return a Rejection if data cannot be an agent card, else None."""
+    stripped = data.strip(_WHITESPACE)
+    if not stripped:
+        return Rejection("EMPTY_CARD", "agent card is empty")
+    if stripped[:1] != b"{":
+        try:
+            stripped.decode("utf-8")
+        except UnicodeDecodeError:
+            return None
+        return Rejection("INVALID_JSON", "agent card is not a JSON object")
+    try:
+        value = _loads(data)
+    except ValueError as e:
+        try:
+            data.decode("utf-8")
+        except UnicodeDecodeError:
+            return None
+        return Rejection("INVALID_JSON", f"agent card is not valid JSON: {e}")
+    except RecursionError:
+        return None
+    if not isinstance(value, dict):
+        return Rejection("INVALID_JSON", "agent card is not a JSON object")
+    return None
+
+
+def check_file(path: Path) -> Optional[Rejection]:
+    """check_bytes() for a file; unreadable files are left to the core."""
+    try:
+        data = path.read_bytes()
+    except OSError as e:
+        logger.debug(f"Leaving {path} to the core: {e}")
+        return None
+    return check_bytes(data)
+
+
+def render(rejection: Rejection, core_args: list[str], target: Optional[str] = None) -> tuple[str, str]:
+    """
+    (stdout, stderr) for a rejection, matching the core's output for the given flags.
+
+    The text form names target, so a rejection among many batch results
+    can be traced to its card.
+    """
+    if "--json" in core_args:
+        report = {"success": False, "errors": [{"code": rejection.code, "message": rejection.message}]}
+        return json.dumps(report) + "\n", ""
+    if target:
+        return "", f"Error: {target}: {rejection.message}\n"
+    return "", f"Error: {rejection.message}\n"
@@ -0,0 +1,532 @@
+"""
+Non-exec launch of capiscio-core for library callers and wrapper-side modes.
+
+Children are started with os.posix_spawn, which glibc implements with
+CLONE_VM|CLONE_VFORK: the parent's page tables are never copied, so spawn
+latency does not grow with the caller's RSS. Platforms without posix_spawn
+(Windows) fall back to subprocess.Popen, and because Windows cannot
+select() on pipes, their output is drained by one reader thread per pipe.
+
+Each output stream is handled in one of three modes:
+
+- CAPTURE: drained on a background thread into a bounded buffer.
+- RELAY:   forwarded to a parent fd on a background thread, with os.splice
+           where the kernel supports it and a reused buffer otherwise, so
+           the output never accumulates in Python.
+- PIPE:    left for the caller to consume incrementally (iter_lines,
+           iter_records).
+
+Every child's resource use (wall time, and where the platform reports it,
+CPU time and peak RSS from wait4) is recorded as a ResourceUsage, optionally
+with periodic /proc/<pid> samples. With CAPISCIO_TRACE set, one JSON line
+per finished child is written to stderr ("1") or appended to the named file.
+"""
+import os
+import sys
+import json
+import errno
+import logging
+import select
+import selectors
+import subprocess
+import time
+import threading
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+DEFAULT_MAX_OUTPUT = 16 * 1024 * 1024  # per stream; output beyond this is counted and dropped
+READ_SIZE = 65536
+
+CAPTURE = "capture"
+RELAY = "relay"
+PIPE = "pipe"
+
+HAVE_POSIX_SPAWN = hasattr(os, "posix_spawn") and sys.platform != "win32"
+HAVE_SPLICE = hasattr(os, "splice")
+HAVE_WAIT4 = hasattr(os, "wait4")
+HAVE_READV = hasattr(os, "readv")
+HAVE_PIPE_SELECT = sys.platform != "win32"  # select() on Windows only accepts sockets
+HAVE_PROC = os.path.isdir("/proc/self")
+
+MAX_SAMPLES = 512  # most recent /proc samples kept per child
+TRACE_ENV = "CAPISCIO_TRACE"
+SAMPLE_ENV = "CAPISCIO_TRACE_INTERVAL"  # seconds between /proc samples; unset or 0 disables
+
+
+@dataclass(slots=True)
+class ResourceUsage:
+    """Resources used by one child; CPU and RSS are None where the platform does not report them."""
+
+    wall_ms: float
+    user_ms: Optional[float] = None
+    sys_ms: Optional[float] = None
+    max_rss_kb: Optional[int] = None
+    samples: list = field(default_factory=list)  # (elapsed_ms, rss_kb, cpu_ms)
+
+    @classmethod
+    def from_rusage(cls, wall_ms: float, rusage) -> "ResourceUsage":
+        # ru_maxrss is KiB on Linux and bytes on macOS
+        max_rss = rusage.ru_maxrss // 1024 if sys.platform == "darwin" else rusage.ru_maxrss
+        return cls(wall_ms, rusage.ru_utime * 1000, rusage.ru_stime * 1000, int(max_rss))
+
+    def to_dict(self) -> dict:
+        data = {"wallMs": round(self.wall_ms, 3)}
+        if self.user_ms is not None:
+            data.update({"userMs": round(self.user_ms, 3), "sysMs": round(self.sys_ms, 3), "maxRssKb": self.max_rss_kb})
+        if self.samples:
+            data["samples"] = [[round(t, 1), rss, round(cpu, 1)] for t, rss, cpu in self.samples]
+        return data
+
+
+class _Sampler:
+    """Samples RSS and CPU time of a child from /proc/<pid>/stat until stopped."""
+
+    def __init__(self, pid: int, interval: float, started: float):
+        self.pid = pid
+        self.interval = interval
+        self.started = started
+        self.samples: deque = deque(maxlen=MAX_SAMPLES)
+        self._page_kb = os.sysconf("SC_PAGE_SIZE") // 1024
+        self._tick_ms = 1000 / os.sysconf("SC_CLK_TCK")
+        self._done = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"capiscio-sample-{pid}", daemon=True)
+        self._thread.start()
+
+    def _read(self) -> Optional[tuple[str, int, int, float]]:
+        try:
+            with open(f"/proc/{self.pid}/stat", "rb") as f:
+                fields = f.read().rsplit(b")", 1)[1].split()
+        except (OSError, IndexError):
+            return None
+        # state, starttime (identifies this process if the pid is reused), rss pages, utime+stime ticks
+        return fields[0].decode(), int(fields[19]), int(fields[21]) * self._page_kb, \
+            (int(fields[11]) + int(fields[12])) * self._tick_ms
+
+    def _run(self) -> None:
+        identity = None
+        while not self._done.wait(self.interval):
+            stat = self._read()
+            if stat is None or stat[0] == "Z" or (identity is not None and stat[1] != identity):
+                return
+            identity = stat[1]
+            self.samples.append(((time.perf_counter() - self.started) * 1000, stat[2], stat[3]))
+
+    def stop(self) -> list:
+        self._done.set()
+        self._thread.join()
+        return list(self.samples)
+
+
+def _sample_interval(interval: Optional[float]) -> float:
+    if interval is None:
+        try:
+            interval = float(os.environ.get(SAMPLE_ENV) or 0)
+        except ValueError:
+            interval = 0.0
+    return interval if HAVE_PROC else 0.0
+
+
+def trace(argv: list[str], returncode: int, usage: ResourceUsage) -> None:
+    """Emit a trace record for a finished child if CAPISCIO_TRACE is set."""
+    target = os.environ.get(TRACE_ENV, "")
+    if not target or target.lower() in ("0", "false", "no"):
+        return
+    line = json.dumps({
+        "event": "core-exit",
+        "timestamp": time.time(),
+        "argv": [os.path.basename(argv[0])] + argv[1:],
+        "exitCode": returncode,
+        "usage": usage.to_dict(),
+    }, separators=(",", ":")) + "\n"
+    try:
+        if target.lower() in ("1", "true", "yes", "stderr"):
+            sys.stderr.write(line)
+            sys.stderr.flush()
+        else:
+            with open(target, "a", encoding="utf-8") as f:
+                f.write(line)
+    except OSError as e:
+        logger.debug(f"Could not write trace record: {e}")
+
+
+class BoundedBuffer:
+    """Keeps the first max_bytes written to it and counts the rest."""
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_OUTPUT):
+        self.max_bytes = max_bytes
+        self._chunks: list[bytes] = []
+        self._size = 0
+        self.dropped = 0
+
+    def write(self, data: bytes) -> None:
+        room = self.max_bytes - self._size
+        if room > 0:
+            kept = data[:room]
+            self._chunks.append(kept)
+            self._size += len(kept)
+        self.dropped += max(0, len(data) - max(room, 0))
+
+    @property
+    def truncated(self) -> bool:
+        return self.dropped > 0
+
+    def getvalue(self) -> bytes:
+        return b"".join(self._chunks)
+
+
+def _readinto(fd: int, buf: bytearray) -> int:
+    """Read up to len(buf) bytes from fd into buf; os.readv where available (not on Windows)."""
+    if HAVE_READV:
+        return os.readv(fd, [buf])
+    data = os.read(fd, len(buf))
+    buf[:len(data)] = data
+    return len(data)
+
+
+def _wait_writable(fd: int) -> None:
+    if HAVE_PIPE_SELECT:
+        select.select([], [fd], [], 1.0)
+    else:
+        time.sleep(0.01)
+
+
+class _Relay:
+    """Copies everything readable from a pipe to a destination fd without building Python bytes."""
+
+    def __init__(self, dst_fd: int):
+        self.dst_fd = dst_fd
+        self.use_splice = HAVE_SPLICE
+        self._buf = bytearray(READ_SIZE)
+        self._view = memoryview(self._buf)
+
+    def pump(self, src_fd: int) -> int:
+        """Move one chunk; return the number of bytes moved (0 on EOF)."""
+        while self.use_splice:
+            try:
+                return os.splice(src_fd, self.dst_fd, READ_SIZE)
+            except BlockingIOError:
+                # Non-blocking destination (e.g. a shared terminal) is full
+                _wait_writable(self.dst_fd)
+            except OSError as e:
+                if e.errno not in (errno.EINVAL, errno.ENOSYS, errno.EBADF):
+                    raise
+                # Destination cannot be spliced into (e.g. some ttys); use the buffer path
+                self.use_splice = False
+        n = _readinto(src_fd, self._buf)
+        written = 0
+        while written < n:
+            try:
+                written += os.write(self.dst_fd, self._view[written:n])
+            except BlockingIOError:
+                _wait_writable(self.dst_fd)
+        return n
+
+
+class CoreProcess:
+    """
+    A running child with stdout/stderr handled per CAPTURE, RELAY or PIPE mode.
+
+    Use spawn() to create one, then wait() for the exit status. Captured output
+    is available from .stdout / .stderr; PIPE'd stdout is consumed with
+    iter_lines() or iter_records() before calling wait().
+    """
+
+    def __init__(
+        self,
+        argv: list[str],
+        stdout: str = CAPTURE,
+        stderr: str = CAPTURE,
+        max_output: int = DEFAULT_MAX_OUTPUT,
+        env: Optional[dict] = None,
+        relay_fds: tuple[int, int] = (1, 2),
+        sample_interval: Optional[float] = None,
+    ):
+        if stderr == PIPE:
+            raise ValueError("stderr cannot be PIPE'd; use CAPTURE or RELAY")
+        self.argv = argv
+        self.max_output = max_output
+        self.returncode: Optional[int] = None
+        self.usage: Optional[ResourceUsage] = None
+        self.stdout_buffer = BoundedBuffer(max_output)
+        self.stderr_buffer = BoundedBuffer(max_output)
+        self.stdout_fd: Optional[int] = None
+        self._popen: Optional[subprocess.Popen] = None
+        out_r, out_w = os.pipe()
+        err_r, err_w = os.pipe()
+        self._started = time.perf_counter()
+        try:
+            if HAVE_POSIX_SPAWN:
+                self.pid = self._posix_spawn(argv, out_w, err_w, env)
+            else:
+                self._popen = subprocess.Popen(argv, stdin=subprocess.DEVNULL, stdout=out_w, stderr=err_w, env=env)
+                self.pid = self._popen.pid
+        except BaseException:
+            for fd in (out_r, err_r):
+                os.close(fd)
+            raise
+        finally:
+            os.close(out_w)
+            os.close(err_w)
+        self._drain_error: Optional[OSError] = None
+        interval = _sample_interval(sample_interval)
+        self._sampler = _Sampler(self.pid, interval, self._started) if interval > 0 else None
+
+        handlers = {err_r: self._guard(self._handler(stderr, self.stderr_buffer, relay_fds[1]))}
+        if stdout == PIPE:
+            self.stdout_fd = out_r
+        else:
+            handlers[out_r] = self._guard(self._handler(stdout, self.stdout_buffer, relay_fds[0]))
+        self._drainer = threading.Thread(
+            target=self._drain, args=(handlers,), name=f"capiscio-drain-{self.pid}", daemon=True
+        )
+        self._drainer.start()
+
+    @staticmethod
+    def _posix_spawn(argv: list[str], out_w: int, err_w: int, env: Optional[dict]) -> int:
+        # Pipe fds are created non-inheritable, so only the dup2'd copies reach the child
+        file_actions = [
+            (os.POSIX_SPAWN_OPEN, 0, os.devnull, os.O_RDONLY, 0),
+            (os.POSIX_SPAWN_DUP2, out_w, 1),
+            (os.POSIX_SPAWN_DUP2, err_w, 2),
+        ]
+        return os.posix_spawn(argv[0], argv, os.environ if env is None else env, file_actions=file_actions)
+
+    @staticmethod
+    def _handler(mode: str, buffer: BoundedBuffer, relay_fd: int):
+        if mode == RELAY:
+            return _Relay(relay_fd).pump
+
+        def capture(fd: int) -> int:
+            data = os.read(fd, READ_SIZE)
+            buffer.write(data)
+            return len(data)
+        return capture
+
+    def _guard(self, handler):
+        """
+        Wrap a handler so an OSError (e.g. EPIPE relaying into `| head`) is
+        kept for wait() to raise, and the pipe is read into the void from then
+        on: the child must never block on a pipe nobody reads.
+        """
+        failed = False
+
+        def pump(fd: int) -> int:
+            nonlocal failed
+            if not failed:
+                try:
+                    return handler(fd)
+                except OSError as e:
+                    failed = True
+                    if self._drain_error is None:
+                        self._drain_error = e
+            return len(os.read(fd, READ_SIZE))
+        return pump
+
+    @staticmethod
+    def _drain(handlers: dict) -> None:
+        if not HAVE_PIPE_SELECT:
+            readers = [
+                threading.Thread(target=CoreProcess._drain_one, args=(fd, handler), daemon=True)
+                for fd, handler in handlers.items()
+            ]
+            for reader in readers:
+                reader.start()
+            for reader in readers:
+                reader.join()
+            return
+        with selectors.DefaultSelector() as sel:
+            for fd in handlers:
+                sel.register(fd, selectors.EVENT_READ)
+            while handlers:
+                for key, _ in sel.select():
+                    if handlers[key.fd](key.fd) == 0:
+                        sel.unregister(key.fd)
+                        os.close(key.fd)
+                        del handlers[key.fd]
+
+    @staticmethod
+    def _drain_one(fd: int, handler) -> None:
+        try:
+            while handler(fd):
+                pass
+        finally:
+            os.close(fd)
+
+    def iter_chunks(self) -> Iterator[bytes]:
+        """Yield raw stdout chunks as the child produces them."""
+        if self.stdout_fd is None:
+            raise ValueError("stdout was not spawned in PIPE mode")
+        try:
+            while True:
+                data = os.read(self.stdout_fd, READ_SIZE)
+                if not data:
+                    return
+                yield data
+        finally:
+            os.close(self.stdout_fd)
+            self.stdout_fd = None
+
+    def iter_lines(self) -> Iterator[bytes]:
+        """
+        Yield stdout lines (without the newline) as the child produces them.
+
+        Only one READ_SIZE buffer plus the current partial line is held at a
+        time; a single line longer than max_output raises ValueError.
+        """
+        if self.stdout_fd is None:
+            raise ValueError("stdout was not spawned in PIPE mode")
+        buf = bytearray(READ_SIZE)
+        view = memoryview(buf)
+        pending = bytearray()
+        try:
+            while True:
+                n = _readinto(self.stdout_fd, buf)
+                if n == 0:
+                    break
+                chunk = view[:n]
+                start = 0
+                while True:
+                    nl = buf.find(b"\n", start, n)
+                    if nl < 0:
+                        break
+                    if pending:
+                        pending += chunk[start:nl]
+                        yield bytes(pending)
+                        pending.clear()
+                    else:
+                        yield bytes(chunk[start:nl])
+                    start = nl + 1
+                pending += chunk[start:n]
+                if len(pending) > self.max_output:
+                    raise ValueError(f"stdout line exceeds {self.max_output} bytes")
+            if pending:
+                yield bytes(pending)
+        finally:
+            os.close(self.stdout_fd)
+            self.stdout_fd = None
+
+    def iter_records(self) -> Iterator[dict]:
+        """Yield one decoded JSON value per non-blank stdout line (NDJSON)."""
+        for line in self.iter_lines():
+            if line.strip():
+                yield json.loads(line)
+
+    def wait(self, timeout: Optional[float] = None) -> int:
+        """
+        Wait for the child to exit and its output to be drained; return the exit code.
+
+        With a timeout, subprocess.TimeoutExpired is raised if the child is
+        still running after that many seconds; it is not killed, and wait()
+        may be called again. An OSError hit while relaying (e.g.
+        BrokenPipeError when our stdout was closed early) is raised here,
+        after returncode and usage are set.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        if self.stdout_fd is not None:
+            # PIPE'd stdout that the caller did not consume: discard it so the child cannot block
+            while True:
+                if deadline is not None and HAVE_PIPE_SELECT:
+                    remaining = max(0.0, deadline - time.monotonic())
+                    if not select.select([self.stdout_fd], [], [], remaining)[0]:
+                        raise subprocess.TimeoutExpired(self.argv, timeout)
+                if not os.read(self.stdout_fd, READ_SIZE):
+                    break
+            os.close(self.stdout_fd)
+            self.stdout_fd = None
+        if self.returncode is None:
+            rusage = None
+            if self._popen is not None:
+                self.returncode = self._popen.wait(None if deadline is None else max(0.0, deadline - time.monotonic()))
+            else:
+                status, rusage = self._reap(deadline, timeout)
+                self.returncode = os.waitstatus_to_exitcode(status)
+            wall_ms = (time.perf_counter() - self._started) * 1000
+            self.usage = ResourceUsage.from_rusage(wall_ms, rusage) if rusage else ResourceUsage(wall_ms)
+            if self._sampler is not None:
+                self.usage.samples = self._sampler.stop()
+            trace(self.argv, self.returncode, self.usage)
+        self._drainer.join()
+        if self.stdout_buffer.truncated or self.stderr_buffer.truncated:
+            logger.warning(
+                f"Output of {os.path.basename(self.argv[0])} truncated "
+                f"(dropped {self.stdout_buffer.dropped + self.stderr_buffer.dropped} bytes)"
+            )
+        if self._drain_error is not None:
+            raise self._drain_error
+        return self.returncode
+
+    def _reap(self, deadline: Optional[float], timeout: Optional[float]) -> tuple:
+        """(status, rusage) of the exited child; polls with WNOHANG until deadline when one is given."""
+        flags = 0 if deadline is None else os.WNOHANG
+        delay = 0.001
+        while True:
+            if HAVE_WAIT4:
+                pid, status, rusage = os.wait4(self.pid, flags)
+            else:
+                (pid, status), rusage = os.waitpid(self.pid, flags), None
+            if pid:
+                return status, rusage
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise subprocess.TimeoutExpired(self.argv, timeout)
+            time.sleep(min(delay, remaining))
+            delay = min(delay * 2, 0.05)
+
+    @property
+    def stdout(self) -> bytes:
+        return self.stdout_buffer.getvalue()
+
+    @property
+    def stderr(self) -> bytes:
+        return self.stderr_buffer.getvalue()
+
+
+def spawn(
+    argv: list[str],
+    stdout: str = CAPTURE,
+    stderr: str = CAPTURE,
+    max_output: int = DEFAULT_MAX_OUTPUT,
+    env: Optional[dict] = None,
+    sample_interval: Optional[float] = None,
+) -> CoreProcess:
+    """Start argv with stdin from /dev/null and stdout/stderr handled per mode."""
+    return CoreProcess(argv, stdout=stdout, stderr=stderr, max_output=max_output, env=env,
+                       sample_interval=sample_interval)
+
+
+def run(argv: list[str], max_output: int = DEFAULT_MAX_OUTPUT, env: Optional[dict] = None,
+        sample_interval: Optional[float] = None) -> subprocess.CompletedProcess:
+    """Run argv to completion and return a text-mode CompletedProcess with a .usage attribute."""
+    proc = spawn(argv, max_output=max_output, env=env, sample_interval=sample_interval)
+    returncode = proc.wait()
+    completed = subprocess.CompletedProcess(
+        args=argv,
+        returncode=returncode,
+        stdout=proc.stdout.decode("utf-8", errors="replace"),
+        stderr=proc.stderr.decode("utf-8", errors="replace"),
+    )
+    completed.usage = proc.usage
+    return completed
+
+
+def run_relayed(argv: list[str], env: Optional[dict] = None) -> int:
+    """Run argv to completion, streaming its stdout/stderr to ours; return the exit code."""
+    sys.stdout.flush()
+    sys.stderr.flush()
+    return spawn(argv, stdout=RELAY, stderr=RELAY, env=env).wait()
+
+
+def run_inherited(argv: list[str]) -> int:
+    """
+    Run argv with our stdio handles inherited and return its exit code.
+
+    Used where exec is unavailable (Windows); only wall time is recorded there.
+    """
+    started = time.perf_counter()
+    returncode = subprocess.call(argv)
+    trace(argv, returncode, ResourceUsage((time.perf_counter() - started) * 1000))
+    return returncode
@@ -0,0 +1,228 @@
+"""
+pytest plugin for suites that validate agent cards and badges.
+
+Registered through the `pytest11` entry point, so it is active wherever the
+package is installed. Instead of one `subprocess.run(["capiscio", ...])` per
+assertion, tests use the session-scoped `capiscio` fixture:
+
+    def test_card(capiscio):
+        result = capiscio.validate("agent-card.json", "--schema-only")
+        assert result.success, result.errors
+
+The core binary is installed once per session under a file lock, so
+pytest-xdist workers do not race on the first download, and every core run
+goes straight to the binary instead of through the wrapper CLI. Results are
+cached by card content, core version and flags in pytest's cache directory,
+so unchanged cards are not re-validated across tests, workers or runs
+(disable with --capiscio-no-cache; `pytest --cache-clear` drops them).
+
+The plugin loads in every pytest session of an environment that has the
+package installed, so only the standard library and pytest are imported at
+module level; the wrapper (and requests, rich, ...) is imported by the
+fixtures and runner methods that need it.
+"""
+import os
+import sys
+import json
+import hashlib
+import tempfile
+import subprocess
+from contextlib import contextmanager
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Iterable, Iterator, Optional, Union
+
+import pytest
+
+from capiscio.files import write_json
+
+if TYPE_CHECKING:
+    from capiscio.badges import Badge, BadgeVerification
+    from capiscio.results import ValidationResult
+
+# Configuration
+CACHE_NAME = "capiscio"
+CACHE_FORMAT = 1
+
+Card = Union[str, os.PathLike, dict]
+
+
+@contextmanager
+def file_lock(path: Path) -> Iterator[None]:
+    """Exclusive inter-process lock on path, held for the duration of the block."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "a+b") as f:
+        if sys.platform == "win32":
+            import msvcrt
+            f.seek(0)
+            # LK_LOCK retries for ~10s before failing, so loop until acquired
+            while True:
+                try:
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    pass
+            try:
+                yield
+            finally:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+def install_core(version: Optional[str] = None) -> Path:
+    """Install the core binary once, even when several processes ask concurrently."""
+    from capiscio.manager import download_binary, get_state_dir, resolve_core_version
+
+    version = version or resolve_core_version()
+    with file_lock(get_state_dir("locks") / f"install-{version}.lock"):
+        return download_binary(version)
+
+
+class CapiscioRunner:
+    """Runs capiscio-core directly for tests, with a content-addressed result cache."""
+
+    def __init__(self, binary: Path, version: str, cache_dir: Optional[Path] = None):
+        self.binary = Path(binary)
+        self.version = version
+        self.cache_dir = cache_dir
+        if cache_dir is not None:
+            cache_dir.mkdir(parents=True, exist_ok=True)
+
+    def _key(self, data: bytes, args: list[str]) -> str:
+        digest = hashlib.sha256(data).hexdigest()
+        return hashlib.sha256(json.dumps([CACHE_FORMAT, digest, self.version, args]).encode()).hexdigest()[:32]
+
+    def _load(self, key: str) -> Optional[dict]:
+        if self.cache_dir is None:
+            return None
+        try:
+            with open(self.cache_dir / f"{key}.json", "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _store(self, key: str, record: dict) -> None:
+        if self.cache_dir is None:
+            return
+        write_json(self.cache_dir / f"{key}.json", record)
+
+    def run(self, *args: str) -> subprocess.CompletedProcess:
+        """Run the core with args and capture its output (no caching)."""
+        from capiscio import process
+
+        return process.run([str(self.binary)] + list(args))
+
+    def validate(self, card: Card, *args: str) -> "ValidationResult":
+        """
+        Validate a card file, or a card given as a dict, and return the parsed result.
+
+        `--json` is added to the core flags if missing. Remote (http/https)
+        targets are always validated live and never cached.
+        """
+        args = list(args) if "--json" in args else list(args) + ["--json"]
+        if isinstance(card, str) and card.startswith(("http://", "https://")):
+            return self._parse(card, self._record(self.run("validate", card, *args)), cached=False)
+
+        if isinstance(card, dict):
+            target, data = None, json.dumps(card, sort_keys=True).encode()
+        else:
+            target = str(card)
+            data = Path(card).read_bytes()
+        key = self._key(data, args)
+        record = self._load(key)
+        if record is not None:
+            return self._parse(target, record, cached=True)
+        from capiscio.precheck import check_bytes, render
+
+        rejection = check_bytes(data)
+        if rejection is not None:
+            stdout, stderr = render(rejection, args, target)
+            return self._parse(target, {"returncode": 1, "stdout": stdout, "stderr": stderr}, cached=False)
+
+        if target is None:
+            fd, tmp = tempfile.mkstemp(suffix=".json", prefix="agent-card-")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    f.write(data)
+                proc = self.run("validate", tmp, *args)
+            finally:
+                os.unlink(tmp)
+        else:
+            proc = self.run("validate", target, *args)
+        record = self._record(proc)
+        self._store(key, record)
+        return self._parse(target, record, cached=False)
+
+    def validate_many(self, cards: Iterable[Card], *args: str, jobs: Optional[int] = None) -> list["ValidationResult"]:
+        """Validate cards concurrently; results are returned in input order."""
+        from concurrent.futures import ThreadPoolExecutor
+        from capiscio.limits import default_jobs
+
+        with ThreadPoolExecutor(max_workers=jobs or default_jobs()) as pool:
+            return list(pool.map(lambda card: self.validate(card, *args), cards))
+
+    @staticmethod
+    def _record(proc: subprocess.CompletedProcess) -> dict:
+        return {"returncode": proc.returncode, "stdout": proc.stdout, "stderr": proc.stderr}
+
+    @staticmethod
+    def _parse(target: Optional[str], record: dict, cached: bool) -> "ValidationResult":
+        from capiscio.results import Issue, ValidationResult, iter_results
+
+        returncode, stdout, stderr = record["returncode"], record["stdout"], record["stderr"]
+        try:
+            result = next(iter_results([stdout]), None)
+        except ValueError:
+            result = None
+        if result is None:
+            # Non-JSON output (e.g. a crash or a malformed card): fall back to the exit code
+            result = ValidationResult(target=target, success=returncode == 0)
+        result.target = target or result.target
+        result.exit_code = returncode
+        result.cached = cached
+        if not result.success and not result.issues and stderr.strip():
+            result.issues = (Issue("error", stderr.strip()),)
+        return result
+
+    def issue_badge(self, **spec: Any) -> "Badge":
+        """Issue a badge; keyword arguments are BadgeSpec fields (self_sign defaults to True)."""
+        from capiscio.badges import BadgeSpec, issue_badge
+
+        spec.setdefault("self_sign", True)
+        return issue_badge(BadgeSpec(**spec))
+
+    def verify_badge(self, token: str, **options: Any) -> "BadgeVerification":
+        """Verify a badge through the shared verification cache (see capiscio.badges.verify_badge)."""
+        from capiscio.badges import verify_badge
+
+        return verify_badge(token, **options)
+
+
+def pytest_addoption(parser: pytest.Parser) -> None:
+    group = parser.getgroup("capiscio")
+    group.addoption("--capiscio-no-cache", action="store_true", default=False,
+                    help="re-run capiscio-core for every validation instead of reusing cached results")
+
+
+@pytest.fixture(scope="session")
+def capiscio_binary() -> Path:
+    """Path to the capiscio-core binary, installed once per session."""
+    return install_core()
+
+
+@pytest.fixture(scope="session")
+def capiscio(request: pytest.FixtureRequest, capiscio_binary: Path) -> CapiscioRunner:
+    """Session-wide CapiscioRunner for validating cards and issuing/verifying badges."""
+    from capiscio.manager import get_state_dir, resolve_core_version
+
+    cache_dir = None
+    if not request.config.getoption("capiscio_no_cache"):
+        cache = getattr(request.config, "cache", None)
+        cache_dir = cache.mkdir(CACHE_NAME) if cache is not None else get_state_dir("pytest")
+    return CapiscioRunner(capiscio_binary, resolve_core_version(), cache_dir)
@@ -0,0 +1,250 @@
+"""
+Typed results model and streaming parser for core `--json` output.
+
+The parser consumes NDJSON or concatenated (including pretty-printed) JSON
+documents from a stream and yields them one at a time, so batch output can be
+filtered and aggregated without holding a full report in memory. Results are
+mapped onto small __slots__ dataclasses; repeated strings such as issue codes
+and severities are interned.
+
+The mapping is deliberately tolerant: capiscio-core's JSON shape has varied
+across releases (success/valid, errors/warnings vs issues, trustLevel vs
+trust_level), and unknown fields are ignored.
+"""
+import sys
+import json
+import codecs
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Any, IO, Iterable, Iterator, Optional, Union
+
+# Configuration
+DEFAULT_CHUNK_SIZE = 65536
+MAX_DOCUMENT_SIZE = 64 * 1024 * 1024  # refuse single JSON documents larger than this
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = " \t\r\n"
+
+
+@dataclass(frozen=True, order=True, slots=True)
+class TrustLevel:
+    """A badge trust level; compares by numeric level."""
+
+    level: int
+    label: Optional[str] = field(default=None, compare=False)
+
+    @classmethod
+    def parse(cls, value: Any) -> Optional["TrustLevel"]:
+        """Accept 2, "2", "L2", or {"level": 2, "name": "..."}."""
+        if value is None or isinstance(value, bool):
+            return None
+        if isinstance(value, dict):
+            inner = cls.parse(value.get("level"))
+            if inner is None:
+                return None
+            label = value.get("name") or value.get("label")
+            return cls(inner.level, sys.intern(label) if isinstance(label, str) else None)
+        if isinstance(value, int):
+            return cls(value)
+        if isinstance(value, str):
+            digits = value.strip().upper().lstrip("L")
+            if digits.isdigit():
+                return cls(int(digits))
+        return None
+
+
+@dataclass(frozen=True, slots=True)
+class Issue:
+    """A single validation finding."""
+
+    severity: str
+    message: str
+    code: Optional[str] = None
+    field: Optional[str] = None
+
+    @classmethod
+    def parse(cls, value: Any, default_severity: str) -> "Issue":
+        if isinstance(value, dict):
+            severity = value.get("severity") or value.get("level") or default_severity
+            code = value.get("code") or value.get("rule")
+            location = value.get("field") or value.get("path")
+            return cls(
+                severity=sys.intern(str(severity).lower()),
+                message=str(value.get("message") or value.get("msg") or ""),
+                code=sys.intern(str(code)) if code is not None else None,
+                field=str(location) if location is not None else None,
+            )
+        return cls(severity=sys.intern(default_severity), message=str(value))
+
+
+@dataclass(slots=True)
+class ValidationResult:
+    """Outcome of one core validation, from a bare core report or a batch record."""
+
+    target: Optional[str]
+    success: bool
+    issues: tuple[Issue, ...] = ()
+    score: Optional[float] = None
+    trust_level: Optional[TrustLevel] = None
+    exit_code: Optional[int] = None
+    cached: bool = False
+    usage: Optional[dict] = None  # core resource use, see capiscio.process.ResourceUsage
+
+    @property
+    def errors(self) -> tuple[Issue, ...]:
+        return tuple(i for i in self.issues if i.severity == "error")
+
+    @property
+    def warnings(self) -> tuple[Issue, ...]:
+        return tuple(i for i in self.issues if i.severity == "warning")
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "ValidationResult":
+        """Build from a core `--json` report or a `validate --incremental --json` record."""
+        exit_code = data.get("exitCode")
+        cached = bool(data.get("cached", False))
+        target = data.get("target")
+        if "result" in data and ("exitCode" in data or "target" in data):
+            report = data.get("result") or {}
+        else:
+            report = data
+        target = target or report.get("target") or report.get("url") or report.get("source")
+
+        issues: list[Issue] = []
+        for key, severity in (("errors", "error"), ("warnings", "warning"), ("issues", "error")):
+            for item in report.get(key) or ():
+                issues.append(Issue.parse(item, severity))
+
+        if "success" in report:
+            success = bool(report["success"])
+        elif "valid" in report:
+            success = bool(report["valid"])
+        elif exit_code is not None:
+            success = exit_code == 0
+        else:
+            success = not any(i.severity == "error" for i in issues)
+
+        score = report.get("score")
+        if isinstance(score, dict):
+            score = score.get("overall", score.get("total"))
+        trust = report.get("trustLevel", report.get("trust_level"))
+        return cls(
+            target=target,
+            success=success,
+            issues=tuple(issues),
+            score=float(score) if isinstance(score, (int, float)) and not isinstance(score, bool) else None,
+            trust_level=TrustLevel.parse(trust),
+            exit_code=exit_code,
+            cached=cached,
+            usage=data.get("usage") if isinstance(data.get("usage"), dict) else None,
+        )
+
+
+def read_chunks(stream: IO, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[Union[bytes, str]]:
+    """Yield chunks from a binary or text file object until EOF."""
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            return
+        yield chunk
+
+
+def iter_json_values(
+    source: Union[IO, Iterable[Union[bytes, str]]],
+    max_document: int = MAX_DOCUMENT_SIZE,
+) -> Iterator[Any]:
+    """
+    Incrementally decode a stream of NDJSON or concatenated JSON values.
+
+    source is a file object or an iterable of bytes/str chunks (for example
+    CoreProcess.iter_chunks()). Only the current, incomplete document is
+    buffered. Re-parsing an incomplete document is deferred until the buffer
+    has doubled, so the cost stays linear in the document size.
+    """
+    chunks = read_chunks(source) if hasattr(source, "read") else source
+    utf8 = codecs.getincrementaldecoder("utf-8")()
+    buf = ""
+    retry_at = 0
+    for chunk in chunks:
+        buf += utf8.decode(chunk) if isinstance(chunk, (bytes, bytearray, memoryview)) else chunk
+        if len(buf) < retry_at:
+            continue
+        pos = 0
+        while True:
+            while pos < len(buf) and buf[pos] in _WHITESPACE:
+                pos += 1
+            if pos >= len(buf):
+                buf = ""
+                retry_at = 0
+                break
+            try:
+                value, end = _decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                buf = buf[pos:]
+                if len(buf) > max_document:
+                    raise ValueError(f"JSON document exceeds {max_document} characters")
+                retry_at = 2 * len(buf)
+                break
+            # A number at the very end of the buffer may still be growing
+            if end == len(buf) and not isinstance(value, (dict, list, str)):
+                buf = buf[pos:]
+                retry_at = len(buf) + 1
+                break
+            yield value
+            pos = end
+    buf += utf8.decode(b"", final=True)
+    rest = buf.strip()
+    while rest:
+        value, end = _decoder.raw_decode(rest)
+        yield value
+        rest = rest[end:].lstrip()
+
+
+def iter_results(source: Union[IO, Iterable[Union[bytes, str]]]) -> Iterator[ValidationResult]:
+    """Yield a ValidationResult for every JSON object in the stream."""
+    for value in iter_json_values(source):
+        if isinstance(value, dict):
+            yield ValidationResult.from_dict(value)
+        elif isinstance(value, list):
+            for item in value:
+                if isinstance(item, dict):
+                    yield ValidationResult.from_dict(item)
+
+
+def iter_issues(results: Iterable[ValidationResult]) -> Iterator[tuple[Optional[str], Issue]]:
+    """Flatten results into (target, issue) pairs."""
+    for result in results:
+        for issue in result.issues:
+            yield result.target, issue
+
+
+@dataclass(slots=True)
+class Summary:
+    """Streaming aggregate over many results."""
+
+    total: int = 0
+    passed: int = 0
+    failed: int = 0
+    issues_by_code: Counter = field(default_factory=Counter)
+    issues_by_severity: Counter = field(default_factory=Counter)
+    by_trust_level: Counter = field(default_factory=Counter)
+
+    def add(self, result: ValidationResult) -> None:
+        self.total += 1
+        if result.success:
+            self.passed += 1
+        else:
+            self.failed += 1
+        for issue in result.issues:
+            self.issues_by_severity[issue.severity] += 1
+            if issue.code:
+                self.issues_by_code[issue.code] += 1
+        self.by_trust_level[result.trust_level.level if result.trust_level else None] += 1
+
+
+def summarize(results: Iterable[ValidationResult]) -> Summary:
+    """Aggregate results in a single pass without retaining them."""
+    summary = Summary()
+    for result in results:
+        summary.add(result)
+    return summary
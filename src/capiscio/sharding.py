@@ -0,0 +1,99 @@
+"""
+Deterministic sharding and streaming merge of per-shard results.
+
+Work items (card paths, agent names) are assigned to shards with rendezvous
+(highest-random-weight) hashing: every node computes the same owner for a
+key without coordination, and changing the shard count only moves the keys
+whose winning shard changed, about 1/N of them.
+
+Per-shard NDJSON or SQLite outputs are combined with a k-way heap merge that
+holds one record per input in memory. That only works if every input is
+already in time order: monitor streams are (by `finishedAt`), databases are
+read by `ts`, and batch records carry no time at all. An input that goes
+back in time raises ValueError rather than producing a silently unsorted
+merge.
+"""
+import heapq
+import hashlib
+from pathlib import Path
+from typing import Callable, Iterable, Iterator, TypeVar
+
+from capiscio.results import iter_json_values
+from capiscio.store import ResultStore
+
+T = TypeVar("T")
+
+
+def parse_shard(value: str) -> tuple[int, int]:
+    """Parse '2/5' into (2, 5); shards are numbered from 1."""
+    index, sep, count = value.partition("/")
+    try:
+        i, n = int(index), int(count)
+    except ValueError:
+        raise ValueError(f"Invalid shard {value!r}; expected i/N, e.g. 1/4") from None
+    if not sep or n < 1 or not 1 <= i <= n:
+        raise ValueError(f"Invalid shard {value!r}; expected 1 <= i <= N")
+    return i, n
+
+
+def _weight(key: str, shard: int) -> int:
+    digest = hashlib.blake2b(f"{shard}\x00{key}".encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "big")
+
+
+def owner(key: str, count: int) -> int:
+    """The 1-based shard that owns key among count shards."""
+    return max(range(1, count + 1), key=lambda shard: _weight(key, shard))
+
+
+def select(items: Iterable[T], shard: tuple[int, int], key: Callable[[T], str] = str) -> list[T]:
+    """Keep the items owned by shard (i, N), preserving order."""
+    index, count = shard
+    if count == 1:
+        return list(items)
+    return [item for item in items if owner(key(item), count) == index]
+
+
+def merge_key(record: dict) -> tuple:
+    """
+    Records merge by completion time, then agent/target.
+
+    Monitor records are written as checks finish, so `finishedAt` (not the
+    start `timestamp`) is their stream order; stored rows and older records
+    fall back to `timestamp`, and batch records have neither.
+    """
+    return (
+        record.get("finishedAt") or record.get("timestamp") or 0,
+        record.get("agent") or record.get("target") or "",
+    )
+
+
+def iter_records(path: Path) -> Iterator[dict]:
+    """Yield records from an NDJSON file or a results database (opened read-only), oldest first."""
+    if path.suffix == ".db":
+        store = ResultStore(path, read_only=True)
+        try:
+            for row in store.query(ascending=True):
+                yield row.to_record()
+        finally:
+            store.close()
+        return
+    with open(path, "rb") as f:
+        for value in iter_json_values(f):
+            if isinstance(value, dict):
+                yield value
+
+
+def _in_order(path: Path, records: Iterator[dict]) -> Iterator[dict]:
+    last = 0
+    for record in records:
+        when = merge_key(record)[0]
+        if when < last:
+            raise ValueError(f"{path} is not in time order ({when} follows {last}); sort it before merging")
+        last = when
+        yield record
+
+
+def merge(paths: list[Path]) -> Iterator[dict]:
+    """K-way merge of per-shard outputs; raises ValueError if an input is not in time order."""
+    return heapq.merge(*(_in_order(p, iter_records(p)) for p in paths), key=merge_key)
@@ -0,0 +1,414 @@
+"""
+Historical results store backed by SQLite.
+
+Validation and badge-verification outcomes are appended in batches to a
+local database in WAL mode, indexed by agent, time, status and trust level,
+so questions like "which agents dropped below trust level 2 this week" are
+answered by an index scan instead of re-parsing logs. Old rows are removed
+by retention-based compaction.
+"""
+import sys
+import json
+import time
+import argparse
+import sqlite3
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterable, Iterator, Optional
+
+from capiscio.manager import get_state_dir
+from capiscio.results import Summary, ValidationResult
+
+# Configuration
+STORE_FILENAME = "results.db"
+BATCH_SIZE = 500
+FLUSH_INTERVAL = 5.0  # longest a queued row waits before it is written, in seconds
+SCHEMA_VERSION = 1
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    id          INTEGER PRIMARY KEY,
+    ts          REAL    NOT NULL,
+    agent       TEXT    NOT NULL,
+    kind        TEXT    NOT NULL,
+    status      TEXT    NOT NULL,
+    trust_level INTEGER,
+    score       REAL,
+    exit_code   INTEGER,
+    error_count INTEGER NOT NULL DEFAULT 0,
+    detail      TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_results_agent_ts ON results (agent, ts);
+CREATE INDEX IF NOT EXISTS idx_results_ts ON results (ts);
+CREATE INDEX IF NOT EXISTS idx_results_status_ts ON results (status, ts);
+CREATE INDEX IF NOT EXISTS idx_results_trust_ts ON results (trust_level, ts);
+"""
+
+
+def default_store_path() -> Path:
+    """Location of the shared results database in the user cache dir."""
+    return get_state_dir("results") / STORE_FILENAME
+
+
+@dataclass(frozen=True, slots=True)
+class StoredResult:
+    """One row of the results table."""
+
+    ts: float
+    agent: str
+    kind: str
+    status: str
+    trust_level: Optional[int]
+    score: Optional[float]
+    exit_code: Optional[int]
+    error_count: int
+    detail: Optional[str]
+
+    def to_record(self) -> dict:
+        """Render as an NDJSON record (accepted back by ResultStore.add_record)."""
+        return {
+            "timestamp": self.ts, "agent": self.agent, "kind": self.kind, "status": self.status,
+            "trustLevel": self.trust_level, "score": self.score, "exitCode": self.exit_code,
+            "errorCount": self.error_count, "detail": self.detail,
+        }
+
+
+def parse_since(value: str, now: Optional[float] = None) -> float:
+    """Turn '7d', '12h', '30m', '45s' or an epoch timestamp into an epoch time."""
+    now = time.time() if now is None else now
+    units = {"s": 1, "m": 60, "h": 3600, "d": 86400, "w": 604800}
+    value = value.strip()
+    if value and value[-1] in units and value[:-1].replace(".", "", 1).isdigit():
+        return now - float(value[:-1]) * units[value[-1]]
+    try:
+        return float(value)
+    except ValueError:
+        raise ValueError(f"invalid time {value!r}: expected e.g. 7d, 12h or an epoch timestamp") from None
+
+
+class ResultStore:
+    """
+    Append-mostly store of results.
+
+    add() buffers rows and writes them in one transaction every BATCH_SIZE
+    rows, once the oldest queued row is flush_interval seconds old (checked
+    on add() and flush_if_due()), or on flush()/close(). This keeps insert
+    throughput high under WAL without holding a slow trickle of results in
+    memory indefinitely. The store is safe to share between threads.
+    """
+
+    def __init__(self, path: Optional[Path] = None, batch_size: int = BATCH_SIZE,
+                 flush_interval: float = FLUSH_INTERVAL, read_only: bool = False):
+        self.path = Path(path) if path is not None else default_store_path()
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._pending: list[tuple] = []
+        self._queued_at = 0.0  # monotonic time the oldest pending row was queued
+        if read_only:
+            # Leave someone else's database exactly as it is: no schema, no journal-mode change
+            self._db = sqlite3.connect(f"{self.path.resolve().as_uri()}?mode=ro", uri=True,
+                                       check_same_thread=False, isolation_level=None)
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+        self._db.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+
+    def __enter__(self) -> "ResultStore":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def add(
+        self,
+        agent: str,
+        status: str,
+        kind: str = "validate",
+        ts: Optional[float] = None,
+        trust_level: Optional[int] = None,
+        score: Optional[float] = None,
+        exit_code: Optional[int] = None,
+        error_count: int = 0,
+        detail: Optional[str] = None,
+    ) -> None:
+        """Queue one row; it is written with the next batch."""
+        row = (time.time() if ts is None else ts, agent, kind, status, trust_level, score, exit_code, error_count, detail)
+        with self._lock:
+            if not self._pending:
+                self._queued_at = time.monotonic()
+            self._pending.append(row)
+            if len(self._pending) >= self.batch_size or self._due_locked():
+                self._flush_locked()
+
+    def add_result(self, result: ValidationResult, agent: Optional[str] = None, ts: Optional[float] = None,
+                   kind: str = "validate") -> None:
+        """Queue a typed validation result."""
+        self.add(
+            agent=agent or result.target or "",
+            status="pass" if result.success else "fail",
+            kind=kind,
+            ts=ts,
+            trust_level=result.trust_level.level if result.trust_level else None,
+            score=result.score,
+            exit_code=result.exit_code,
+            error_count=len(result.errors),
+            detail=json.dumps([i.message for i in result.errors][:20]) if result.errors else None,
+        )
+
+    def add_record(self, record: dict) -> None:
+        """Queue a batch/monitor NDJSON record (see CardResult.to_record) or a stored record."""
+        if "status" in record and "result" not in record:
+            self.add(
+                agent=record.get("agent", ""),
+                status=record["status"],
+                kind=record.get("kind", "validate"),
+                ts=record.get("timestamp"),
+                trust_level=record.get("trustLevel"),
+                score=record.get("score"),
+                exit_code=record.get("exitCode"),
+                error_count=record.get("errorCount", 0),
+                detail=record.get("detail"),
+            )
+            return
+        result = ValidationResult.from_dict(record)
+        self.add_result(result, agent=record.get("agent") or record.get("target"), ts=record.get("timestamp"),
+                        kind=record.get("kind", "validate"))
+
+    def flush(self) -> None:
+        """Write all queued rows in one transaction."""
+        with self._lock:
+            self._flush_locked()
+
+    def flush_if_due(self) -> None:
+        """Write queued rows if the oldest has waited flush_interval; cheap to call often."""
+        with self._lock:
+            if self._due_locked():
+                self._flush_locked()
+
+    def _due_locked(self) -> bool:
+        return bool(self._pending) and time.monotonic() - self._queued_at >= self.flush_interval
+
+    def _flush_locked(self) -> None:
+        if not self._pending:
+            return
+        rows, self._pending = self._pending, []
+        with self._db:
+            self._db.execute("BEGIN")
+            self._db.executemany(
+                "INSERT INTO results (ts, agent, kind, status, trust_level, score, exit_code, error_count, detail)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+
+    def query(
+        self,
+        agent: Optional[str] = None,
+        status: Optional[str] = None,
+        kind: Optional[str] = None,
+        since: Optional[float] = None,
+        until: Optional[float] = None,
+        below_trust: Optional[int] = None,
+        latest: bool = False,
+        limit: Optional[int] = None,
+        ascending: bool = False,
+    ) -> Iterator[StoredResult]:
+        """
+        Yield matching rows, newest first (oldest first with ascending=True).
+
+        With latest=True each agent's most recent row within the agent/kind/
+        time scope is selected first and status/below_trust are applied to
+        it, which answers "which agents are currently failing".
+        """
+        self.flush()
+        scope, scope_params = [], []
+        for column, value in (("agent", agent), ("kind", kind)):
+            if value is not None:
+                scope.append(f"{column} = ?")
+                scope_params.append(value)
+        if since is not None:
+            scope.append("ts >= ?")
+            scope_params.append(since)
+        if until is not None:
+            scope.append("ts < ?")
+            scope_params.append(until)
+        state, state_params = [], []
+        if status is not None:
+            state.append("status = ?")
+            state_params.append(status)
+        if below_trust is not None:
+            state.append("trust_level < ?")
+            state_params.append(below_trust)
+
+        columns = "ts, agent, kind, status, trust_level, score, exit_code, error_count, detail"
+        order = "ASC" if ascending else "DESC"
+        if latest:
+            # Pick each agent's newest row within scope first, then filter on its state
+            inner_where = f"WHERE {' AND '.join(scope)}" if scope else ""
+            outer_where = " AND ".join(["rn = 1"] + state)
+            sql = (
+                f"SELECT {columns} FROM (SELECT {columns}, ROW_NUMBER() OVER "
+                f"(PARTITION BY agent ORDER BY ts DESC, id DESC) AS rn FROM results {inner_where}) "
+                f"WHERE {outer_where} ORDER BY ts {order}"
+            )
+        else:
+            clauses = scope + state
+            where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+            sql = f"SELECT {columns} FROM results {where} ORDER BY ts {order}, id {order}"
+        params = scope_params + state_params
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        for row in self._db.execute(sql, params):
+            yield StoredResult(*row)
+
+    def compact(self, older_than: float, keep_latest: bool = True) -> int:
+        """
+        Delete rows older than the given epoch time; return how many were removed.
+
+        With keep_latest=True an agent's most recently stored row is always kept, so
+        agents that stopped reporting do not vanish from latest-state queries.
+        """
+        self.flush()
+        with self._lock, self._db:
+            self._db.execute("BEGIN")
+            if keep_latest:
+                # Same notion of "latest" as query(latest=True): imported or merged
+                # rows can be inserted out of time order, so id alone is not enough
+                cur = self._db.execute(
+                    "DELETE FROM results WHERE ts < ? AND id NOT IN "
+                    "(SELECT id FROM (SELECT id, ROW_NUMBER() OVER "
+                    "(PARTITION BY agent ORDER BY ts DESC, id DESC) AS rn FROM results) WHERE rn = 1)",
+                    (older_than,),
+                )
+            else:
+                cur = self._db.execute("DELETE FROM results WHERE ts < ?", (older_than,))
+            removed = cur.rowcount
+        self._db.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        return removed
+
+    def close(self) -> None:
+        self.flush()
+        self._db.close()
+
+
+def format_rows(rows: Iterable[StoredResult], as_json: bool) -> Iterator[str]:
+    """Render rows as NDJSON or aligned text lines."""
+    for row in rows:
+        if as_json:
+            yield json.dumps(row.to_record(), separators=(",", ":"))
+        else:
+            stamp = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(row.ts))
+            trust = "-" if row.trust_level is None else f"L{row.trust_level}"
+            yield f"{stamp}  {row.status:<4}  {trust:<3}  {row.kind:<8}  {row.agent}"
+
+
+def run_results_cli(args: list[str]) -> int:
+    """Entry point for `capiscio results {query,import,compact,merge}`."""
+
+    parser = argparse.ArgumentParser(prog="capiscio results", description="Query the local results store.")
+    parser.add_argument("--db", type=Path, default=None, help="results database (default: user cache dir)")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    q = sub.add_parser("query", help="list stored results, newest first")
+    q.add_argument("--agent")
+    q.add_argument("--status", choices=["pass", "fail"])
+    q.add_argument("--kind", choices=["validate", "badge"])
+    q.add_argument("--since", help="e.g. 7d, 12h, or an epoch timestamp")
+    q.add_argument("--until")
+    q.add_argument("--below-trust", type=int, metavar="LEVEL")
+    q.add_argument("--latest", action="store_true", help="only each agent's most recent result")
+    q.add_argument("--limit", type=int)
+    q.add_argument("--json", action="store_true", help="emit NDJSON")
+
+    imp = sub.add_parser("import", help="ingest NDJSON records from batch or monitor output")
+    imp.add_argument("files", nargs="*", default=["-"])
+
+    c = sub.add_parser("compact", help="delete results older than a retention window")
+    c.add_argument("--older-than", required=True, help="e.g. 30d")
+    c.add_argument("--all", action="store_true", help="also drop each agent's latest result")
+
+    m = sub.add_parser("merge", help="k-way merge per-shard NDJSON or .db outputs into one report")
+    m.add_argument("inputs", nargs="+", type=Path)
+    m.add_argument("--output", "-o", default="-", help="NDJSON file, .db file, or - for stdout")
+
+    opts = parser.parse_args(args)
+    if opts.command == "merge":
+        return _merge_cli(opts.inputs, opts.output)
+    try:
+        with ResultStore(opts.db) as store:
+            if opts.command == "query":
+                rows = store.query(
+                    agent=opts.agent,
+                    status=opts.status,
+                    kind=opts.kind,
+                    since=parse_since(opts.since) if opts.since else None,
+                    until=parse_since(opts.until) if opts.until else None,
+                    below_trust=opts.below_trust,
+                    latest=opts.latest,
+                    limit=opts.limit,
+                )
+                for line in format_rows(rows, opts.json):
+                    sys.stdout.write(line + "\n")
+            elif opts.command == "import":
+                from capiscio.results import iter_json_values
+                count = 0
+                for name in opts.files:
+                    stream = sys.stdin.buffer if name == "-" else open(name, "rb")
+                    try:
+                        for record in iter_json_values(stream):
+                            if isinstance(record, dict):
+                                store.add_record(record)
+                                count += 1
+                    finally:
+                        if stream is not sys.stdin.buffer:
+                            stream.close()
+                sys.stderr.write(f"Imported {count} result(s) into {store.path}\n")
+            else:
+                removed = store.compact(parse_since(opts.older_than), keep_latest=not opts.all)
+                sys.stderr.write(f"Removed {removed} result(s) from {store.path}\n")
+    except (ValueError, OSError, sqlite3.Error) as e:
+        sys.stderr.write(f"Error: {e}\n")
+        return 1
+    return 0
+
+
+def _merge_cli(inputs: list[Path], output: str) -> int:
+    # Imported here: capiscio.sharding itself reads .db inputs through ResultStore
+    from capiscio.sharding import merge
+
+    summary = Summary()
+    try:
+        if output.endswith(".db"):
+            with ResultStore(Path(output)) as store:
+                for record in merge(inputs):
+                    store.add_record(record)
+                    summary.total += 1
+        else:
+            stream = sys.stdout if output == "-" else open(output, "w", encoding="utf-8")
+            try:
+                for record in merge(inputs):
+                    stream.write(json.dumps(record, separators=(",", ":")) + "\n")
+                    if "status" in record and "result" not in record:
+                        summary.total += 1
+                        if record["status"] == "pass":
+                            summary.passed += 1
+                        else:
+                            summary.failed += 1
+                    else:
+                        summary.add(ValidationResult.from_dict(record))
+            finally:
+                if stream is not sys.stdout:
+                    stream.close()
+    except (ValueError, OSError, sqlite3.Error) as e:
+        sys.stderr.write(f"Error: {e}\n")
+        return 1
+    sys.stderr.write(
+        f"Merged {summary.total} result(s) from {len(inputs)} input(s)"
+        + (f": {summary.passed} passed, {summary.failed} failed\n" if summary.passed or summary.failed else "\n")
+    )
+    return 1 if summary.failed else 0
@@ -0,0 +1,344 @@
+"""
+Issuer trust-key cache for badge verification.
+
+An online `capiscio badge verify` fetches the issuer's signing keys on every
+call. TrustKeyCache keeps each issuer's key set (JWKS) in memory and on disk.
+It honours Cache-Control max-age / Expires, and it revalidates with
+If-None-Match / If-Modified-Since. Once a key set is REFRESH_AT of the way
+through its freshness lifetime, it is refreshed on a background thread while
+the cached copy keeps being served (stale-while-revalidate). If the issuer
+cannot be reached, an expired key set is still used, with a warning, for up
+to MAX_STALE.
+
+verify_badge() uses the cache to pass the core the signing key with `--key`,
+together with `--offline`. Once the issuer's keys are cached, verification
+needs no network.
+
+Keys are only ever fetched for configured trust anchors: an allowlist
+mapping issuer to an https:// key set URL, passed as `anchors` or read from
+CAPISCIO_TRUST_ANCHORS (a JSON object, or the path of a file holding one).
+The `iss` claim of a badge is unverified input, so it is used only to look
+up an anchor, never to build a URL. Badges from any other issuer are left to
+the core's own online verification.
+"""
+import os
+import json
+import time
+import base64
+import hashlib
+import logging
+import threading
+from dataclasses import dataclass, replace
+from pathlib import Path
+from typing import Callable, Optional
+
+import requests
+
+from capiscio.breaker import CircuitBreaker, NetworkUnavailable, NETWORK_ERRORS, is_offline, origin
+from capiscio.fetch import freshness
+from capiscio.files import atomic_write, write_json
+from capiscio.manager import get_state_dir
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+ANCHORS_ENV = "CAPISCIO_TRUST_ANCHORS"
+FETCH_TIMEOUT = 10
+DEFAULT_TTL = 3600.0     # key sets served without caching headers
+MIN_TTL = 60.0           # floor for max-age=0 / no-cache responses
+REFRESH_AT = 0.8         # fraction of the freshness lifetime after which a background refresh starts
+MAX_STALE = 86400.0      # how long an expired key set may be used while the issuer is unreachable
+FAILURE_TTL = 60.0       # an issuer whose keys could not be fetched is not retried on the request path for this long
+MAX_JWKS_SIZE = 1024 * 1024
+
+
+def _segment(token: str, index: int) -> dict:
+    try:
+        segment = token.split(".")[index]
+        value = json.loads(base64.urlsafe_b64decode(segment + "=" * (-len(segment) % 4)))
+    except (IndexError, ValueError):
+        return {}
+    return value if isinstance(value, dict) else {}
+
+
+def token_header(token: str) -> dict:
+    """Decode the protected header of a compact JWS without verifying it ({} if malformed)."""
+    return _segment(token, 0)
+
+
+def decode_claims(token: str) -> dict:
+    """
+    Decode the payload of a compact JWS without verifying it ({} if malformed).
+
+    Only for cache bookkeeping (`exp`, and `iss` as an anchor lookup key);
+    trust decisions come from the core.
+    """
+    return _segment(token, 1)
+
+
+def parse_anchors(data: dict) -> dict[str, str]:
+    """Validate an issuer -> key set URL mapping; every key set must be served over HTTPS."""
+    anchors = {}
+    for issuer, url in data.items():
+        if not isinstance(issuer, str) or not issuer:
+            raise ValueError(f"Invalid trust anchor issuer {issuer!r}")
+        if not isinstance(url, str) or not url.lower().startswith("https://"):
+            raise ValueError(f"Trust anchor {issuer}: the key set URL must be an https:// URL, got {url!r}")
+        anchors[issuer] = url
+    return anchors
+
+
+def load_anchors() -> dict[str, str]:
+    """Trust anchors from CAPISCIO_TRUST_ANCHORS ({} when unset)."""
+    value = os.environ.get(ANCHORS_ENV, "").strip()
+    if not value:
+        return {}
+    try:
+        if value.startswith("{"):
+            data = json.loads(value)
+        else:
+            with open(value, "r", encoding="utf-8") as f:
+                data = json.load(f)
+    except (OSError, ValueError) as e:
+        raise ValueError(f"Could not read {ANCHORS_ENV}: {e}") from None
+    if not isinstance(data, dict):
+        raise ValueError(f"{ANCHORS_ENV} must be a JSON object mapping issuer to key set URL")
+    return parse_anchors(data)
+
+
+@dataclass(frozen=True, slots=True)
+class KeySet:
+    """An issuer's keys and their HTTP cache state."""
+
+    issuer: str
+    url: str
+    keys: tuple
+    fetched_at: float
+    expires_at: float
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+
+    def find(self, kid: Optional[str]) -> Optional[dict]:
+        """The key with this kid, or the only key when the token names none."""
+        if kid is None:
+            return self.keys[0] if len(self.keys) == 1 else None
+        return next((k for k in self.keys if k.get("kid") == kid), None)
+
+    def to_dict(self) -> dict:
+        return {
+            "issuer": self.issuer,
+            "url": self.url,
+            "keys": list(self.keys),
+            "fetchedAt": self.fetched_at,
+            "expiresAt": self.expires_at,
+            "etag": self.etag,
+            "lastModified": self.last_modified,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "KeySet":
+        return cls(
+            issuer=data["issuer"],
+            url=data["url"],
+            keys=tuple(k for k in data["keys"] if isinstance(k, dict)),
+            fetched_at=float(data["fetchedAt"]),
+            expires_at=float(data["expiresAt"]),
+            etag=data.get("etag"),
+            last_modified=data.get("lastModified"),
+        )
+
+
+class TrustKeyCache:
+    """
+    Per-issuer JWKS cache shared between threads (in memory) and processes (on disk).
+
+    anchors maps each trusted issuer to its https:// key set URL (default:
+    load_anchors()). Issuers that are not anchors, such as self-signed
+    did:key badges, never resolve.
+    """
+
+    def __init__(
+        self,
+        cache_dir: Optional[Path] = None,
+        session: Optional[requests.Session] = None,
+        anchors: Optional[dict[str, str]] = None,
+        clock: Callable[[], float] = time.time,
+        background: bool = True,
+    ):
+        self.cache_dir = Path(cache_dir) if cache_dir is not None else get_state_dir("trust")
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.session = session or requests.Session()
+        self.anchors = parse_anchors(anchors) if anchors is not None else load_anchors()
+        self.clock = clock
+        self.background = background
+        self._sets: dict[str, KeySet] = {}
+        self._refreshing: set[str] = set()
+        self._failed: dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def _path(self, issuer: str) -> Path:
+        return self.cache_dir / f"{hashlib.sha256(issuer.encode()).hexdigest()[:32]}.json"
+
+    def _load(self, issuer: str) -> Optional[KeySet]:
+        try:
+            with open(self._path(issuer), "r", encoding="utf-8") as f:
+                keyset = KeySet.from_dict(json.load(f))
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            logger.debug(f"Ignoring unreadable key set for {issuer}: {e}")
+            return None
+        if keyset.issuer != issuer or keyset.url != self.anchors.get(issuer):
+            # Fetched for a different (or since removed) anchor: never trust it
+            return None
+        return keyset
+
+    def _store(self, keyset: KeySet) -> None:
+        with self._lock:
+            self._sets[keyset.issuer] = keyset
+        try:
+            write_json(self._path(keyset.issuer), keyset.to_dict())
+        except OSError as e:
+            logger.debug(f"Could not persist key set for {keyset.issuer}: {e}")
+
+    def get(self, issuer: str) -> Optional[KeySet]:
+        """Return an anchored issuer's key set, fetching it only when there is no usable copy."""
+        if issuer not in self.anchors:
+            return None
+        with self._lock:
+            keyset = self._sets.get(issuer)
+        if keyset is None:
+            keyset = self._load(issuer)
+            if keyset is not None:
+                with self._lock:
+                    self._sets[issuer] = keyset
+        now = self.clock()
+        if keyset is not None and now < keyset.expires_at:
+            if now >= keyset.fetched_at + REFRESH_AT * (keyset.expires_at - keyset.fetched_at):
+                self._refresh_soon(issuer)
+            return keyset
+
+        if keyset is None:
+            with self._lock:
+                if now < self._failed.get(issuer, 0):
+                    return None
+            keyset = self.refresh(issuer)
+            if keyset is None:
+                with self._lock:
+                    self._failed[issuer] = now + FAILURE_TTL
+            return keyset
+        refreshed = self.refresh(issuer, keyset)
+        if refreshed is not keyset:
+            return refreshed
+        if now < keyset.expires_at + MAX_STALE:
+            logger.warning(f"Using expired trust keys for {issuer}; the issuer could not be reached")
+            return keyset
+        return None
+
+    def _refresh_soon(self, issuer: str) -> None:
+        with self._lock:
+            if issuer in self._refreshing:
+                return
+            self._refreshing.add(issuer)
+            current = self._sets.get(issuer)
+
+        def run() -> None:
+            try:
+                self.refresh(issuer, current)
+            finally:
+                with self._lock:
+                    self._refreshing.discard(issuer)
+
+        if self.background:
+            threading.Thread(target=run, name="capiscio-trust-refresh", daemon=True).start()
+        else:
+            run()
+
+    def refresh(self, issuer: str, current: Optional[KeySet] = None) -> Optional[KeySet]:
+        """
+        Fetch (or revalidate) the issuer's key set now.
+
+        Returns the new key set, or current unchanged if the issuer could not
+        be reached or returned something unusable.
+        """
+        url = self.anchors.get(issuer)
+        if url is None or is_offline():
+            return current
+        host = origin(url)
+        breaker = CircuitBreaker()
+        try:
+            breaker.check(host)
+        except NetworkUnavailable as e:
+            logger.debug(f"Not refreshing trust keys for {issuer}: {e}")
+            return current
+
+        headers = {}
+        if current is not None and current.etag:
+            headers["If-None-Match"] = current.etag
+        if current is not None and current.last_modified:
+            headers["If-Modified-Since"] = current.last_modified
+        now = self.clock()
+        try:
+            with self.session.get(url, headers=headers, timeout=FETCH_TIMEOUT, stream=True) as resp:
+                expires_at, _, _ = freshness(resp.headers, now)
+                expires_at = max(now + MIN_TTL, expires_at if expires_at is not None else now + DEFAULT_TTL)
+                if resp.status_code == 304 and current is not None:
+                    keyset = replace(current, fetched_at=now, expires_at=expires_at,
+                                     etag=resp.headers.get("ETag", current.etag))
+                else:
+                    resp.raise_for_status()
+                    body = resp.raw.read(MAX_JWKS_SIZE + 1, decode_content=True)
+                    if len(body) > MAX_JWKS_SIZE:
+                        raise ValueError(f"key set exceeds {MAX_JWKS_SIZE} bytes")
+                    keys = json.loads(body)["keys"]
+                    if not isinstance(keys, list):
+                        raise ValueError("'keys' is not a list")
+                    keyset = KeySet(issuer, url, tuple(k for k in keys if isinstance(k, dict)), now, expires_at,
+                                    resp.headers.get("ETag"), resp.headers.get("Last-Modified"))
+            breaker.success(host)
+        except NETWORK_ERRORS as e:
+            breaker.failure(host, e)
+            logger.warning(f"Could not fetch trust keys for {issuer}: {e}")
+            return current
+        except (requests.exceptions.RequestException, ValueError, KeyError, TypeError) as e:
+            logger.warning(f"Could not fetch trust keys for {issuer}: {e}")
+            return current
+        self._store(keyset)
+        return keyset
+
+    def key_file(self, token: str, issuer: Optional[str] = None) -> Optional[Path]:
+        """
+        Path to a JWK file holding the key that signed token, for `badge verify --key`.
+
+        Returns None when the issuer is not a trust anchor or the key cannot
+        be resolved, in which case the caller should fall back to online
+        verification.
+        """
+        if issuer is None:
+            issuer = decode_claims(token).get("iss")
+        if not isinstance(issuer, str) or not issuer:
+            return None
+        keyset = self.get(issuer)
+        if keyset is None:
+            return None
+        key = keyset.find(token_header(token).get("kid"))
+        if key is None:
+            return None
+        data = json.dumps(key, sort_keys=True, separators=(",", ":")).encode()
+        path = self.cache_dir / f"{hashlib.sha256(data).hexdigest()[:32]}.jwk"
+        if not path.exists():
+            atomic_write(path, data)
+        return path
+
+
+_default_cache: Optional[TrustKeyCache] = None
+_default_cache_lock = threading.Lock()
+
+
+def default_trust_cache() -> TrustKeyCache:
+    """The process-wide trust-key cache used by verify_badge()."""
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = TrustKeyCache()
+        return _default_cache
@@ -0,0 +1,354 @@
+"""
+Watch mode: re-validate agent cards as they change.
+
+On Linux the watcher uses inotify (through libc via ctypes) and blocks in
+select() between events, so an idle watch costs no CPU. Elsewhere, or when
+inotify is unavailable, it falls back to periodic stat() polling. Bursts of
+writes are debounced and coalesced into a single batch, and only result
+changes are printed.
+"""
+import os
+import sys
+import time
+import errno
+import select
+import struct
+import ctypes
+import ctypes.util
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+from rich.console import Console
+
+from capiscio.batch import discover_cards, file_digest, is_remote, split_args, validate_card, CardResult
+from capiscio.limits import default_jobs
+from capiscio.manager import download_binary, resolve_core_version
+
+console = Console(stderr=True)
+logger = logging.getLogger(__name__)
+
+# Configuration
+DEFAULT_DEBOUNCE = 0.2      # seconds of quiet before a batch is validated
+MAX_BATCH_DELAY = 2.0       # upper bound on how long a burst can postpone validation
+POLL_INTERVAL = 1.0         # seconds between scans for the polling fallback
+
+# inotify(7) constants
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_ISDIR = 0x40000000
+IN_Q_OVERFLOW = 0x00004000
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF
+_EVENT_HEADER = struct.Struct("iIII")
+
+
+class _Targets:
+    """The set of watched files and directories, and the relevance test for paths."""
+
+    def __init__(self, targets: list[str]):
+        self.files: set[str] = set()
+        self.dirs: list[str] = []
+        for target in targets:
+            path = os.path.abspath(target)
+            if os.path.isdir(path):
+                self.dirs.append(path)
+            else:
+                self.files.add(path)
+
+    def is_relevant(self, path: str) -> bool:
+        if path in self.files:
+            return True
+        if not path.endswith(".json"):
+            return False
+        return any(path.startswith(d + os.sep) for d in self.dirs)
+
+
+class PollingWatcher:
+    """Portable watcher that detects changes by comparing stat() snapshots."""
+
+    def __init__(self, targets: list[str], interval: float = POLL_INTERVAL):
+        self._targets = _Targets(targets)
+        self.interval = interval
+        self._snapshot = self._scan()
+
+    def _scan(self) -> dict[str, tuple[int, int]]:
+        paths = set(self._targets.files)
+        for d in self._targets.dirs:
+            paths.update(str(p) for p in Path(d).rglob("*.json"))
+        snapshot = {}
+        for path in paths:
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            snapshot[path] = (st.st_size, st.st_mtime_ns)
+        return snapshot
+
+    def read(self, timeout: Optional[float]) -> set[str]:
+        """Wait up to timeout seconds (forever if None) and return changed paths."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            remaining = self.interval if deadline is None else min(self.interval, deadline - time.monotonic())
+            if remaining > 0:
+                time.sleep(remaining)
+            current = self._scan()
+            changed = {p for p in current.keys() | self._snapshot.keys() if current.get(p) != self._snapshot.get(p)}
+            self._snapshot = current
+            if changed or (deadline is not None and time.monotonic() >= deadline):
+                return changed
+
+    def close(self) -> None:
+        pass
+
+
+class InotifyWatcher:
+    """Linux watcher backed by inotify; blocks in select() while idle."""
+
+    def __init__(self, targets: list[str]):
+        libc_name = ctypes.util.find_library("c")
+        if not sys.platform.startswith("linux") or libc_name is None:
+            raise OSError(errno.ENOSYS, "inotify is not available on this platform")
+        self._libc = ctypes.CDLL(libc_name, use_errno=True)
+        self._libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        self._targets = _Targets(targets)
+        self.fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err))
+        self._wds: dict[int, str] = {}
+        # Single files are watched through their parent so atomic renames by editors are seen
+        for path in self._targets.files:
+            self._add(os.path.dirname(path))
+        for d in self._targets.dirs:
+            self._add_tree(d)
+
+    def _add(self, directory: str) -> None:
+        if directory in self._wds.values():
+            return
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(directory), WATCH_MASK)
+        if wd < 0:
+            err = ctypes.get_errno()
+            logger.warning(f"Cannot watch {directory}: {os.strerror(err)}")
+            return
+        self._wds[wd] = directory
+
+    def _add_tree(self, root: str) -> None:
+        self._add(root)
+        for dirpath, dirnames, _ in os.walk(root):
+            for name in dirnames:
+                self._add(os.path.join(dirpath, name))
+
+    def _drain(self) -> set[str]:
+        changed: set[str] = set()
+        while True:
+            try:
+                buf = os.read(self.fd, 65536)
+            except BlockingIOError:
+                return changed
+            offset = 0
+            while offset < len(buf):
+                wd, mask, _cookie, length = _EVENT_HEADER.unpack_from(buf, offset)
+                offset += _EVENT_HEADER.size
+                name = buf[offset:offset + length].rstrip(b"\0")
+                offset += length
+                if mask & IN_Q_OVERFLOW:
+                    # Events were lost; report every card so the batch re-checks them
+                    changed.update(self._targets.files)
+                    for d in self._targets.dirs:
+                        changed.update(str(p) for p in Path(d).rglob("*.json"))
+                    continue
+                directory = self._wds.get(wd)
+                if directory is None or not name:
+                    continue
+                path = os.path.join(directory, os.fsdecode(name))
+                if mask & IN_ISDIR:
+                    if mask & (IN_CREATE | IN_MOVED_TO) and any(
+                        path.startswith(d + os.sep) for d in self._targets.dirs
+                    ):
+                        self._add_tree(path)
+                        changed.update(str(p) for p in Path(path).rglob("*.json"))
+                    continue
+                if self._targets.is_relevant(path):
+                    changed.add(path)
+
+    def read(self, timeout: Optional[float]) -> set[str]:
+        """Wait up to timeout seconds (forever if None) and return changed paths."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            ready, _, _ = select.select([self.fd], [], [], remaining)
+            if not ready:
+                return set()
+            changed = self._drain()
+            if changed:
+                return changed
+
+    def close(self) -> None:
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+
+def make_watcher(targets: list[str], polling: bool = False):
+    """Create an inotify watcher where possible, else the polling fallback."""
+    if not polling:
+        try:
+            return InotifyWatcher(targets)
+        except OSError as e:
+            logger.info(f"inotify unavailable ({e}); falling back to polling")
+    return PollingWatcher(targets)
+
+
+def collect(watcher, debounce: float = DEFAULT_DEBOUNCE, max_delay: float = MAX_BATCH_DELAY) -> set[str]:
+    """
+    Block until something changes, then keep collecting until the burst settles.
+
+    A batch is released after `debounce` seconds without new events, or after
+    `max_delay` seconds in total so a continuous stream of writes cannot
+    starve validation.
+    """
+    changed = watcher.read(None)
+    deadline = time.monotonic() + max_delay
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return changed
+        more = watcher.read(min(debounce, remaining))
+        if not more:
+            return changed
+        changed |= more
+
+
+@dataclass
+class _CardState:
+    digest: Optional[str]
+    result: CardResult
+
+
+class Watcher:
+    """Tracks the last result per card and re-validates changed batches on a shared pool."""
+
+    def __init__(self, core_args: list[str], jobs: Optional[int] = None):
+        self.core_args = core_args
+        self.state: dict[str, _CardState] = {}
+        self._pool = ThreadPoolExecutor(max_workers=jobs or default_jobs())
+
+    def validate(self, cards: list[str]) -> list[tuple[str, Optional[CardResult], Optional[CardResult]]]:
+        """
+        Validate cards and return (card, previous, current) for every result change.
+
+        Cards whose content hash is unchanged since the last run are skipped, and
+        cards that disappeared are reported with current=None.
+        """
+        deltas = []
+        todo: list[tuple[str, Optional[str]]] = []
+        for card in cards:
+            previous = self.state.get(card)
+            if not os.path.exists(card):
+                if previous is not None:
+                    del self.state[card]
+                    deltas.append((card, previous.result, None))
+                continue
+            try:
+                digest = file_digest(Path(card))
+            except OSError:
+                digest = None
+            if previous is not None and digest is not None and digest == previous.digest:
+                continue
+            todo.append((card, digest))
+
+        results = self._pool.map(lambda item: validate_card(item[0], self.core_args), todo)
+        for (card, digest), result in zip(todo, results):
+            previous = self.state.get(card)
+            self.state[card] = _CardState(digest, result)
+            if previous is None or (previous.result.returncode, previous.result.stdout) != (
+                result.returncode, result.stdout
+            ):
+                deltas.append((card, previous.result if previous else None, result))
+        return deltas
+
+    def close(self) -> None:
+        self._pool.shutdown(wait=False)
+
+
+def print_delta(card: str, previous: Optional[CardResult], current: Optional[CardResult]) -> None:
+    """Print one result transition."""
+    stamp = time.strftime("%H:%M:%S")
+    if current is None:
+        console.print(f"[dim]{stamp}[/dim] [yellow]removed[/yellow] {card}")
+        return
+    if current.returncode == 0:
+        verb = "[green]passes[/green]" if previous is None else "[green]now passes[/green]"
+    else:
+        verb = "[red]fails[/red]" if previous is None or previous.returncode == 0 else "[red]still fails[/red]"
+    console.print(f"[dim]{stamp}[/dim] {card} {verb}")
+    if current.returncode != 0:
+        sys.stdout.write(current.stdout)
+        sys.stderr.write(current.stderr)
+        sys.stdout.flush()
+
+
+def watch(targets: list[str], core_args: list[str], debounce: float = DEFAULT_DEBOUNCE, polling: bool = False) -> int:
+    """Validate targets once, then re-validate on every change until interrupted."""
+    remote = [t for t in targets if is_remote(t)]
+    if remote:
+        # Nothing local would ever report a change for these
+        raise ValueError(f"watch only follows local files; use `capiscio monitor` for {', '.join(remote)}")
+    targets = [os.path.abspath(t) for t in targets]
+    download_binary(resolve_core_version())
+    watcher = make_watcher(targets, polling=polling)
+    session = Watcher(core_args)
+    try:
+        for delta in session.validate(discover_cards(targets)):
+            print_delta(*delta)
+        console.print(f"[cyan]Watching {len(session.state)} card(s) ({type(watcher).__name__}). Press Ctrl+C to stop.[/cyan]")
+        while True:
+            changed = collect(watcher, debounce)
+            for delta in session.validate(sorted(changed)):
+                print_delta(*delta)
+    except KeyboardInterrupt:
+        return 0
+    finally:
+        watcher.close()
+        session.close()
+
+
+def run_watch_cli(args: list[str]) -> int:
+    """Entry point for `capiscio watch <paths...> [--poll] [--debounce MS] [core flags]`."""
+    polling = False
+    debounce = DEFAULT_DEBOUNCE
+    rest: list[str] = []
+    i = 0
+    while i < len(args):
+        if args[i] == "--poll":
+            polling = True
+        elif args[i] == "--debounce":
+            value = args[i + 1] if i + 1 < len(args) else ""
+            if not value.isdigit():
+                got = repr(value) if value else "no value"
+                console.print(f"[bold red]Error:[/bold red] --debounce expects milliseconds, got {got}")
+                return 1
+            debounce = int(value) / 1000.0
+            i += 1
+        else:
+            rest.append(args[i])
+        i += 1
+    try:
+        targets, core_args = split_args(rest)
+    except ValueError as e:
+        console.print(f"[bold red]Error:[/bold red] {e}")
+        return 1
+    if not targets:
+        console.print("[bold red]Error:[/bold red] no agent card files or directories given")
+        return 1
+    try:
+        return watch(targets, core_args, debounce=debounce, polling=polling)
+    except Exception as e:
+        console.print(f"[bold red]Error:[/bold red] {e}")
+        return 1
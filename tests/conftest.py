@@ -5,3 +5,19 @@ from pathlib import Path
 # Add src directory to path so tests can import capiscio
 src_path = Path(__file__).parent.parent / "src"
 sys.path.insert(0, str(src_path))
+
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def _isolated_breaker_state(tmp_path_factory, monkeypatch):
+    """Keep network circuit-breaker and core RSS state out of the real cache dir and between tests."""
+    state_dir = tmp_path_factory.mktemp("breaker")
+    monkeypatch.setattr("capiscio.breaker.default_state_dir", lambda: state_dir)
+    monkeypatch.delenv("CAPISCIO_OFFLINE", raising=False)
+    monkeypatch.setattr("capiscio.limits._rss_state_path", lambda: state_dir / "core-rss.json")
+    # Never hand CLI tests to a daemon the developer may have running
+    monkeypatch.setenv("CAPISCIO_NO_DAEMON", "1")
+    # Nor fetch badge keys for trust anchors configured on the developer's machine
+    monkeypatch.delenv("CAPISCIO_TRUST_ANCHORS", raising=False)
+    monkeypatch.setattr("capiscio.trust._default_cache", None)
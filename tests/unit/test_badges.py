@@ -0,0 +1,329 @@
+"""Tests for capiscio.badges module."""
+import json
+import time
+import base64
+import threading
+import subprocess
+from unittest.mock import patch
+import pytest
+
+from capiscio.badges import (
+    Badge, BadgePool, BadgeSpec, VerificationCache, decode_claims, issue_badge, issue_many,
+    parse_duration, run_issue_cli, verify_badge,
+)
+from capiscio.store import ResultStore
+
+
+def _token(**claims):
+    def part(data):
+        return base64.urlsafe_b64encode(json.dumps(data).encode()).rstrip(b"=").decode()
+    return f"{part({'alg': 'EdDSA'})}.{part(claims)}.c2ln"
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def _core(returncode=0, stderr=""):
+    return patch("capiscio.badges.run_core_captured",
+                 side_effect=lambda args: subprocess.CompletedProcess(args, returncode, "", stderr))
+
+
+class TestDecodeClaims:
+    def test_reads_payload(self):
+        assert decode_claims(_token(sub="did:web:a", exp=2000)) == {"sub": "did:web:a", "exp": 2000}
+
+    @pytest.mark.parametrize("token", ["", "abc", "a.!!!.c", "a.bnVsbA.c"])
+    def test_malformed_tokens(self, token):
+        assert decode_claims(token) == {}
+
+
+class TestVerifyBadge:
+    """Tests for cached verification."""
+
+    def test_repeat_checks_hit_the_cache(self):
+        cache = VerificationCache(clock=_Clock())
+        token = _token(exp=5000)
+        with _core() as core:
+            first = verify_badge(token, cache=cache)
+            second = verify_badge(token, cache=cache)
+        assert core.call_count == 1
+        assert first.valid and not first.cached
+        assert second.valid and second.cached
+        assert core.call_args[0][0] == ["badge", "verify", token]
+
+    def test_outcomes_are_stored(self, tmp_path):
+        cache = VerificationCache(clock=_Clock())
+        with ResultStore(tmp_path / "r.db") as store:
+            with _core():
+                verify_badge(_token(sub="did:web:a", exp=5000), cache=cache, store=store)
+                verify_badge(_token(sub="did:web:a", exp=5000), cache=cache, store=store)
+            with _core(1, "signature mismatch"):
+                verify_badge(_token(sub="did:web:b", exp=5000), cache=cache, store=store)
+            rows = list(store.query(kind="badge", ascending=True))
+        assert [(r.agent, r.status) for r in rows] == [("did:web:a", "pass")] * 2 + [("did:web:b", "fail")]
+        assert json.loads(rows[2].detail) == ["signature mismatch"]
+
+    def test_options_are_part_of_the_key(self):
+        cache = VerificationCache(clock=_Clock())
+        token = _token(exp=5000)
+        with _core() as core:
+            verify_badge(token, cache=cache)
+            verify_badge(token, accept_self_signed=True, offline=True, audience="https://api", cache=cache)
+            verify_badge(token, accept_self_signed=True, offline=True, audience="https://api", cache=cache)
+        assert core.call_count == 2
+        assert core.call_args[0][0][3:] == ["--accept-self-signed", "--offline", "--audience", "https://api"]
+
+    def test_ttl_bounded_by_exp(self):
+        clock = _Clock()
+        cache = VerificationCache(max_ttl=300, clock=clock)
+        token = _token(exp=clock.now + 60)
+        with _core() as core:
+            verify_badge(token, cache=cache)
+            clock.now += 59
+            verify_badge(token, cache=cache)
+            clock.now += 2
+            verify_badge(token, cache=cache)
+        assert core.call_count == 2
+
+    def test_ttl_bounded_by_max_ttl(self):
+        clock = _Clock()
+        cache = VerificationCache(max_ttl=10, clock=clock)
+        token = _token(exp=clock.now + 3600)
+        with _core() as core:
+            verify_badge(token, cache=cache)
+            clock.now += 11
+            verify_badge(token, cache=cache)
+        assert core.call_count == 2
+
+    def test_negative_caching(self):
+        clock = _Clock()
+        cache = VerificationCache(negative_ttl=5, clock=clock)
+        token = _token(exp=clock.now + 3600)
+        with _core(returncode=1, stderr="signature mismatch\n") as core:
+            first = verify_badge(token, cache=cache)
+            second = verify_badge(token, cache=cache)
+            clock.now += 6
+            verify_badge(token, cache=cache)
+        assert not first.valid and first.error == "signature mismatch"
+        assert not second.valid and second.cached
+        assert core.call_count == 2
+
+    def test_lru_eviction(self):
+        cache = VerificationCache(maxsize=2, clock=_Clock())
+        tokens = [_token(jti=str(i), exp=5000) for i in range(3)]
+        with _core() as core:
+            for token in tokens:
+                verify_badge(token, cache=cache)
+            verify_badge(tokens[0], cache=cache)
+        assert core.call_count == 4
+
+    def test_disk_cache_is_shared_and_stores_no_tokens(self, tmp_path):
+        clock = _Clock()
+        token = _token(exp=5000)
+        with _core() as core:
+            verify_badge(token, cache=VerificationCache(cache_dir=tmp_path, clock=clock))
+            result = verify_badge(token, cache=VerificationCache(cache_dir=tmp_path, clock=clock))
+        assert core.call_count == 1 and result.cached
+        assert all(token not in p.read_text() for p in tmp_path.iterdir())
+
+    def test_launch_errors_are_not_cached(self):
+        cache = VerificationCache(clock=_Clock())
+        with patch("capiscio.badges.run_core_captured", side_effect=OSError("no binary")):
+            with pytest.raises(OSError):
+                verify_badge(_token(exp=5000), cache=cache)
+        with _core() as core:
+            assert verify_badge(_token(exp=5000), cache=cache).valid
+        assert core.call_count == 1
+
+
+class _Issuer:
+    """Stand-in for issue_badge that records concurrency."""
+
+    def __init__(self, lifetime=60.0, delay=0.0, fail=False):
+        self.lifetime = lifetime
+        self.delay = delay
+        self.fail = fail
+        self.calls = []
+        self.active = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, spec):
+        with self._lock:
+            self.calls.append(spec)
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+            n = len(self.calls)
+        try:
+            time.sleep(self.delay)
+            if self.fail:
+                raise RuntimeError("core unavailable")
+            now = time.time()
+            return Badge(f"token-{n}", now, now + self.lifetime)
+        finally:
+            with self._lock:
+                self.active -= 1
+
+
+class TestBadgeSpec:
+    def test_args(self):
+        spec = BadgeSpec("agent.example.com", "https://api", exp=600, key="k.jwk")
+        assert spec.args() == ["badge", "issue", "--exp", "600s", "--domain", "agent.example.com",
+                               "--aud", "https://api", "--key", "k.jwk"]
+
+    def test_issue_badge_uses_exp_claim(self):
+        token = _token(exp=12345)
+        with patch("capiscio.badges.run_core_captured",
+                   return_value=subprocess.CompletedProcess([], 0, f"{token}\n", "")):
+            badge = issue_badge(BadgeSpec(self_sign=True), clock=lambda: 100.0)
+        assert badge == Badge(token, 100.0, 12345.0)
+
+    def test_issue_badge_failure(self):
+        with patch("capiscio.badges.run_core_captured",
+                   return_value=subprocess.CompletedProcess([], 1, "", "no key\n")):
+            with pytest.raises(RuntimeError, match="no key"):
+                issue_badge(BadgeSpec())
+
+
+class TestBadgePool:
+    """Tests for ahead-of-time issuance."""
+
+    def test_get_round_robins_ready_badges(self):
+        issuer = _Issuer()
+        with BadgePool(size=3, issue=issuer) as pool:
+            first = pool.get("a.example.com", "https://api")
+            time.sleep(0.1)
+            tokens = {pool.get("a.example.com", "https://api") for _ in range(6)}
+        assert first.startswith("token-")
+        assert len(tokens) == 3
+        assert {(s.domain, s.audience) for s in issuer.calls} == {("a.example.com", "https://api")}
+
+    def test_refreshes_before_expiry(self):
+        issuer = _Issuer(lifetime=2.0)
+        with BadgePool(size=1, refresh_at=0.5, issue=issuer) as pool:
+            first = pool.get("a")
+            time.sleep(1.3)
+            second = pool.get("a")
+        assert first != second
+        assert len(issuer.calls) == 2
+
+    def test_refresh_never_exceeds_worker_limit(self):
+        issuer = _Issuer(delay=0.02)
+        with BadgePool(size=10, workers=2, issue=issuer) as pool:
+            pool.get("a")
+            pool.get("b")
+            time.sleep(0.3)
+        assert len(issuer.calls) == 20
+        assert issuer.peak <= 2
+
+    def test_failures_surface_and_retry(self):
+        issuer = _Issuer(fail=True)
+        with BadgePool(size=1, issue=issuer) as pool:
+            with pytest.raises(RuntimeError, match="core unavailable"):
+                pool.get("a", timeout=0.2)
+            issuer.fail = False
+            assert pool.get("a", timeout=3).startswith("token-")
+
+    def test_refresh_at_must_be_a_fraction(self):
+        with pytest.raises(ValueError):
+            BadgePool(refresh_at=1.5)
+
+
+class TestIssueMany:
+    """Tests for bulk issuance."""
+
+    def test_preserves_input_order(self):
+        def slow_first(spec):
+            time.sleep(0.05 if spec.domain == "d0" else 0)
+            return Badge(f"token-{spec.domain}", 0, 600)
+
+        specs = (BadgeSpec(f"d{i}") for i in range(50))
+        tokens = [b.token for b in issue_many(specs, jobs=4, issue=slow_first)]
+        assert tokens == [f"token-d{i}" for i in range(50)]
+
+    def test_consumes_input_lazily(self):
+        consumed = []
+
+        def specs():
+            for i in range(1000):
+                consumed.append(i)
+                yield BadgeSpec(f"d{i}")
+
+        results = issue_many(specs(), jobs=2, issue=lambda spec: Badge(spec.domain, 0, 600))
+        next(results)
+        assert len(consumed) <= 2 * 4 + 1
+        assert sum(1 for _ in results) == 999
+
+    def test_failures(self):
+        def flaky(spec):
+            if spec.domain == "bad":
+                raise RuntimeError("no key")
+            return Badge(spec.domain, 0, 600)
+
+        specs = [BadgeSpec("a"), BadgeSpec("bad"), BadgeSpec("c")]
+        outcomes = list(issue_many(specs, jobs=2, issue=flaky, return_exceptions=True))
+        assert isinstance(outcomes[1], RuntimeError)
+        assert [outcomes[0].token, outcomes[2].token] == ["a", "c"]
+        with pytest.raises(RuntimeError):
+            list(issue_many(specs, jobs=2, issue=flaky))
+
+    def test_spec_from_dict(self):
+        defaults = BadgeSpec(exp=60, key="default.jwk")
+        spec = BadgeSpec.from_dict({"domain": "a.example.com", "aud": "https://api", "exp": "10m"}, defaults)
+        assert spec == BadgeSpec("a.example.com", "https://api", 600.0, "default.jwk")
+        assert parse_duration("2h") == 7200 and parse_duration(45) == 45
+
+
+class TestIssueCli:
+    def test_streams_ndjson_in_order(self, tmp_path):
+        specs = tmp_path / "specs.ndjson"
+        specs.write_text("\n".join(json.dumps({"domain": f"agent-{i}.example.com", "exp": "10m"}) for i in range(20)))
+        out = tmp_path / "badges.ndjson"
+        calls = []
+
+        def core(args):
+            calls.append(args)
+            return subprocess.CompletedProcess(args, 0, _token(sub=args[args.index("--domain") + 1], exp=9e9) + "\n", "")
+
+        with patch("capiscio.badges.download_binary"), patch("capiscio.badges.run_core_captured", side_effect=core):
+            assert run_issue_cli(["--from-file", str(specs), "--output", str(out), "--jobs", "4", "--key", "k.jwk"]) == 0
+
+        records = [json.loads(line) for line in out.read_text().splitlines()]
+        assert [r["index"] for r in records] == list(range(20))
+        assert all(decode_claims(r["token"])["sub"] == r["domain"] for r in records)
+        assert all(c[c.index("--exp") + 1] == "600s" and "--key" in c for c in calls)
+
+    def test_reports_failures(self, tmp_path):
+        specs = tmp_path / "specs.ndjson"
+        specs.write_text('{"domain": "a"}\n')
+        with patch("capiscio.badges.download_binary"), patch(
+            "capiscio.badges.run_core_captured", return_value=subprocess.CompletedProcess([], 1, "", "boom")
+        ):
+            assert run_issue_cli(["--from-file", str(specs), "--output", str(tmp_path / "out")]) == 1
+        assert "boom" in json.loads((tmp_path / "out").read_text())["error"]
+
+    @pytest.mark.parametrize("extra, message", [
+        (["--exp", "soon"], "soon"),
+        (["--output", "{tmp}/missing/out.ndjson"], "missing"),
+    ])
+    def test_bad_options_are_reported(self, tmp_path, capsys, extra, message):
+        specs = tmp_path / "specs.ndjson"
+        specs.write_text('{"domain": "a"}\n')
+        extra = [arg.format(tmp=tmp_path) for arg in extra]
+        with patch("capiscio.badges.run_core_captured") as mock_run:
+            assert run_issue_cli(["--from-file", str(specs)] + extra) == 1
+        mock_run.assert_not_called()
+        err = capsys.readouterr().err
+        assert "Error:" in err and message in err
+
+    def test_missing_spec_file_is_reported(self, tmp_path, capsys):
+        with patch("capiscio.badges.run_core_captured") as mock_run:
+            assert run_issue_cli(["--from-file", str(tmp_path / "nope.ndjson")]) == 1
+        mock_run.assert_not_called()
+        err = capsys.readouterr().err
+        assert "Error:" in err and "nope.ndjson" in err
@@ -0,0 +1,221 @@
+"""Tests for capiscio.batch module."""
+import json
+import os
+import subprocess
+from unittest.mock import patch
+import pytest
+
+from capiscio.batch import (
+    ValidationIndex,
+    CardResult,
+    discover_cards,
+    split_args,
+    run_batch,
+    run_batch_cli,
+    report,
+)
+from capiscio.process import ResourceUsage
+from capiscio.results import ValidationResult
+from capiscio.store import ResultStore
+
+
+def _completed(returncode=0, stdout='{"success": true}\n', stderr=""):
+    return subprocess.CompletedProcess(args=[], returncode=returncode, stdout=stdout, stderr=stderr)
+
+
+@pytest.fixture
+def cards(tmp_path):
+    """Three small agent card files in a nested layout."""
+    root = tmp_path / "cards"
+    (root / "a").mkdir(parents=True)
+    paths = [root / "a" / "one.json", root / "a" / "two.json", root / "three.json"]
+    for i, p in enumerate(paths):
+        p.write_text(json.dumps({"name": f"agent-{i}"}))
+    (root / "notes.txt").write_text("not a card")
+    return root, paths
+
+
+class TestDiscoverCards:
+    """Tests for target expansion."""
+
+    def test_expands_directories_to_json_files(self, cards):
+        """Directories expand to their JSON files, sorted, non-JSON ignored."""
+        root, paths = cards
+        found = discover_cards([str(root)])
+        assert found == sorted(str(p) for p in paths)
+
+    def test_deduplicates_targets(self, cards):
+        """A file named twice is only validated once."""
+        _, paths = cards
+        found = discover_cards([str(paths[0]), str(paths[0])])
+        assert found == [str(paths[0])]
+
+
+class TestSplitArgs:
+    """Tests for separating card targets from core flags."""
+
+    def test_existing_paths_and_urls_are_targets(self, cards):
+        _, paths = cards
+        targets, flags = split_args([str(paths[0]), "--schema-only", "https://agent.example.com", "--json"])
+        assert targets == [str(paths[0]), "https://agent.example.com"]
+        assert flags == ["--schema-only", "--json"]
+
+    def test_flag_values_are_forwarded(self, cards):
+        _, paths = cards
+        targets, flags = split_args(["--registry", "staging", str(paths[0]), "--timeout=5"])
+        assert targets == [str(paths[0])]
+        assert flags == ["--registry", "staging", "--timeout=5"]
+
+    @pytest.mark.parametrize("args", [
+        ["missing-card.json"],
+        ["--schema-only", "cards/missing.json"],
+        ["--json=true", "typo"],
+        ["typo"],
+    ])
+    def test_missing_paths_are_rejected(self, cards, args):
+        with pytest.raises(ValueError, match="no such file or directory"):
+            split_args(args)
+
+    def test_cli_reports_missing_path(self, cards, capsys):
+        _, paths = cards
+        with patch('capiscio.batch.run_batch') as mock_run:
+            assert run_batch_cli(["--incremental", str(paths[0]), "typo.json"]) == 1
+        mock_run.assert_not_called()
+
+
+@patch('capiscio.batch.download_binary')
+class TestIncrementalBatch:
+    """Tests for incremental validation against the index."""
+
+    def test_first_run_validates_everything(self, mock_download, cards, tmp_path):
+        root, paths = cards
+        index_path = tmp_path / "index.json"
+        with patch('capiscio.batch.run_core_captured', return_value=_completed()) as mock_run:
+            results = run_batch([str(root)], ["--schema-only"], incremental=True, index_path=index_path)
+        assert mock_run.call_count == 3
+        assert not any(r.cached for r in results)
+        assert index_path.exists()
+
+    def test_second_run_reuses_unchanged_cards(self, mock_download, cards, tmp_path):
+        root, paths = cards
+        index_path = tmp_path / "index.json"
+        with patch('capiscio.batch.run_core_captured', return_value=_completed()):
+            run_batch([str(root)], ["--schema-only"], incremental=True, index_path=index_path)
+
+        paths[1].write_text(json.dumps({"name": "changed"}))
+        with patch('capiscio.batch.run_core_captured', return_value=_completed(1, "", "bad")) as mock_run:
+            results = run_batch([str(root)], ["--schema-only"], incremental=True, index_path=index_path)
+
+        mock_run.assert_called_once()
+        assert mock_run.call_args[0][0] == ["validate", str(paths[1]), "--schema-only"]
+        by_target = {r.target: r for r in results}
+        assert by_target[str(paths[1])].returncode == 1
+        assert by_target[str(paths[0])].cached is True
+
+    def test_results_are_stored(self, mock_download, cards, tmp_path):
+        root, paths = cards
+        db = tmp_path / "r.db"
+        args = ["--incremental", "--store=" + str(db), str(root), "--schema-only"]
+        with patch('capiscio.batch.run_core_captured', return_value=_completed()) as mock_run, \
+             patch('capiscio.batch.default_index_path', return_value=tmp_path / "index.json"):
+            assert run_batch_cli(args) == 0
+            assert run_batch_cli(args) == 0
+        assert mock_run.call_count == 3
+        with ResultStore(db) as store:
+            rows = list(store.query())
+        # Reused results are recorded too: each run is a point in the history
+        assert sorted(r.agent for r in rows) == sorted(str(p) for p in paths for _ in range(2))
+        assert {r.status for r in rows} == {"pass"}
+
+    def test_touched_but_identical_file_is_reused(self, mock_download, cards, tmp_path):
+        """A changed mtime with identical content falls back to the hash and hits."""
+        root, paths = cards
+        index_path = tmp_path / "index.json"
+        with patch('capiscio.batch.run_core_captured', return_value=_completed()):
+            run_batch([str(root)], [], incremental=True, index_path=index_path)
+
+        st = paths[0].stat()
+        os.utime(paths[0], ns=(st.st_atime_ns, st.st_mtime_ns + 10_000_000))
+        with patch('capiscio.batch.run_core_captured') as mock_run:
+            results = run_batch([str(root)], [], incremental=True, index_path=index_path)
+        mock_run.assert_not_called()
+        assert all(r.cached for r in results)
+
+    def test_subset_run_keeps_the_rest_of_the_index(self, mock_download, cards, tmp_path, monkeypatch):
+        root, paths = cards
+        index_path = tmp_path / "index.json"
+        with patch('capiscio.batch.run_core_captured', return_value=_completed()):
+            run_batch([str(root)], [], incremental=True, index_path=index_path)
+            # Same card by a different spelling, then a subset of the tree
+            monkeypatch.chdir(root)
+            run_batch([os.path.join("a", "one.json")], [], incremental=True, index_path=index_path)
+        with patch('capiscio.batch.run_core_captured') as mock_run:
+            results = run_batch([str(root)], [], incremental=True, index_path=index_path)
+        mock_run.assert_not_called()
+        assert all(r.cached for r in results)
+
+    def test_deleted_cards_are_pruned(self, mock_download, cards, tmp_path):
+        root, paths = cards
+        index_path = tmp_path / "index.json"
+        with patch('capiscio.batch.run_core_captured', return_value=_completed()):
+            run_batch([str(root)], [], incremental=True, index_path=index_path)
+        paths[0].unlink()
+        with patch('capiscio.batch.run_core_captured') as mock_run:
+            run_batch([str(root / "three.json")], [], incremental=True, index_path=index_path)
+            assert len(json.loads(index_path.read_text())["entries"]) == 3  # outside the run
+            run_batch([str(root)], [], incremental=True, index_path=index_path)
+        mock_run.assert_not_called()
+        keys = set(json.loads(index_path.read_text())["entries"])
+        assert keys == {str(p.resolve()) for p in paths[1:]}
+
+    def test_changed_flags_invalidate_index(self, mock_download, cards, tmp_path):
+        root, _ = cards
+        index_path = tmp_path / "index.json"
+        with patch('capiscio.batch.run_core_captured', return_value=_completed()):
+            run_batch([str(root)], [], incremental=True, index_path=index_path)
+        with patch('capiscio.batch.run_core_captured', return_value=_completed()) as mock_run:
+            run_batch([str(root)], ["--strict"], incremental=True, index_path=index_path)
+        assert mock_run.call_count == 3
+
+    def test_changed_core_version_invalidates_index(self, mock_download, tmp_path):
+        index_path = tmp_path / "index.json"
+        index_path.write_text(json.dumps({
+            "format": 2,
+            "coreVersion": "1.0.0",
+            "coreArgs": [],
+            "entries": {"a.json": {"size": 1, "mtime_ns": 1, "digest": "x",
+                                   "returncode": 0, "stdout": "", "stderr": ""}},
+        }))
+        fresh = ValidationIndex(index_path, "2.0.0", []).load()
+        assert fresh.entries == {}
+
+
+class TestReport:
+    """Tests for combined outcome reporting."""
+
+    @patch('capiscio.batch.console')
+    def test_exit_code_reflects_failures(self, mock_console, capsys):
+        results = [
+            CardResult("a.json", 0, "", "", cached=True),
+            CardResult("b.json", 1, "FAIL\n", "", cached=True),
+        ]
+        assert report(results, json_output=False) == 1
+        assert "FAIL" in capsys.readouterr().out
+
+    def test_json_output_is_ndjson(self, capsys):
+        results = [CardResult("a.json", 0, '{"success": true}', "", cached=True)]
+        assert report(results, json_output=True) == 0
+        record = json.loads(capsys.readouterr().out.strip())
+        assert record == {"target": "a.json", "exitCode": 0, "cached": True, "result": {"success": True}}
+
+    @patch('capiscio.batch.download_binary')
+    def test_records_carry_core_usage(self, mock_download, cards, capsys):
+        _, paths = cards
+        completed = _completed()
+        completed.usage = ResourceUsage(12.5, 8.0, 2.0, 20480)
+        with patch('capiscio.batch.run_core_captured', return_value=completed):
+            results = run_batch([str(paths[0])], ["--json"])
+        report(results, json_output=True)
+        record = json.loads(capsys.readouterr().out)
+        assert record["usage"] == {"wallMs": 12.5, "userMs": 8.0, "sysMs": 2.0, "maxRssKb": 20480}
+        assert ValidationResult.from_dict(record).usage["maxRssKb"] == 20480
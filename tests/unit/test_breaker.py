@@ -0,0 +1,92 @@
+"""Tests for capiscio.breaker module."""
+import pytest
+import requests
+
+from capiscio.breaker import CircuitBreaker, NetworkUnavailable, PROBE_WINDOW, origin
+
+
+class Clock:
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return Clock()
+
+
+@pytest.fixture
+def breaker(tmp_path, clock):
+    return CircuitBreaker(tmp_path, cooldown=300, clock=clock)
+
+
+class TestCircuitBreaker:
+    def test_closed_by_default(self, breaker):
+        breaker.check("github.com")
+
+    def test_offline_env_blocks_every_host(self, breaker, monkeypatch):
+        monkeypatch.setenv("CAPISCIO_OFFLINE", "1")
+        with pytest.raises(NetworkUnavailable, match="CAPISCIO_OFFLINE"):
+            breaker.check("github.com")
+
+    def test_failure_opens_for_other_instances(self, tmp_path, breaker, clock):
+        breaker.failure("github.com", requests.exceptions.ConnectTimeout("timed out"))
+        clock.now += 10
+        with pytest.raises(NetworkUnavailable, match="ConnectTimeout"):
+            CircuitBreaker(tmp_path, cooldown=300, clock=clock).check("github.com")
+        # Other hosts are unaffected
+        breaker.check("registry.example.com")
+
+    def test_half_open_lets_one_probe_through(self, tmp_path, breaker, clock):
+        breaker.failure("github.com", requests.exceptions.ConnectionError("refused"))
+        clock.now += 301
+        breaker.check("github.com")
+        with pytest.raises(NetworkUnavailable):
+            CircuitBreaker(tmp_path, cooldown=300, clock=clock).check("github.com")
+        # An abandoned probe does not block forever
+        clock.now += PROBE_WINDOW + 1
+        breaker.check("github.com")
+
+    def test_success_closes(self, breaker, clock):
+        breaker.failure("github.com", requests.exceptions.ConnectionError("refused"))
+        clock.now += 301
+        breaker.check("github.com")
+        breaker.success("github.com")
+        breaker.check("github.com")
+
+    def test_failed_probe_reopens(self, breaker, clock):
+        breaker.failure("github.com", requests.exceptions.ConnectionError("refused"))
+        clock.now += 301
+        breaker.check("github.com")
+        breaker.failure("github.com", requests.exceptions.ConnectionError("refused"))
+        clock.now += 200
+        with pytest.raises(NetworkUnavailable):
+            breaker.check("github.com")
+        assert breaker._read("github.com")["failures"] == 2
+
+    def test_guard_records_only_network_errors(self, breaker):
+        with pytest.raises(requests.exceptions.HTTPError):
+            with breaker.guard("github.com"):
+                raise requests.exceptions.HTTPError("404")
+        breaker.check("github.com")
+
+        with pytest.raises(requests.exceptions.ConnectionError):
+            with breaker.guard("github.com"):
+                raise requests.exceptions.ConnectionError("refused")
+        with pytest.raises(NetworkUnavailable):
+            breaker.check("github.com")
+
+    def test_cooldown_from_env(self, tmp_path, monkeypatch):
+        monkeypatch.setenv("CAPISCIO_BREAKER_COOLDOWN", "5")
+        assert CircuitBreaker(tmp_path).cooldown == 5.0
+        monkeypatch.setenv("CAPISCIO_BREAKER_COOLDOWN", "soon")
+        assert CircuitBreaker(tmp_path).cooldown == 300.0
+
+
+def test_origin_includes_scheme_and_port():
+    assert origin("https://a.example.com/.well-known/agent-card.json") == "https://a.example.com:443"
+    assert origin("http://a.example.com:8080/card.json") == "http://a.example.com:8080"
+    assert origin("http://127.0.0.1") == "http://127.0.0.1:80"
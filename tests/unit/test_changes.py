@@ -0,0 +1,75 @@
+"""Tests for capiscio.changes module."""
+import pytest
+
+from capiscio.changes import ChangeTracker, FAILURE, RECOVERY, NEW, TRUST_CHANGED, ISSUES_CHANGED
+
+
+def _record(agent, success=True, trust=3, errors=()):
+    return {
+        "agent": agent,
+        "exitCode": 0 if success else 1,
+        "result": {"success": success, "trustLevel": trust, "errors": list(errors)},
+    }
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestChangeTracker:
+    """Tests for transition detection."""
+
+    def test_unchanged_results_are_dropped(self):
+        tracker = ChangeTracker()
+        assert tracker.observe(_record("a"))["change"] == NEW
+        assert tracker.observe(_record("a")) is None
+
+    @pytest.mark.parametrize("second, kind", [
+        (_record("a", success=False), FAILURE),
+        (_record("a", trust=1), TRUST_CHANGED),
+        (_record("a", errors=["new problem"]), ISSUES_CHANGED),
+    ])
+    def test_transition_kinds(self, second, kind):
+        tracker = ChangeTracker()
+        tracker.observe(_record("a"))
+        assert tracker.observe(second)["change"] == kind
+
+    def test_recovery(self):
+        tracker = ChangeTracker()
+        tracker.observe(_record("a", success=False))
+        change = tracker.observe(_record("a"))
+        assert change["change"] == RECOVERY
+        assert change["previous"] == {"success": False, "trustLevel": 3}
+
+    def test_issue_order_does_not_matter(self):
+        tracker = ChangeTracker()
+        tracker.observe(_record("a", success=False, errors=["x", "y"]))
+        assert tracker.observe(_record("a", success=False, errors=["y", "x"])) is None
+
+    def test_filter_emits_periodic_snapshots(self):
+        clock = _Clock()
+        out = []
+        sink = ChangeTracker(snapshot_interval=60, clock=clock).filter(out.append)
+        for _ in range(10):
+            sink(_record("a"))
+            sink(_record("b"))
+        assert [r["change"] for r in out] == [NEW, NEW]
+
+        clock.now += 61
+        sink(_record("a"))
+        assert out[-1]["snapshot"] is True
+        assert set(out[-1]["agents"]) == {"a", "b"}
+
+    def test_state_survives_restart(self, tmp_path):
+        path = tmp_path / "state.json"
+        first = ChangeTracker(path)
+        first.observe(_record("a"))
+        first.save()
+
+        second = ChangeTracker(path)
+        assert second.observe(_record("a")) is None
+        assert second.observe(_record("a", success=False))["change"] == FAILURE
@@ -18,7 +18,7 @@ class TestMainCLI:
         # Mock sys.argv
         with patch.object(sys, 'argv', test_args):
             # Mock run_core to avoid actual execution/download
-            with patch('capiscio.cli.run_core') as mock_run_core:
+            with patch('capiscio.manager.run_core') as mock_run_core:
                 # Mock sys.exit to prevent test from exiting
                 with patch.object(sys, 'exit') as mock_exit:
                     main()
@@ -33,7 +33,7 @@ class TestMainCLI:
         test_args = ["capiscio"]
         
         with patch.object(sys, 'argv', test_args):
-            with patch('capiscio.cli.run_core') as mock_run_core:
+            with patch('capiscio.manager.run_core') as mock_run_core:
                 with patch.object(sys, 'exit'):
                     main()
                     mock_run_core.assert_called_once_with([])
@@ -47,7 +47,7 @@ class TestWrapperCommands:
         test_args = ["capiscio", "--wrapper-version"]
         
         with patch.object(sys, 'argv', test_args):
-            with patch('capiscio.cli.run_core') as mock_run_core:
+            with patch('capiscio.manager.run_core') as mock_run_core:
                 with patch.object(sys, 'exit') as mock_exit:
                     # We need to mock importlib.metadata.version since package might not be installed
                     with patch('importlib.metadata.version', return_value="1.2.3"):
@@ -63,7 +63,7 @@ class TestWrapperCommands:
         test_args = ["capiscio", "--wrapper-version"]
         
         with patch.object(sys, 'argv', test_args):
-            with patch('capiscio.cli.run_core') as mock_run_core:
+            with patch('capiscio.manager.run_core') as mock_run_core:
                 with patch.object(sys, 'exit') as mock_exit:
                     with patch('importlib.metadata.version', side_effect=Exception("Not found")):
                         with patch('capiscio.cli.console') as mock_console:
@@ -79,10 +79,10 @@ class TestWrapperCommands:
         test_args = ["capiscio", "--wrapper-clean"]
         
         with patch.object(sys, 'argv', test_args):
-            with patch('capiscio.cli.run_core') as mock_run_core:
+            with patch('capiscio.manager.run_core') as mock_run_core:
                 with patch.object(sys, 'exit') as mock_exit:
                     with patch('shutil.rmtree') as mock_rmtree:
-                        with patch('capiscio.cli.get_cache_dir') as mock_get_dir:
+                        with patch('capiscio.manager.get_cache_dir') as mock_get_dir:
                             mock_dir = MagicMock()
                             mock_dir.exists.return_value = True
                             mock_get_dir.return_value = mock_dir
@@ -98,10 +98,10 @@ class TestWrapperCommands:
         test_args = ["capiscio", "--wrapper-clean"]
         
         with patch.object(sys, 'argv', test_args):
-            with patch('capiscio.cli.run_core') as mock_run_core:
+            with patch('capiscio.manager.run_core') as mock_run_core:
                 with patch.object(sys, 'exit') as mock_exit:
                     with patch('shutil.rmtree') as mock_rmtree:
-                        with patch('capiscio.cli.get_cache_dir') as mock_get_dir:
+                        with patch('capiscio.manager.get_cache_dir') as mock_get_dir:
                             with patch('capiscio.cli.console') as mock_console:
                                 mock_dir = MagicMock()
                                 mock_dir.exists.return_value = False
@@ -118,10 +118,10 @@ class TestWrapperCommands:
         test_args = ["capiscio", "--wrapper-clean"]
         
         with patch.object(sys, 'argv', test_args):
-            with patch('capiscio.cli.run_core') as mock_run_core:
+            with patch('capiscio.manager.run_core') as mock_run_core:
                 with patch.object(sys, 'exit') as mock_exit:
                     with patch('shutil.rmtree', side_effect=PermissionError("Access denied")):
-                        with patch('capiscio.cli.get_cache_dir') as mock_get_dir:
+                        with patch('capiscio.manager.get_cache_dir') as mock_get_dir:
                             with patch('capiscio.cli.console') as mock_console:
                                 mock_dir = MagicMock()
                                 mock_dir.exists.return_value = True
@@ -138,7 +138,7 @@ class TestWrapperCommands:
         test_args = ["capiscio", "--wrapper-unknown"]
         
         with patch.object(sys, 'argv', test_args):
-            with patch('capiscio.cli.run_core') as mock_run_core:
+            with patch('capiscio.manager.run_core') as mock_run_core:
                 with patch.object(sys, 'exit'):
                     # Should return early, not call run_core
                     main()
@@ -153,7 +153,7 @@ class TestCommandDelegation:
         test_args = ["capiscio", "validate", "agent-card.json"]
         
         with patch.object(sys, 'argv', test_args):
-            with patch('capiscio.cli.run_core') as mock_run_core:
+            with patch('capiscio.manager.run_core') as mock_run_core:
                 with patch.object(sys, 'exit'):
                     main()
                     mock_run_core.assert_called_once_with(["validate", "agent-card.json"])
@@ -163,7 +163,7 @@ class TestCommandDelegation:
         test_args = ["capiscio", "score", "https://example.com/agent"]
         
         with patch.object(sys, 'argv', test_args):
-            with patch('capiscio.cli.run_core') as mock_run_core:
+            with patch('capiscio.manager.run_core') as mock_run_core:
                 with patch.object(sys, 'exit'):
                     main()
                     mock_run_core.assert_called_once_with(["score", "https://example.com/agent"])
@@ -173,7 +173,7 @@ class TestCommandDelegation:
         test_args = ["capiscio", "--help"]
         
         with patch.object(sys, 'argv', test_args):
-            with patch('capiscio.cli.run_core') as mock_run_core:
+            with patch('capiscio.manager.run_core') as mock_run_core:
                 with patch.object(sys, 'exit'):
                     main()
                     mock_run_core.assert_called_once_with(["--help"])
@@ -183,7 +183,7 @@ class TestCommandDelegation:
         test_args = ["capiscio", "--version"]
         
         with patch.object(sys, 'argv', test_args):
-            with patch('capiscio.cli.run_core') as mock_run_core:
+            with patch('capiscio.manager.run_core') as mock_run_core:
                 with patch.object(sys, 'exit'):
                     main()
                     mock_run_core.assert_called_once_with(["--version"])
@@ -199,7 +199,7 @@ class TestCommandDelegation:
         ]
         
         with patch.object(sys, 'argv', test_args):
-            with patch('capiscio.cli.run_core') as mock_run_core:
+            with patch('capiscio.manager.run_core') as mock_run_core:
                 with patch.object(sys, 'exit'):
                     main()
                     expected = [
@@ -220,7 +220,7 @@ class TestExitCodes:
         test_args = ["capiscio", "validate", "nonexistent.json"]
         
         with patch.object(sys, 'argv', test_args):
-            with patch('capiscio.cli.run_core', return_value=1) as mock_run_core:
+            with patch('capiscio.manager.run_core', return_value=1) as mock_run_core:
                 with patch.object(sys, 'exit') as mock_exit:
                     main()
                     mock_exit.assert_called_with(1)
@@ -230,8 +230,119 @@ class TestExitCodes:
         test_args = ["capiscio", "validate", "valid.json"]
         
         with patch.object(sys, 'argv', test_args):
-            with patch('capiscio.cli.run_core', return_value=0):
+            with patch('capiscio.manager.run_core', return_value=0):
                 with patch.object(sys, 'exit') as mock_exit:
                     main()
                     mock_exit.assert_called_with(0)
 
+
+
+class TestBatchDelegation:
+    """Tests for wrapper-side batch validation."""
+
+    def test_incremental_validate_uses_batch(self):
+        """validate --incremental is handled by the wrapper, not exec'd."""
+        test_args = ["capiscio", "validate", "--incremental", "cards/"]
+
+        with patch.object(sys, 'argv', test_args):
+            with patch('capiscio.manager.run_core') as mock_run_core:
+                with patch('capiscio.batch.run_batch_cli', return_value=0) as mock_batch:
+                    with patch.object(sys, 'exit') as mock_exit:
+                        main()
+                        mock_batch.assert_called_once_with(["--incremental", "cards/"])
+                        mock_run_core.assert_not_called()
+                        mock_exit.assert_called_with(0)
+
+    def test_watch_is_handled_by_wrapper(self):
+        """watch is a wrapper command and never reaches the core."""
+        test_args = ["capiscio", "watch", "agent-card.json"]
+
+        with patch.object(sys, 'argv', test_args):
+            with patch('capiscio.manager.run_core') as mock_run_core:
+                with patch('capiscio.watch.run_watch_cli', return_value=0) as mock_watch:
+                    with patch.object(sys, 'exit'):
+                        main()
+                        mock_watch.assert_called_once_with(["agent-card.json"])
+                        mock_run_core.assert_not_called()
+
+    def test_monitor_is_handled_by_wrapper(self):
+        """monitor is a wrapper command and never reaches the core."""
+        test_args = ["capiscio", "monitor", "fleet.json", "--once"]
+
+        with patch.object(sys, 'argv', test_args):
+            with patch('capiscio.manager.run_core') as mock_run_core:
+                with patch('capiscio.monitor.run_monitor_cli', return_value=0) as mock_monitor:
+                    with patch.object(sys, 'exit'):
+                        main()
+                        mock_monitor.assert_called_once_with(["fleet.json", "--once"])
+                        mock_run_core.assert_not_called()
+
+    def test_sharded_validate_uses_batch(self):
+        """validate --shard is handled by the wrapper, not exec'd."""
+        test_args = ["capiscio", "validate", "--shard=2/4", "cards/"]
+
+        with patch.object(sys, 'argv', test_args):
+            with patch('capiscio.manager.run_core') as mock_run_core:
+                with patch('capiscio.batch.run_batch_cli', return_value=0) as mock_batch:
+                    with patch.object(sys, 'exit'):
+                        main()
+                        mock_batch.assert_called_once_with(["--shard=2/4", "cards/"])
+                        mock_run_core.assert_not_called()
+
+    def test_bulk_badge_issue_is_handled_by_wrapper(self):
+        """badge issue --from-file is a wrapper mode; plain badge issue still goes to the core."""
+        with patch.object(sys, 'argv', ["capiscio", "badge", "issue", "--from-file", "specs.ndjson"]):
+            with patch('capiscio.manager.run_core') as mock_run_core:
+                with patch('capiscio.badges.run_issue_cli', return_value=0) as mock_issue:
+                    with patch.object(sys, 'exit'):
+                        main()
+                        mock_issue.assert_called_once_with(["--from-file", "specs.ndjson"])
+                        mock_run_core.assert_not_called()
+
+        with patch.object(sys, 'argv', ["capiscio", "badge", "issue", "--self-sign"]):
+            with patch('capiscio.manager.run_core', return_value=0) as mock_run_core:
+                with patch.object(sys, 'exit'):
+                    main()
+                    mock_run_core.assert_called_once_with(["badge", "issue", "--self-sign"])
+
+    def test_supervised_gateway_is_handled_by_wrapper(self):
+        """gateway start --workers runs the supervisor instead of exec'ing the core."""
+        test_args = ["capiscio", "gateway", "start", "--workers", "4", "--target", "http://localhost:3000"]
+
+        with patch.object(sys, 'argv', test_args):
+            with patch('capiscio.manager.run_core') as mock_run_core:
+                with patch('capiscio.gateway.run_gateway_cli', return_value=0) as mock_gateway:
+                    with patch.object(sys, 'exit'):
+                        main()
+                        mock_gateway.assert_called_once_with(["--workers", "4", "--target", "http://localhost:3000"])
+                        mock_run_core.assert_not_called()
+
+
+class TestDaemonForwarding:
+    """Core runs go to a listening daemon first (capiscio --wrapper-daemon)."""
+
+    def test_forwarded_run_exits_with_core_status(self):
+        with patch.object(sys, 'argv', ["capiscio", "validate", "card.json"]):
+            with patch('capiscio.daemon.forward', return_value=3) as mock_forward:
+                with patch('capiscio.manager.run_core') as mock_run_core:
+                    with patch('os._exit') as mock_exit:
+                        main()
+                        mock_forward.assert_called_once_with(["validate", "card.json"])
+                        mock_exit.assert_called_once_with(3)
+                        mock_run_core.assert_not_called()
+
+    def test_falls_back_to_exec_without_daemon(self):
+        with patch.object(sys, 'argv', ["capiscio", "validate", "card.json"]):
+            with patch('capiscio.daemon.forward', return_value=None):
+                with patch('capiscio.manager.run_core', return_value=0) as mock_run_core:
+                    with patch.object(sys, 'exit'):
+                        main()
+                        mock_run_core.assert_called_once_with(["validate", "card.json"])
+
+    def test_wrapper_commands_are_not_forwarded(self):
+        with patch.object(sys, 'argv', ["capiscio", "watch", "cards/"]):
+            with patch('capiscio.daemon.forward') as mock_forward:
+                with patch('capiscio.watch.run_watch_cli', return_value=0):
+                    with patch.object(sys, 'exit'):
+                        main()
+                        mock_forward.assert_not_called()
@@ -0,0 +1,173 @@
+"""Tests for capiscio.daemon module."""
+import os
+import json
+import socket
+import stat
+import threading
+import time
+from unittest.mock import patch
+
+import pytest
+
+from capiscio import daemon
+from capiscio.daemon import CoreDaemon, _Reader, _connect, _send, forward, request
+from capiscio.manager import CORE_VERSION
+
+FAKE_CORE = """#!/bin/sh
+trap 'echo interrupted; exit 7' TERM
+echo "args=$* cwd=$(pwd) flavour=$FLAVOUR"
+echo "to stderr" >&2
+if [ "$1" = "sleep" ]; then
+    sleep 30 & wait
+fi
+[ "$1" = "crash" ] && kill -KILL $$
+exit 3
+"""
+
+pytestmark = pytest.mark.skipif(not daemon.HAVE_FD_PASSING, reason="needs Unix sockets with descriptor passing")
+
+
+@pytest.fixture(autouse=True)
+def _allow_forwarding(monkeypatch):
+    monkeypatch.delenv(daemon.DISABLE_ENV, raising=False)
+    monkeypatch.delenv("CAPISCIO_CORE_VERSION", raising=False)
+    monkeypatch.setattr(daemon, "ACCEPT_POLL", 0.05)
+
+
+@pytest.fixture
+def running(tmp_path):
+    binary = tmp_path / "capiscio-core"
+    binary.write_text(FAKE_CORE)
+    binary.chmod(binary.stat().st_mode | stat.S_IEXEC)
+    server = CoreDaemon(tmp_path / "d.sock", binary, CORE_VERSION, idle_timeout=60)
+    server.bind()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.stop()
+    thread.join(5)
+
+
+class TestForward:
+    def test_runs_core_on_our_stdio(self, running, tmp_path, capfd, monkeypatch):
+        monkeypatch.setenv("FLAVOUR", "mint")
+        monkeypatch.chdir(tmp_path)
+        assert forward(["validate", "card.json"], path=running.path) == 3
+        out, err = capfd.readouterr()
+        assert out == f"args=validate card.json cwd={tmp_path} flavour=mint\n"
+        assert err == "to stderr\n"
+        assert running.served == 1
+
+    def test_no_daemon(self, tmp_path):
+        assert forward(["validate"], path=tmp_path / "missing.sock") is None
+
+    def test_stale_socket(self, tmp_path):
+        stale = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        stale.bind(str(tmp_path / "stale.sock"))
+        stale.close()
+        assert forward(["validate"], path=tmp_path / "stale.sock") is None
+
+    def test_disabled(self, running, monkeypatch):
+        monkeypatch.setenv(daemon.DISABLE_ENV, "1")
+        assert forward(["validate"], path=running.path) is None
+        assert running.served == 0
+
+    def test_other_core_version_declined(self, running, monkeypatch, capfd):
+        monkeypatch.setenv("CAPISCIO_CORE_VERSION", "9.9.9")
+        assert forward(["validate"], path=running.path) is None
+        assert capfd.readouterr().out == ""
+
+    def test_missing_binary_declined(self, running):
+        running.binary.unlink()
+        assert forward(["validate"], path=running.path) is None
+
+    def test_signal_exit_reported_like_a_shell(self, running, capfd):
+        assert forward(["crash"], path=running.path) == 128 + 9
+
+
+class TestCoreDaemon:
+    def test_relays_signals_to_the_core(self, running, tmp_path):
+        out_r, out_w = os.pipe()
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.connect(str(running.path))
+            null = os.open(os.devnull, os.O_RDWR)
+            _send(sock, {"argv": ["sleep"], "cwd": str(tmp_path), "env": {"PATH": os.environ["PATH"]}},
+                  fds=(null, out_w, null))
+            os.close(null)
+            os.close(out_w)
+            with os.fdopen(out_r) as out:
+                assert out.readline().startswith("args=sleep")
+                _send(sock, {"signal": 15})
+                assert _Reader(sock).read()[0] == {"exit": 7}
+                assert out.readline() == "interrupted\n"
+
+    def test_status_and_stop(self, running):
+        status = request({"command": "status"}, running.path)
+        assert status["version"] == CORE_VERSION
+        assert status["pid"] == os.getpid()
+        assert request({"command": "stop"}, running.path) == {"stopping": True}
+        running._stopping.wait(1)
+        assert running._stopping.is_set()
+
+    def test_refuses_second_daemon(self, running):
+        with pytest.raises(RuntimeError, match="already listening"):
+            CoreDaemon(running.path, running.binary, CORE_VERSION).bind()
+
+    def test_replaces_stale_socket(self, tmp_path):
+        path = tmp_path / "d.sock"
+        stale = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        stale.bind(str(path))
+        stale.close()
+        server = CoreDaemon(path, tmp_path / "core", CORE_VERSION)
+        server.bind()
+        assert stat.S_ISSOCK(os.stat(path).st_mode)
+        assert _connect(path) is not None
+        server.close()
+        assert not path.exists()
+
+    def test_exits_when_idle(self, tmp_path):
+        now = [0.0]
+        server = CoreDaemon(tmp_path / "d.sock", tmp_path / "core", CORE_VERSION, idle_timeout=10,
+                            clock=lambda: now[0])
+        server.bind()
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        assert request({"command": "status"}, server.path)["active"] == 0
+        while server.active:
+            time.sleep(0.01)
+        now[0] = 9.0
+        time.sleep(0.2)
+        assert thread.is_alive()
+        now[0] = 11.0
+        thread.join(5)
+        assert not thread.is_alive()
+        assert not server.path.exists()
+
+
+def test_socket_dir_created_only_by_the_daemon(tmp_path):
+    with patch("platformdirs.user_cache_dir", return_value=str(tmp_path / "capiscio")):
+        path = daemon.socket_path()
+        assert forward(["validate"]) is None
+        assert request({"command": "status"}) is None
+    assert path.name == daemon.SOCKET_NAME
+    assert not (tmp_path / "capiscio").exists()
+
+    server = CoreDaemon(path, tmp_path / "core", CORE_VERSION)
+    server.bind()
+    assert stat.S_IMODE(path.parent.stat().st_mode) == 0o700
+    server.close()
+
+
+def test_run_daemon_cli_without_daemon(monkeypatch, tmp_path):
+    monkeypatch.setattr(daemon, "socket_path", lambda: tmp_path / "d.sock")
+    assert daemon.run_daemon_cli(["--status"]) == 1
+    assert daemon.run_daemon_cli(["--bogus"]) == 2
+
+
+def test_message_size_capped():
+    a, b = socket.socketpair()
+    with a, b:
+        data = json.dumps({"env": "x" * (daemon.MAX_MESSAGE + 1)}).encode()
+        threading.Thread(target=a.sendall, args=(data,), daemon=True).start()
+        with pytest.raises(ValueError):
+            _Reader(b).read()
@@ -0,0 +1,219 @@
+"""Tests for capiscio.fetch module."""
+import json
+import subprocess
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+import pytest
+import requests
+
+from capiscio.batch import run_batch, validate_card
+from capiscio.breaker import OFFLINE_ENV, NetworkUnavailable
+from capiscio.fetch import CardCache, card_url, freshness
+
+CARD = json.dumps({"name": "stand-in", "skills": []}).encode()
+
+
+class _CardServer(BaseHTTPRequestHandler):
+    """Agent stand-in that honours If-None-Match with a fixed ETag."""
+
+    body = CARD
+    etag = '"v1"'
+    cache_control = "no-cache"
+    requests = []
+
+    def do_GET(self):
+        type(self).requests.append((self.path, self.headers.get("If-None-Match")))
+        if self.path.startswith("/missing"):
+            self.send_error(404)
+            return
+        if self.headers.get("If-None-Match") == self.etag:
+            self.send_response(304)
+            self.send_header("ETag", self.etag)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("ETag", self.etag)
+        self.send_header("Cache-Control", self.cache_control)
+        self.send_header("Content-Length", str(len(self.body)))
+        self.end_headers()
+        self.wfile.write(self.body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    handler = type("Handler", (_CardServer,), {"requests": []})
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    handler.httpd = httpd
+    threading.Thread(target=httpd.serve_forever, args=(0.05,), daemon=True).start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}", handler
+    httpd.shutdown()
+    httpd.server_close()
+
+
+class TestHelpers:
+    def test_card_url(self):
+        assert card_url("https://a.example.com") == "https://a.example.com/.well-known/agent-card.json"
+        assert card_url("https://a.example.com/card.json") == "https://a.example.com/card.json"
+
+    def test_freshness(self):
+        expires, no_store, no_cache = freshness({"Cache-Control": "public, max-age=60", "Age": "10"}, now=100.0)
+        assert expires == 150.0 and not no_store and not no_cache
+
+
+class TestCardCache:
+    """Tests for conditional GET against a local stand-in."""
+
+    def test_download_then_revalidate(self, server, tmp_path):
+        base, handler = server
+        cache = CardCache(tmp_path)
+        first = cache.fetch(base)
+        second = cache.fetch(base)
+        assert first.status == "downloaded"
+        assert second.status == "revalidated"
+        assert second.path.read_bytes() == CARD
+        assert handler.requests == [(
+            "/.well-known/agent-card.json", None), ("/.well-known/agent-card.json", '"v1"')]
+
+    def test_fresh_entry_skips_network(self, server, tmp_path):
+        base, handler = server
+        handler.cache_control = "max-age=300"
+        cache = CardCache(tmp_path)
+        cache.fetch(base)
+        assert cache.fetch(base).status == "fresh"
+        assert len(handler.requests) == 1
+
+    def test_no_store_is_never_fresh(self, server, tmp_path):
+        base, handler = server
+        handler.cache_control = "no-store, max-age=300"
+        handler.etag = '"changing"'
+        cache = CardCache(tmp_path)
+        cache.fetch(base)
+        assert cache.fetch(base).status == "downloaded"
+        assert handler.requests[1][1] is None
+
+    def test_changed_content_drops_stored_results(self, server, tmp_path):
+        base, handler = server
+        cache = CardCache(tmp_path)
+        card = cache.fetch(base)
+        cache.put_result(card, "2.7.0", [], {"returncode": 0, "stdout": "", "stderr": ""})
+        handler.body = b'{"name": "changed"}'
+        handler.etag = '"v2"'
+        changed = cache.fetch(base)
+        assert cache.get_result(changed, "2.7.0", []) is None
+
+    def test_offline_serves_cached_body(self, server, tmp_path, monkeypatch):
+        base, handler = server
+        cache = CardCache(tmp_path)
+        cache.fetch(base)
+        monkeypatch.setenv(OFFLINE_ENV, "1")
+        card = cache.fetch(base)
+        assert card.status == "offline"
+        assert card.path.read_bytes() == CARD
+        assert len(handler.requests) == 1
+
+    def test_offline_without_cache_fails_fast(self, server, tmp_path, monkeypatch):
+        base, handler = server
+        monkeypatch.setenv(OFFLINE_ENV, "1")
+        with pytest.raises(NetworkUnavailable):
+            CardCache(tmp_path).fetch(base)
+        assert handler.requests == []
+
+    def test_unreachable_host_opens_breaker(self, tmp_path):
+        cache = CardCache(tmp_path)
+        with pytest.raises(requests.ConnectionError):
+            cache.fetch("http://127.0.0.1:9")
+        with patch.object(cache.session, "get") as get:
+            with pytest.raises(NetworkUnavailable, match="unreachable"):
+                cache.fetch("http://127.0.0.1:9")
+        get.assert_not_called()
+
+    def test_breaker_is_keyed_by_origin(self, server, tmp_path):
+        base, _ = server
+        cache = CardCache(tmp_path)
+        with pytest.raises(requests.ConnectionError):
+            cache.fetch("http://127.0.0.1:9")
+        # Same host, different port: still reachable
+        assert cache.fetch(base).status == "downloaded"
+
+
+class TestValidateWithCache:
+    """Tests for result reuse in validate_card."""
+
+    def test_304_reuses_result_for_same_version_and_flags(self, server, tmp_path):
+        base, _ = server
+        cache = CardCache(tmp_path)
+        completed = subprocess.CompletedProcess([], 0, '{"success": true}', "")
+        with patch('capiscio.batch.run_core_captured', return_value=completed) as mock_run:
+            first = validate_card(base, ["--json"], cache)
+            second = validate_card(base, ["--json"], cache)
+            third = validate_card(base, ["--json", "--strict"], cache)
+        assert not first.cached and second.cached and not third.cached
+        assert mock_run.call_count == 2
+        # The core is handed the cached file, not the URL
+        assert mock_run.call_args_list[0][0][0][1].endswith(".json")
+        assert first.target == base
+
+    def test_live_tests_bypass_cache(self, server, tmp_path):
+        base, handler = server
+        completed = subprocess.CompletedProcess([], 0, "", "")
+        with patch('capiscio.batch.run_core_captured', return_value=completed) as mock_run:
+            validate_card(base, ["--test-live"], CardCache(tmp_path))
+        mock_run.assert_called_once_with(["validate", base, "--test-live"])
+        assert handler.requests == []
+
+    @pytest.mark.parametrize("json_output", [True, False])
+    def test_fetch_failure_fails_only_that_card(self, server, tmp_path, json_output):
+        base, _ = server
+        flags = ["--json"] if json_output else []
+        targets = [f"{base}/missing/agent-card.json", base, "http://127.0.0.1:9/agent-card.json"]
+        completed = subprocess.CompletedProcess([], 0, '{"success": true}', "")
+        with patch('capiscio.batch.download_binary'), \
+             patch('capiscio.batch.run_core_captured', return_value=completed) as mock_run:
+            results = run_batch(targets, flags, card_cache=CardCache(tmp_path))
+        assert mock_run.call_count == 1
+        assert [r.returncode for r in results] == [1, 0, 1]
+        missing = results[0]
+        if json_output:
+            report = json.loads(missing.stdout)
+            assert report["success"] is False
+            assert report["errors"][0]["code"] == "FETCH_FAILED"
+            assert "404" in report["errors"][0]["message"]
+        else:
+            assert missing.stderr.startswith("Error: ") and "404" in missing.stderr
+
+    def test_agent_going_down_is_never_a_cached_pass(self, server, tmp_path):
+        base, handler = server
+        cache = CardCache(tmp_path)
+        completed = subprocess.CompletedProcess([], 0, '{"success": true}', "")
+        with patch('capiscio.batch.run_core_captured', return_value=completed):
+            assert validate_card(base, ["--json"], cache).returncode == 0
+            handler.httpd.shutdown()
+            handler.httpd.server_close()
+            down = validate_card(base, ["--json"], cache)
+            recheck = validate_card(base, ["--json"], cache)
+        for result in (down, recheck):
+            assert result.returncode == 1 and not result.cached
+            assert json.loads(result.stdout)["errors"][0]["code"] == "FETCH_FAILED"
+        assert "unreachable" in recheck.stdout
+
+    def test_offline_reuses_result_for_cached_body(self, server, tmp_path, monkeypatch):
+        base, _ = server
+        cache = CardCache(tmp_path)
+        completed = subprocess.CompletedProcess([], 0, '{"success": true}', "")
+        with patch('capiscio.batch.run_core_captured', return_value=completed) as mock_run:
+            validate_card(base, ["--json"], cache)
+            monkeypatch.setenv(OFFLINE_ENV, "1")
+            result = validate_card(base, ["--json"], cache)
+        assert result.returncode == 0 and result.cached
+        assert mock_run.call_count == 1
+
+    def test_offline_uncached_card_fails_alone(self, server, tmp_path, monkeypatch):
+        base, _ = server
+        monkeypatch.setenv(OFFLINE_ENV, "1")
+        result = validate_card(base, [], CardCache(tmp_path))
+        assert result.returncode == 1
+        assert OFFLINE_ENV in result.stderr
@@ -0,0 +1,25 @@
+"""Tests for capiscio.files module."""
+import json
+from unittest.mock import patch
+import pytest
+
+from capiscio.files import atomic_write, write_json
+
+
+def test_replaces_existing_file(tmp_path):
+    path = tmp_path / "state.json"
+    path.write_text("old")
+    atomic_write(path, b"new")
+    assert path.read_bytes() == b"new"
+    write_json(path, {"a": [1, 2]})
+    assert json.loads(path.read_text()) == {"a": [1, 2]}
+    assert [p.name for p in tmp_path.iterdir()] == ["state.json"]
+
+
+def test_failed_write_leaves_target_and_no_temp_file(tmp_path):
+    path = tmp_path / "state.json"
+    path.write_text("old")
+    with patch("capiscio.files.os.replace", side_effect=OSError("disk full")), pytest.raises(OSError):
+        atomic_write(path, "new")
+    assert path.read_text() == "old"
+    assert [p.name for p in tmp_path.iterdir()] == ["state.json"]
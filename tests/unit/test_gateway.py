@@ -0,0 +1,106 @@
+"""Tests for capiscio.gateway module."""
+import sys
+import asyncio
+import functools
+import pytest
+
+from capiscio import gateway
+from capiscio.gateway import Supervisor, free_port, run_gateway_cli, split_gateway_args
+
+
+def _stub_worker(port):
+    return [sys.executable, "-m", "http.server", str(port), "--bind", "127.0.0.1"]
+
+
+async def _get(port):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(b"GET / HTTP/1.0\r\nHost: localhost\r\n\r\n")
+    await writer.drain()
+    status = await reader.readline()
+    await reader.read()
+    writer.close()
+    return status
+
+
+async def _until(predicate, timeout=10.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not predicate():
+        assert asyncio.get_running_loop().time() < deadline, "condition not reached"
+        await asyncio.sleep(0.05)
+
+
+class TestArgs:
+    def test_split(self):
+        assert split_gateway_args(["--workers", "4", "--port=9000", "--target", "http://x"]) == (
+            4, "127.0.0.1", 9000, ["--target", "http://x"])
+        assert split_gateway_args(["--target", "http://x"]) == (1, "127.0.0.1", 8080, ["--target", "http://x"])
+        assert split_gateway_args(["--host", "0.0.0.0", "--workers=2"]) == (2, "0.0.0.0", 8080, [])
+
+    @pytest.mark.parametrize("args", [["--workers", "0"], ["--workers"], ["--port", "x"], ["--host"]])
+    def test_invalid(self, args):
+        with pytest.raises(ValueError):
+            split_gateway_args(args)
+
+
+class TestSupervisor:
+    """Supervisor tests against stand-in HTTP workers."""
+
+    def test_balances_restarts_and_shuts_down(self):
+        async def scenario():
+            port = free_port()
+            supervisor = Supervisor(_stub_worker, workers=2, port=port, host="127.0.0.1", health_interval=0.1)
+            task = asyncio.create_task(supervisor.run())
+            await asyncio.wait_for(supervisor.wait_ready(), 10)
+            await _until(lambda: all(w.healthy for w in supervisor.workers))
+
+            statuses = await asyncio.gather(*(_get(port) for _ in range(20)))
+            assert all(s.startswith(b"HTTP/1.0 200") for s in statuses)
+
+            crashed = supervisor.workers[0]
+            old_port = crashed.port
+            crashed.process.kill()
+            await _until(lambda: crashed.restarts == 1 and crashed.healthy)
+            assert crashed.port != old_port
+            assert (await _get(port)).startswith(b"HTTP/1.0 200")
+
+            processes = [w.process for w in supervisor.workers]
+            supervisor.stop()
+            await asyncio.wait_for(task, 15)
+            return processes
+
+        processes = asyncio.run(scenario())
+        assert all(p.returncode is not None for p in processes)
+
+    def test_no_healthy_worker_returns_503(self):
+        async def scenario():
+            port = free_port()
+            supervisor = Supervisor(lambda p: [sys.executable, "-c", "import time; time.sleep(30)"],
+                                    workers=1, port=port, host="127.0.0.1", health_interval=0.1, grace=1)
+            task = asyncio.create_task(supervisor.run())
+            await asyncio.sleep(0.3)
+            status = await _get(port)
+            supervisor.stop()
+            await asyncio.wait_for(task, 10)
+            return status
+
+        assert asyncio.run(scenario()).startswith(b"HTTP/1.1 503")
+
+    def test_gives_up_on_workers_that_cannot_start(self, monkeypatch):
+        monkeypatch.setattr(gateway, "BACKOFF_INITIAL", 0.01)
+
+        async def scenario():
+            supervisor = Supervisor(lambda p: ["/nonexistent/capiscio-core", str(p)], workers=2,
+                                    port=free_port(), host="127.0.0.1", health_interval=0.1, max_restarts=2)
+            await asyncio.wait_for(supervisor.run(), 10)
+            return supervisor
+
+        supervisor = asyncio.run(scenario())
+        assert supervisor.failed
+        assert all(w.given_up and w.restarts == 2 for w in supervisor.workers)
+
+    def test_cli_exits_nonzero_when_workers_die(self, monkeypatch):
+        monkeypatch.setattr(gateway, "BACKOFF_INITIAL", 0.01)
+        monkeypatch.setattr(gateway, "Supervisor", functools.partial(Supervisor, max_restarts=1))
+        monkeypatch.setattr(gateway, "download_binary", lambda version: "/nonexistent/capiscio-core")
+        monkeypatch.setattr(gateway, "resolve_core_version", lambda: "0.0.0")
+        assert run_gateway_cli(["--workers", "1", "--port", str(free_port())]) == 1
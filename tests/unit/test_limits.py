@@ -0,0 +1,251 @@
+"""Tests for capiscio.limits module."""
+import json
+from pathlib import Path
+from unittest.mock import patch
+import pytest
+
+from capiscio import limits
+from capiscio.limits import (
+    DEFAULT_CORE_RSS,
+    cgroup_cpu_limit,
+    cgroup_memory,
+    cgroup_paths,
+    detect,
+    observed_core_rss,
+    record_core_rss,
+    run_info_cli,
+)
+
+MiB = 1024 * 1024
+
+
+def _tree(root: Path, files: dict[str, str]) -> None:
+    for name, content in files.items():
+        path = root / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(content + "\n")
+
+
+@pytest.fixture
+def v2(tmp_path):
+    """A cgroup v2 mount with this process in /kubepods/pod1/app."""
+    proc = tmp_path / "proc-cgroup"
+    proc.write_text("0::/kubepods/pod1/app\n")
+    root = tmp_path / "cgroup"
+    (root / "kubepods" / "pod1" / "app").mkdir(parents=True)
+    return root, proc
+
+
+@pytest.fixture
+def v1(tmp_path):
+    """A cgroup v1 mount with separate cpu and memory hierarchies."""
+    proc = tmp_path / "proc-cgroup"
+    proc.write_text("12:memory:/docker/abc\n11:cpu,cpuacct:/docker/abc\n1:name=systemd:/docker/abc\n")
+    root = tmp_path / "cgroup"
+    (root / "cpu" / "docker" / "abc").mkdir(parents=True)
+    (root / "memory" / "docker" / "abc").mkdir(parents=True)
+    return root, proc
+
+
+@pytest.fixture(autouse=True)
+def _no_jobs_override(monkeypatch):
+    monkeypatch.delenv(limits.JOBS_ENV, raising=False)
+
+
+class TestCgroupPaths:
+    def test_v1_controllers_split(self, v1):
+        _, proc = v1
+        paths = cgroup_paths(proc)
+        assert paths["cpu"] == paths["cpuacct"] == paths["memory"] == "/docker/abc"
+
+    def test_missing_file(self, tmp_path):
+        assert cgroup_paths(tmp_path / "missing") == {}
+
+
+class TestCpuLimit:
+    def test_v2_quota(self, v2):
+        root, proc = v2
+        _tree(root, {"kubepods/pod1/app/cpu.max": "200000 100000"})
+        assert cgroup_cpu_limit(root, proc) == 2.0
+
+    def test_v2_unlimited(self, v2):
+        root, proc = v2
+        _tree(root, {"kubepods/pod1/app/cpu.max": "max 100000"})
+        assert cgroup_cpu_limit(root, proc) is None
+
+    def test_v2_tightest_ancestor_wins(self, v2):
+        root, proc = v2
+        _tree(root, {
+            "kubepods/pod1/app/cpu.max": "400000 100000",
+            "kubepods/pod1/cpu.max": "150000 100000",
+            "kubepods/cpu.max": "max 100000",
+        })
+        assert cgroup_cpu_limit(root, proc) == 1.5
+
+    def test_v1_quota(self, v1):
+        root, proc = v1
+        _tree(root, {
+            "cpu/docker/abc/cpu.cfs_quota_us": "300000",
+            "cpu/docker/abc/cpu.cfs_period_us": "100000",
+        })
+        assert cgroup_cpu_limit(root, proc) == 3.0
+
+    def test_v1_unlimited(self, v1):
+        root, proc = v1
+        _tree(root, {
+            "cpu/docker/abc/cpu.cfs_quota_us": "-1",
+            "cpu/docker/abc/cpu.cfs_period_us": "100000",
+        })
+        assert cgroup_cpu_limit(root, proc) is None
+
+    def test_garbage_ignored(self, v2):
+        root, proc = v2
+        _tree(root, {"kubepods/pod1/app/cpu.max": "lots 0"})
+        assert cgroup_cpu_limit(root, proc) is None
+
+
+class TestMemory:
+    def test_v2_limit(self, v2):
+        root, proc = v2
+        _tree(root, {
+            "kubepods/pod1/app/memory.max": str(512 * MiB),
+            "kubepods/pod1/app/memory.current": str(100 * MiB),
+        })
+        assert cgroup_memory(root, proc) == (512 * MiB, 100 * MiB)
+
+    def test_v2_tightest_ancestor_wins(self, v2):
+        root, proc = v2
+        _tree(root, {
+            "kubepods/pod1/app/memory.max": "max",
+            "kubepods/pod1/memory.max": str(256 * MiB),
+        })
+        assert cgroup_memory(root, proc) == (256 * MiB, None)
+
+    def test_v1_unlimited_sentinel(self, v1):
+        root, proc = v1
+        _tree(root, {"memory/docker/abc/memory.limit_in_bytes": "9223372036854771712"})
+        assert cgroup_memory(root, proc) == (None, None)
+
+    def test_v1_limit(self, v1):
+        root, proc = v1
+        _tree(root, {
+            "memory/docker/abc/memory.limit_in_bytes": str(1024 * MiB),
+            "memory/docker/abc/memory.usage_in_bytes": str(10 * MiB),
+        })
+        assert cgroup_memory(root, proc) == (1024 * MiB, 10 * MiB)
+
+
+class TestDetect:
+    @pytest.fixture(autouse=True)
+    def _host(self):
+        with patch("capiscio.limits.os.cpu_count", return_value=64), \
+             patch("capiscio.limits.os.sched_getaffinity", return_value=set(range(16)), create=True):
+            yield
+
+    def test_unconstrained_uses_affinity(self, v2):
+        root, proc = v2
+        info = detect(root, proc, core_rss=DEFAULT_CORE_RSS)
+        assert (info.host_cpus, info.affinity_cpus, info.cpus, info.jobs) == (64, 16, 16, 16)
+        assert info.memory_jobs is None
+
+    def test_fractional_quota_rounds_up(self, v2):
+        root, proc = v2
+        _tree(root, {"kubepods/pod1/app/cpu.max": "250000 100000"})
+        info = detect(root, proc, core_rss=DEFAULT_CORE_RSS)
+        assert info.cgroup_cpus == 2.5
+        assert info.jobs == 3
+
+    def test_memory_bounds_jobs(self, v2):
+        root, proc = v2
+        _tree(root, {"kubepods/pod1/app/memory.max": str(200 * MiB)})
+        info = detect(root, proc, core_rss=50 * MiB)
+        assert info.memory_jobs == 3          # 150 MiB usable / 50 MiB per run
+        assert info.jobs == 3
+
+    def test_memory_never_below_one(self, v2):
+        root, proc = v2
+        _tree(root, {"kubepods/pod1/app/memory.max": str(10 * MiB)})
+        assert detect(root, proc, core_rss=50 * MiB).jobs == 1
+
+    def test_env_override(self, v2, monkeypatch):
+        root, proc = v2
+        _tree(root, {"kubepods/pod1/app/cpu.max": "100000 100000"})
+        monkeypatch.setenv(limits.JOBS_ENV, "12")
+        info = detect(root, proc, core_rss=DEFAULT_CORE_RSS)
+        assert info.cpus == 1
+        assert (info.jobs, info.override) == (12, 12)
+
+    def test_invalid_override_ignored(self, v2, monkeypatch):
+        root, proc = v2
+        monkeypatch.setenv(limits.JOBS_ENV, "many")
+        info = detect(root, proc, core_rss=DEFAULT_CORE_RSS)
+        assert (info.jobs, info.override) == (16, None)
+
+    def test_to_dict_camel_case(self, v2):
+        root, proc = v2
+        data = detect(root, proc, core_rss=DEFAULT_CORE_RSS).to_dict()
+        assert data["hostCpus"] == 64
+        assert data["coreRssObserved"] is True
+        assert "memoryJobs" in data
+
+
+class TestCoreRss:
+    @pytest.fixture(autouse=True)
+    def _state(self, tmp_path):
+        with patch("capiscio.limits._rss_state_path", return_value=tmp_path / "core-rss.json"):
+            yield
+
+    def test_nothing_recorded(self):
+        assert observed_core_rss() is None
+
+    def test_keeps_peak(self, tmp_path):
+        record_core_rss(30_000)
+        record_core_rss(20_000)
+        assert observed_core_rss() == 30_000 * 1024
+        record_core_rss(40_000)
+        assert json.loads((tmp_path / "core-rss.json").read_text()) == {"maxRssKb": 40_000}
+        assert not [p for p in tmp_path.iterdir() if p.name.endswith(".tmp")]
+
+    def test_detect_uses_observed(self, v2):
+        root, proc = v2
+        record_core_rss(20 * 1024)
+        info = detect(root, proc)
+        assert info.core_rss == 20 * MiB
+        assert info.core_rss_observed
+
+
+class TestRunInfoCli:
+    @pytest.fixture(autouse=True)
+    def _limits(self, v2):
+        root, proc = v2
+        with patch("capiscio.limits._detected", detect(root, proc, core_rss=DEFAULT_CORE_RSS)):
+            yield
+
+    def test_json(self, capsys):
+        assert run_info_cli(["--json"]) == 0
+        data = json.loads(capsys.readouterr().out)
+        assert data["coreVersion"]
+        assert data["jobs"] >= 1
+
+    def test_text(self, capsys):
+        assert run_info_cli([]) == 0
+        out = capsys.readouterr().out
+        assert "Default jobs:" in out
+        assert "Core RSS per run:" in out
+
+    @pytest.mark.parametrize("args", [[], ["--json"]])
+    def test_invalid_core_version_is_reported(self, capsys, monkeypatch, args):
+        monkeypatch.setenv("CAPISCIO_CORE_VERSION", "latest")
+        assert run_info_cli(args) == 1
+        captured = capsys.readouterr()
+        assert captured.out == ""
+        assert "Error:" in captured.err and "CAPISCIO_CORE_VERSION" in captured.err
+
+
+def test_default_io_jobs_capped():
+    with patch("capiscio.limits._detected", limits.Limits(
+        host_cpus=64, affinity_cpus=64, cgroup_cpus=None, memory_limit=None, memory_current=None,
+        core_rss=DEFAULT_CORE_RSS, core_rss_observed=False, cpus=64, memory_jobs=None, jobs=64,
+    )):
+        assert limits.default_io_jobs() == limits.MAX_IO_JOBS
+        assert limits.default_jobs() == 64
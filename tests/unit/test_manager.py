@@ -1,9 +1,15 @@
 """Tests for capiscio.manager module."""
+import io
 import os
+import json
+import time
 import platform
+import subprocess
+import threading
 from pathlib import Path
 from unittest.mock import patch, MagicMock, mock_open
 import pytest
+from rich.console import Console
 
 from capiscio.manager import (
     get_platform_info,
@@ -12,8 +18,15 @@ from capiscio.manager import (
     get_binary_path,
     download_binary,
     run_core,
+    run_core_captured,
     _fetch_expected_checksum,
     _verify_checksum,
+    _stream_to_file,
+    _preallocate,
+    check_latest_release,
+    import_binary,
+    maybe_check_for_updates,
+    resolve_core_version,
     CORE_VERSION,
     GITHUB_REPO,
 )
@@ -164,12 +177,12 @@ class TestDownloadBinary:
         # Mock the response
         mock_response = MagicMock()
         mock_response.headers = {'content-length': '1024'}
-        mock_response.iter_content.return_value = [b'x' * 1024]
+        mock_response.raw = io.BytesIO(b'x' * 1024)
         mock_response.__enter__ = MagicMock(return_value=mock_response)
         mock_response.__exit__ = MagicMock(return_value=False)
         mock_requests.return_value = mock_response
         
-        with patch('builtins.open', mock_open()):
+        with patch('builtins.open', mock_open()), patch('capiscio.manager._preallocate'):
             with patch.object(os, 'stat') as mock_stat:
                 with patch.object(os, 'chmod'):
                     mock_stat.return_value = MagicMock(st_mode=0o644)
@@ -199,6 +212,45 @@ class TestDownloadBinary:
         mock_path.unlink.assert_called_once()
 
 
+class TestStreamToFile:
+    """Tests for the buffered download copy loop."""
+
+    def test_copies_across_buffer_boundaries(self, tmp_path):
+        data = os.urandom(10_000)
+        target = tmp_path / "out"
+        with open(target, "wb") as f:
+            assert _stream_to_file(io.BytesIO(data), f, buffer_size=4096) == len(data)
+        assert target.read_bytes() == data
+
+    def test_progress_is_throttled(self, tmp_path):
+        updates = []
+        with open(tmp_path / "out", "wb") as f:
+            _stream_to_file(io.BytesIO(b"x" * 100_000), f, updates.append, buffer_size=100)
+        # 1000 reads complete well within one interval: only the final update is rendered
+        assert updates == [100_000]
+
+    def test_preallocated_tail_is_truncated(self, tmp_path):
+        target = tmp_path / "out"
+        with open(target, "wb") as f:
+            _preallocate(f, 1 << 16)
+            _stream_to_file(io.BytesIO(b"abc"), f)
+            f.truncate()
+        assert target.read_bytes() == b"abc"
+
+
+    def test_urllib3_errors_become_request_exceptions(self, tmp_path):
+        import requests.exceptions
+        from urllib3.exceptions import ProtocolError
+
+        class Dropped(io.BytesIO):
+            def readinto(self, buf):
+                raise ProtocolError("Connection broken: IncompleteRead(10 bytes read, 990 more expected)")
+
+        with open(tmp_path / "out", "wb") as f:
+            with pytest.raises(requests.exceptions.ConnectionError, match="IncompleteRead"):
+                _stream_to_file(Dropped(), f)
+
+
 class TestFetchExpectedChecksum:
     """Tests for _fetch_expected_checksum function."""
 
@@ -266,12 +318,12 @@ class TestChecksumVerificationIntegration:
 
         mock_response = MagicMock()
         mock_response.headers = {'content-length': '1024'}
-        mock_response.iter_content.return_value = [b'x' * 1024]
+        mock_response.raw = io.BytesIO(b'x' * 1024)
         mock_response.__enter__ = MagicMock(return_value=mock_response)
         mock_response.__exit__ = MagicMock(return_value=False)
         mock_requests.return_value = mock_response
 
-        with patch('builtins.open', mock_open()):
+        with patch('builtins.open', mock_open()), patch('capiscio.manager._preallocate'):
             with patch.object(os, 'stat') as mock_stat:
                 with patch.object(os, 'chmod'):
                     mock_stat.return_value = MagicMock(st_mode=0o644)
@@ -294,12 +346,12 @@ class TestChecksumVerificationIntegration:
 
         mock_response = MagicMock()
         mock_response.headers = {'content-length': '1024'}
-        mock_response.iter_content.return_value = [b'x' * 1024]
+        mock_response.raw = io.BytesIO(b'x' * 1024)
         mock_response.__enter__ = MagicMock(return_value=mock_response)
         mock_response.__exit__ = MagicMock(return_value=False)
         mock_requests.return_value = mock_response
 
-        with patch('builtins.open', mock_open()):
+        with patch('builtins.open', mock_open()), patch('capiscio.manager._preallocate'):
             with pytest.raises(RuntimeError, match="integrity check failed"):
                 download_binary("1.0.0")
 
@@ -318,12 +370,12 @@ class TestChecksumVerificationIntegration:
 
         mock_response = MagicMock()
         mock_response.headers = {'content-length': '1024'}
-        mock_response.iter_content.return_value = [b'x' * 1024]
+        mock_response.raw = io.BytesIO(b'x' * 1024)
         mock_response.__enter__ = MagicMock(return_value=mock_response)
         mock_response.__exit__ = MagicMock(return_value=False)
         mock_requests.return_value = mock_response
 
-        with patch('builtins.open', mock_open()):
+        with patch('builtins.open', mock_open()), patch('capiscio.manager._preallocate'):
             with pytest.raises(RuntimeError, match="could not be fetched"):
                 download_binary("1.0.0")
 
@@ -342,12 +394,12 @@ class TestChecksumVerificationIntegration:
 
         mock_response = MagicMock()
         mock_response.headers = {'content-length': '1024'}
-        mock_response.iter_content.return_value = [b'x' * 1024]
+        mock_response.raw = io.BytesIO(b'x' * 1024)
         mock_response.__enter__ = MagicMock(return_value=mock_response)
         mock_response.__exit__ = MagicMock(return_value=False)
         mock_requests.return_value = mock_response
 
-        with patch('builtins.open', mock_open()):
+        with patch('builtins.open', mock_open()), patch('capiscio.manager._preallocate'):
             with pytest.raises(RuntimeError, match="no entry for"):
                 download_binary("1.0.0")
 
@@ -398,6 +450,210 @@ class TestRunCore:
         mock_console.print.assert_called()
 
 
+class TestRunCoreCaptured:
+    """Tests for run_core_captured function."""
+
+    @patch('capiscio.manager.process.run')
+    @patch('capiscio.manager.download_binary', return_value=Path("/tmp/capiscio"))
+    def test_spawns_without_exec(self, mock_download, mock_run):
+        """Test that the captured path spawns a child instead of exec'ing."""
+        with patch.object(os, 'execv') as mock_execv:
+            run_core_captured(["validate", "card.json"])
+        mock_execv.assert_not_called()
+        mock_run.assert_called_once_with([str(Path("/tmp/capiscio")), "validate", "card.json"])
+
+
+class TestCoreVersionOverride:
+    """Tests for CAPISCIO_CORE_VERSION."""
+
+    def test_defaults_to_pinned_version(self, monkeypatch):
+        monkeypatch.delenv("CAPISCIO_CORE_VERSION", raising=False)
+        assert resolve_core_version() == CORE_VERSION
+
+    def test_env_selects_version(self, monkeypatch):
+        monkeypatch.setenv("CAPISCIO_CORE_VERSION", "v2.8.0-rc.1")
+        assert resolve_core_version() == "2.8.0-rc.1"
+
+    def test_explicit_environment(self, monkeypatch):
+        monkeypatch.setenv("CAPISCIO_CORE_VERSION", "2.8.0")
+        assert resolve_core_version({"CAPISCIO_CORE_VERSION": "2.9.1"}) == "2.9.1"
+        assert resolve_core_version({}) == CORE_VERSION
+
+    @pytest.mark.parametrize("value", ["latest", "../../etc", "2.8", "2.8.0/x"])
+    def test_rejects_non_release_versions(self, monkeypatch, value):
+        monkeypatch.setenv("CAPISCIO_CORE_VERSION", value)
+        with pytest.raises(RuntimeError, match="CAPISCIO_CORE_VERSION"):
+            resolve_core_version()
+
+    @patch('capiscio.manager.process.run')
+    @patch('capiscio.manager.download_binary', return_value=Path("/tmp/capiscio"))
+    def test_override_reaches_download(self, mock_download, mock_run, monkeypatch):
+        monkeypatch.setenv("CAPISCIO_CORE_VERSION", "2.9.1")
+        run_core_captured(["--version"])
+        mock_download.assert_called_once_with("2.9.1")
+
+
+class TestOfflineMode:
+    """Tests for CAPISCIO_OFFLINE and the download circuit breaker."""
+
+    @pytest.fixture
+    def missing_binary(self, tmp_path):
+        with patch('capiscio.manager.get_binary_path', return_value=tmp_path / "1.0.0" / "capiscio"), \
+                patch('capiscio.manager.console'):
+            yield tmp_path / "1.0.0" / "capiscio"
+
+    def test_offline_fails_without_network(self, missing_binary, monkeypatch):
+        monkeypatch.setenv("CAPISCIO_OFFLINE", "1")
+        with patch('capiscio.manager.requests.get') as mock_get:
+            with pytest.raises(RuntimeError, match="--wrapper-import"):
+                download_binary("1.0.0")
+        mock_get.assert_not_called()
+
+    def test_run_core_prints_hint_verbatim(self, missing_binary, monkeypatch, capsys):
+        monkeypatch.setenv("CAPISCIO_OFFLINE", "1")
+        with patch('capiscio.manager.console', Console(width=1000)):
+            assert run_core(["validate"]) == 1
+        assert "--wrapper-import <binary> [checksums.txt]" in capsys.readouterr().out
+
+    def test_connection_failure_trips_breaker(self, missing_binary):
+        import requests.exceptions
+        with patch('capiscio.manager.requests.get',
+                   side_effect=requests.exceptions.ConnectTimeout("timed out")) as mock_get:
+            with pytest.raises(RuntimeError, match="timed out"):
+                download_binary("1.0.0")
+            with pytest.raises(RuntimeError, match="unreachable"):
+                download_binary("1.0.0")
+        assert mock_get.call_count == 1
+
+    def test_truncated_download_trips_breaker(self, missing_binary):
+        import requests
+        from http.server import BaseHTTPRequestHandler, HTTPServer
+
+        class Truncating(BaseHTTPRequestHandler):
+            def do_GET(self):
+                self.send_response(200)
+                self.send_header("Content-Length", "1000")
+                self.end_headers()
+                self.wfile.write(b"x" * 10)
+                self.close_connection = True
+
+            def log_message(self, *args):
+                pass
+
+        httpd = HTTPServer(("127.0.0.1", 0), Truncating)
+        threading.Thread(target=httpd.handle_request, daemon=True).start()
+        local = f"http://127.0.0.1:{httpd.server_address[1]}/capiscio"
+        real_get = requests.get
+        try:
+            with patch('capiscio.manager.requests.get', side_effect=lambda url, **kw: real_get(local, **kw)) as mock_get:
+                with pytest.raises(RuntimeError, match="IncompleteRead") as excinfo:
+                    download_binary("1.0.0")
+                assert "--wrapper-import" in str(excinfo.value)
+                with pytest.raises(RuntimeError, match="unreachable"):
+                    download_binary("1.0.0")
+            assert mock_get.call_count == 1
+            assert not missing_binary.exists()
+        finally:
+            httpd.server_close()
+
+    def test_http_error_does_not_trip_breaker(self, missing_binary):
+        import requests.exceptions
+        with patch('capiscio.manager.requests.get',
+                   side_effect=requests.exceptions.HTTPError("404 Not Found")) as mock_get:
+            for _ in range(2):
+                with pytest.raises(RuntimeError, match="404"):
+                    download_binary("1.0.0")
+        assert mock_get.call_count == 2
+
+    def test_offline_skips_update_check(self, monkeypatch):
+        monkeypatch.setenv("CAPISCIO_UPDATE_CHECK", "1")
+        monkeypatch.setenv("CAPISCIO_OFFLINE", "1")
+        with patch('capiscio.manager.subprocess.Popen') as mock_popen:
+            maybe_check_for_updates("2.7.0")
+        mock_popen.assert_not_called()
+
+
+class TestImportBinary:
+    """Tests for installing an out-of-band binary into the cache."""
+
+    @pytest.fixture
+    def target(self, tmp_path):
+        with patch('capiscio.manager.get_binary_path', return_value=tmp_path / "cache" / "1.0.0" / "capiscio-linux-amd64"):
+            yield tmp_path / "cache" / "1.0.0" / "capiscio-linux-amd64"
+
+    def test_verified_against_checksums(self, tmp_path, target):
+        import hashlib
+        source = tmp_path / "capiscio-linux-amd64"
+        source.write_bytes(b"binary")
+        checksums = tmp_path / "checksums.txt"
+        checksums.write_text(f"{hashlib.sha256(b'binary').hexdigest()}  capiscio-linux-amd64\n")
+
+        assert import_binary(source, checksums, "1.0.0") == target
+        assert target.read_bytes() == b"binary"
+        assert os.access(target, os.X_OK) or platform.system() == "Windows"
+
+    def test_checksum_mismatch_is_rejected(self, tmp_path, target):
+        source = tmp_path / "capiscio-linux-amd64"
+        source.write_bytes(b"tampered")
+        checksums = tmp_path / "checksums.txt"
+        checksums.write_text("00" * 32 + "  capiscio-linux-amd64\n")
+
+        with pytest.raises(RuntimeError, match="does not match"):
+            import_binary(source, checksums, "1.0.0")
+        assert not target.exists()
+
+    def test_requires_checksums_or_skip(self, tmp_path, target, monkeypatch):
+        source = tmp_path / "capiscio-linux-amd64"
+        source.write_bytes(b"binary")
+        monkeypatch.delenv("CAPISCIO_SKIP_CHECKSUM", raising=False)
+        with pytest.raises(RuntimeError, match="CAPISCIO_SKIP_CHECKSUM"):
+            import_binary(source, version="1.0.0")
+        monkeypatch.setenv("CAPISCIO_SKIP_CHECKSUM", "true")
+        assert import_binary(source, version="1.0.0") == target
+
+
+class TestUpdateCheck:
+    """Tests for the opt-in background update check."""
+
+    @pytest.fixture
+    def state_dir(self, tmp_path, monkeypatch):
+        monkeypatch.setenv("CAPISCIO_UPDATE_CHECK", "1")
+        with patch('capiscio.manager.get_state_dir', return_value=tmp_path):
+            yield tmp_path
+
+    def test_disabled_by_default(self, monkeypatch):
+        monkeypatch.delenv("CAPISCIO_UPDATE_CHECK", raising=False)
+        with patch('capiscio.manager.subprocess.Popen') as mock_popen:
+            maybe_check_for_updates("2.7.0")
+        mock_popen.assert_not_called()
+
+    def test_stale_state_starts_detached_check_once(self, state_dir):
+        with patch('capiscio.manager.subprocess.Popen') as mock_popen:
+            maybe_check_for_updates("2.7.0")
+            maybe_check_for_updates("2.7.0")
+        mock_popen.assert_called_once()
+        kwargs = mock_popen.call_args.kwargs
+        assert kwargs["stdout"] is subprocess.DEVNULL
+        assert kwargs.get("start_new_session") or kwargs.get("creationflags")
+
+    def test_notice_comes_from_cached_state(self, state_dir, capsys):
+        (state_dir / "latest.json").write_text(json.dumps({"checkedAt": time.time(), "latest": "2.10.0"}))
+        with patch('capiscio.manager.subprocess.Popen') as mock_popen, \
+                patch('capiscio.manager.requests.get') as mock_get:
+            maybe_check_for_updates("2.7.0")
+        mock_popen.assert_not_called()
+        mock_get.assert_not_called()
+        assert "2.10.0" in capsys.readouterr().err
+
+    def test_check_latest_release_records_result(self, state_dir):
+        response = MagicMock()
+        response.json.return_value = {"tag_name": "v2.8.0"}
+        with patch('capiscio.manager.requests.get', return_value=response):
+            assert check_latest_release() == "2.8.0"
+        state = json.loads((state_dir / "latest.json").read_text())
+        assert state["latest"] == "2.8.0" and state["checkedAt"] > 0
+
+
 class TestConstants:
     """Tests for module constants."""
 
@@ -0,0 +1,197 @@
+"""Tests for capiscio.monitor module."""
+import os
+import json
+import signal
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+import pytest
+import requests
+
+from capiscio.batch import CardResult
+from capiscio.monitor import Agent, Fleet, Monitor, TokenBucket, run_monitor_cli
+from capiscio.store import ResultStore
+
+
+class _StandInAgent(BaseHTTPRequestHandler):
+    """Serves a static agent card and records when each request arrived."""
+
+    hits: list = []
+
+    def do_GET(self):
+        type(self).hits.append((self.path, time.monotonic()))
+        body = json.dumps({"name": "stand-in", "url": "http://localhost"}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def stand_in():
+    handler = type("Handler", (_StandInAgent,), {"hits": []})
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    thread = threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}", handler.hits
+    server.shutdown()
+    server.server_close()
+
+
+def http_check(agent):
+    """Stand-in for a core live check: fetch the agent card over HTTP."""
+    resp = requests.get(agent.target, timeout=5)
+    return CardResult(agent.target, 0 if resp.ok else 1, resp.text, "")
+
+
+class TestTokenBucket:
+    """Tests for the per-host token bucket."""
+
+    def test_burst_then_rate(self):
+        bucket = TokenBucket(rate=2.0, burst=2, now=0.0)
+        assert bucket.take(0.0) == 0
+        assert bucket.take(0.0) == 0
+        assert bucket.take(0.0) == pytest.approx(0.5)
+        assert bucket.take(0.5) == 0
+
+
+class TestFleet:
+    """Tests for manifest parsing."""
+
+    def test_defaults_apply(self):
+        fleet = Fleet.from_dict({
+            "concurrency": 3,
+            "defaults": {"interval": 30, "args": ["--test-live"]},
+            "agents": [{"url": "https://a.example.com"}, {"name": "b", "url": "https://b.example.com", "interval": 5}],
+        })
+        assert fleet.concurrency == 3
+        assert fleet.agents[0].interval == 30 and fleet.agents[0].args == ["--test-live"]
+        assert fleet.agents[1].name == "b" and fleet.agents[1].interval == 5
+
+    def test_agent_without_url_rejected(self):
+        with pytest.raises(ValueError):
+            Fleet.from_dict({"agents": [{"name": "x"}]})
+
+    @pytest.mark.parametrize("agents", [
+        [{"url": "https://a.example.com"}, {"url": "https://a.example.com", "args": ["--test-live"]}],
+        [{"name": "a", "url": "https://a.example.com"}, {"name": "a", "url": "https://b.example.com"}],
+    ])
+    def test_duplicate_names_rejected(self, agents):
+        with pytest.raises(ValueError, match=r"agents\[1\]: duplicate agent name"):
+            Fleet.from_dict({"agents": agents})
+
+
+class TestMonitor:
+    """Tests for scheduling against a local stand-in agent."""
+
+    def test_once_checks_every_agent(self, stand_in):
+        base, hits = stand_in
+        fleet = Fleet([Agent(f"a{i}", f"{base}/agent-{i}") for i in range(5)], concurrency=2, host_rate=100, host_burst=10)
+        records = []
+        completed = Monitor(fleet, records.append, check=http_check).run(once=True)
+        assert completed == 5
+        assert sorted(r["agent"] for r in records) == [f"a{i}" for i in range(5)]
+        assert all(r["exitCode"] == 0 and r["result"]["name"] == "stand-in" for r in records)
+
+    def test_per_host_rate_limit_spaces_requests(self, stand_in):
+        base, hits = stand_in
+        fleet = Fleet([Agent(f"a{i}", f"{base}/agent-{i}") for i in range(3)], concurrency=3, host_rate=10, host_burst=1)
+        Monitor(fleet, lambda r: None, check=http_check).run(once=True)
+        times = sorted(t for _, t in hits)
+        assert len(times) == 3
+        gaps = [b - a for a, b in zip(times, times[1:])]
+        assert min(gaps) >= 0.08
+
+    def test_concurrency_cap(self):
+        active = 0
+        peak = 0
+        lock = threading.Lock()
+
+        def slow_check(agent):
+            nonlocal active, peak
+            with lock:
+                active += 1
+                peak = max(peak, active)
+            time.sleep(0.05)
+            with lock:
+                active -= 1
+            return CardResult(agent.target, 0, "", "")
+
+        fleet = Fleet([Agent(f"a{i}", f"https://host{i}.example.com") for i in range(8)], concurrency=2)
+        assert Monitor(fleet, lambda r: None, check=slow_check).run(once=True) == 8
+        assert peak == 2
+
+    def test_repeats_on_interval_until_stopped(self, stand_in):
+        base, hits = stand_in
+        fleet = Fleet([Agent("a", f"{base}/a", interval=0.1)], concurrency=1, jitter=0, host_rate=100, host_burst=10)
+        stop = threading.Event()
+        threading.Timer(0.55, stop.set).start()
+        completed = Monitor(fleet, lambda r: None, check=http_check).run(stop=stop)
+        assert 3 <= completed <= 7
+
+    def test_failing_check_is_recorded(self):
+        def broken(agent):
+            raise ConnectionError("refused")
+
+        records = []
+        fleet = Fleet([Agent("a", "https://down.example.com")], concurrency=1)
+        Monitor(fleet, records.append, check=broken).run(once=True)
+        assert records[0]["exitCode"] == 1
+        assert "refused" in records[0]["stderr"]
+
+    def test_records_are_sunk_in_completion_order(self):
+        def check(agent):
+            time.sleep(0.05 if agent.name == "slow" else 0)
+            return CardResult(agent.target, 0, "", "")
+
+        records = []
+        fleet = Fleet([Agent(n, f"https://{n}.example.com") for n in ("slow", "b", "c", "d")], concurrency=4)
+        Monitor(fleet, records.append, check=check).run(once=True)
+        assert records[-1]["agent"] == "slow"
+        finished = [r["finishedAt"] for r in records]
+        assert finished == sorted(finished)
+
+    def test_on_tick_runs_while_waiting(self):
+        ticks = []
+        stop = threading.Event()
+        fleet = Fleet([Agent("a", "https://a.example.com", interval=60)], concurrency=1)
+        threading.Timer(0.3, stop.set).start()
+        Monitor(fleet, lambda r: None, check=lambda agent: CardResult(agent.target, 0, "", ""),
+                on_tick=lambda: ticks.append(1)).run(stop=stop)
+        assert ticks
+
+
+def test_sigterm_stores_buffered_results(tmp_path, capsys):
+    manifest = tmp_path / "fleet.json"
+    manifest.write_text(json.dumps({"agents": [{"name": "a", "url": "https://a.example.com"}]}))
+    db = tmp_path / "r.db"
+
+    def run(self, stop=None, once=False):
+        self.sink({"agent": "a", "target": "https://a.example.com", "exitCode": 0, "timestamp": 1.0,
+                   "result": {"success": True}})
+        os.kill(os.getpid(), signal.SIGTERM)
+        assert stop.wait(5)
+        return 1
+
+    previous = signal.getsignal(signal.SIGTERM)
+    with patch("capiscio.monitor.download_binary"), patch.object(Monitor, "run", run):
+        assert run_monitor_cli([str(manifest), "--store", str(db)]) == 0
+    assert signal.getsignal(signal.SIGTERM) is previous
+    with ResultStore(db) as store:
+        assert [r.agent for r in store.query()] == ["a"]
+
+
+@pytest.mark.parametrize("exit_codes, expected", [([0, 0], 0), ([0, 1], 1)])
+def test_once_exit_code_reflects_failures(tmp_path, capsys, exit_codes, expected):
+    manifest = tmp_path / "fleet.json"
+    manifest.write_text(json.dumps({"agents": [{"name": "a", "url": "https://a.example.com"},
+                                               {"name": "b", "url": "https://b.example.com"}]}))
+    codes = dict(zip(["https://a.example.com", "https://b.example.com"], exit_codes))
+    with patch("capiscio.monitor.download_binary"), patch("capiscio.monitor.shared_card_cache"), \
+         patch("capiscio.monitor.validate_card", lambda target, args, cache: CardResult(target, codes[target], "", "")):
+        assert run_monitor_cli([str(manifest), "--once"]) == expected
@@ -0,0 +1,99 @@
+"""Tests for capiscio.precheck module."""
+import json
+import subprocess
+from pathlib import Path
+from unittest.mock import patch
+import pytest
+
+from capiscio import precheck
+from capiscio.batch import run_batch
+from capiscio.precheck import check_bytes, check_file, render
+from capiscio.results import ValidationResult
+
+FIXTURES = Path(__file__).parent.parent / "e2e" / "fixtures"
+
+
+@pytest.fixture(params=["stdlib", "orjson"])
+def parser(request, monkeypatch):
+    if request.param == "stdlib":
+        monkeypatch.setattr(precheck, "orjson", None)
+    elif precheck.orjson is None:
+        pytest.skip("orjson not installed")
+    return request.param
+
+
+class TestCheckBytes:
+    @pytest.mark.parametrize("data,code", [
+        (b"", "EMPTY_CARD"),
+        (b" \n\t ", "EMPTY_CARD"),
+        (b"this is not json", "INVALID_JSON"),
+        (b'{"name": "truncated', "INVALID_JSON"),
+        (b'[{"name": "a"}]', "INVALID_JSON"),
+        (b'{"name": "a"} trailing', "INVALID_JSON"),
+        (b"[" * 100_000, "INVALID_JSON"),        # rejected before parsing
+    ])
+    def test_rejects(self, parser, data, code):
+        assert check_bytes(data).code == code
+
+    @pytest.mark.parametrize("data", [
+        b'{"name": "a"}',
+        b'\n  {"name": "a", "skills": []}\n',
+        b'{"name": "\xff\xfe"}',          # undecodable: left to the core
+    ])
+    def test_passes_plausible_or_uncertain_inputs(self, parser, data):
+        assert check_bytes(data) is None
+
+    def test_deep_nesting_is_left_to_the_core(self, parser):
+        assert check_bytes(b'{"a":' * 100_000 + b"1" + b"}" * 100_000) is None
+
+    def test_large_local_card_is_not_size_limited(self, tmp_path):
+        path = tmp_path / "big.json"
+        path.write_text(json.dumps({"name": "big", "description": "x" * (9 * 1024 * 1024)}))
+        assert check_file(path) is None
+
+    def test_missing_file_is_left_to_the_core(self, tmp_path):
+        assert check_file(tmp_path / "nope.json") is None
+
+    def test_e2e_fixtures(self):
+        assert check_file(FIXTURES / "malformed.txt").code == "INVALID_JSON"
+        assert check_file(FIXTURES / "valid-agent-card.json") is None
+        assert check_file(FIXTURES / "invalid-agent-card.json") is None
+
+
+class TestRender:
+    def test_json_matches_result_model(self):
+        stdout, stderr = render(precheck.Rejection("EMPTY_CARD", "agent card is empty"), ["--json"])
+        result = ValidationResult.from_dict(json.loads(stdout))
+        assert not result.success and result.errors[0].code == "EMPTY_CARD" and stderr == ""
+
+    def test_text(self):
+        stdout, stderr = render(precheck.Rejection("EMPTY_CARD", "agent card is empty"), ["--schema-only"])
+        assert stdout == "" and stderr == "Error: agent card is empty\n"
+
+    def test_text_names_the_card(self):
+        _, stderr = render(precheck.Rejection("EMPTY_CARD", "agent card is empty"), [], "cards/a.json")
+        assert stderr == "Error: cards/a.json: agent card is empty\n"
+
+
+@patch('capiscio.batch.download_binary')
+def test_batch_skips_core_for_rejected_inputs(mock_download, tmp_path):
+    good, empty, broken = tmp_path / "good.json", tmp_path / "empty.json", tmp_path / "broken.json"
+    good.write_text('{"name": "a"}')
+    empty.write_text("")
+    broken.write_text('{"name":')
+    ok = subprocess.CompletedProcess([], 0, '{"success": true}\n', "")
+    with patch('capiscio.batch.run_core_captured', return_value=ok) as mock_run:
+        results = run_batch([str(good), str(empty), str(broken)], ["--json"])
+    mock_run.assert_called_once()
+    assert [r.returncode for r in results] == [0, 1, 1]
+    assert [r.to_record()["result"]["errors"][0]["code"] for r in results[1:]] == ["EMPTY_CARD", "INVALID_JSON"]
+
+
+@patch('capiscio.batch.download_binary')
+def test_batch_text_rejection_names_the_card(mock_download, tmp_path):
+    empty = tmp_path / "empty.json"
+    empty.write_text("")
+    with patch('capiscio.batch.run_core_captured') as mock_run:
+        [result] = run_batch([str(empty)], ["--schema-only"])
+    mock_run.assert_not_called()
+    assert result.stderr == f"Error: {empty}: agent card is empty\n"
@@ -0,0 +1,233 @@
+"""Tests for capiscio.process module."""
+import os
+import sys
+import json
+import signal
+import subprocess
+import threading
+from unittest.mock import patch
+import pytest
+
+from capiscio import process
+from capiscio.process import BoundedBuffer, spawn, run
+
+
+PY = sys.executable
+
+
+class TestBoundedBuffer:
+    """Tests for the bounded output buffer."""
+
+    def test_keeps_head_and_counts_dropped(self):
+        buf = BoundedBuffer(max_bytes=5)
+        buf.write(b"abc")
+        buf.write(b"defgh")
+        buf.write(b"ij")
+        assert buf.getvalue() == b"abcde"
+        assert buf.dropped == 5
+        assert buf.truncated
+
+
+class TestSpawn:
+    """Tests for launching children and capturing their output."""
+
+    def test_captures_stdout_stderr_and_exit_code(self):
+        result = run([PY, "-c", "import sys; print('out'); print('err', file=sys.stderr); sys.exit(3)"])
+        assert result.returncode == 3
+        assert result.stdout.strip() == "out"
+        assert result.stderr.strip() == "err"
+
+    def test_stdin_is_devnull(self):
+        result = run([PY, "-c", "import sys; print(repr(sys.stdin.read()))"])
+        assert result.stdout.strip() == "''"
+
+    def test_large_output_is_bounded(self):
+        proc = spawn([PY, "-c", "import sys; sys.stdout.write('x' * 200000)"], max_output=1000)
+        assert proc.wait() == 0
+        assert len(proc.stdout) == 1000
+        assert proc.stdout_buffer.dropped == 199000
+
+    def test_missing_executable_raises(self, tmp_path):
+        with pytest.raises(OSError):
+            spawn([str(tmp_path / "nope")])
+
+    def test_popen_fallback(self):
+        with patch.object(process, "HAVE_POSIX_SPAWN", False):
+            result = run([PY, "-c", "print('fallback')"])
+        assert result.returncode == 0
+        assert result.stdout.strip() == "fallback"
+
+    @pytest.mark.parametrize("posix_spawn, stdout", [(True, process.CAPTURE), (True, process.PIPE), (False, process.CAPTURE)])
+    def test_wait_timeout(self, posix_spawn, stdout):
+        with patch.object(process, "HAVE_POSIX_SPAWN", posix_spawn and process.HAVE_POSIX_SPAWN):
+            proc = spawn([PY, "-c", "import time; time.sleep(30)"], stdout=stdout)
+        try:
+            with pytest.raises(subprocess.TimeoutExpired):
+                proc.wait(timeout=0.2)
+            assert proc.returncode is None
+        finally:
+            os.kill(proc.pid, signal.SIGTERM)
+        assert proc.wait(timeout=10) != 0
+
+    def test_wait_timeout_returns_when_child_exits(self):
+        proc = spawn([PY, "-c", "print('done')"])
+        assert proc.wait(timeout=10) == 0
+        assert proc.stdout.strip() == b"done"
+
+
+@pytest.fixture
+def thread_per_pipe():
+    """Drain pipes the way Windows must: no select() on pipes, no os.readv."""
+    with patch.object(process, "HAVE_PIPE_SELECT", False), patch.object(process, "HAVE_READV", False):
+        yield
+
+
+class TestThreadPerPipe:
+    """Tests for the Windows drain path, exercised on any platform."""
+
+    def test_capture(self, thread_per_pipe):
+        result = run([PY, "-c", "import sys; sys.stdout.write('o' * 200000); sys.stderr.write('err')"])
+        assert result.returncode == 0
+        assert result.stdout == "o" * 200000
+        assert result.stderr == "err"
+
+    def test_relay(self, thread_per_pipe, tmp_path):
+        out_path = tmp_path / "out.txt"
+        with open(out_path, "wb") as out:
+            with patch.object(process, "HAVE_SPLICE", False):
+                proc = process.CoreProcess([PY, "-c", "print('relayed')"], stdout=process.RELAY,
+                                           relay_fds=(out.fileno(), 2))
+                assert proc.wait() == 0
+        assert out_path.read_bytes().strip() == b"relayed"
+
+    def test_iter_lines(self, thread_per_pipe):
+        proc = spawn([PY, "-c", "print('a'); print('b')"], stdout=process.PIPE)
+        assert list(proc.iter_lines()) == [b"a", b"b"]
+        assert proc.wait() == 0
+
+
+class TestRelay:
+    """Tests for forwarding child output to parent fds."""
+
+    @pytest.mark.parametrize("use_splice", [True, False])
+    def test_relays_to_file_fd(self, tmp_path, use_splice):
+        out_path = tmp_path / "out.txt"
+        err_path = tmp_path / "err.txt"
+        with open(out_path, "wb") as out, open(err_path, "wb") as err:
+            with patch.object(process, "HAVE_SPLICE", use_splice and process.HAVE_SPLICE):
+                proc = process.CoreProcess(
+                    [PY, "-c", "import sys; sys.stdout.write('y' * 300000); sys.stderr.write('e')"],
+                    stdout=process.RELAY, stderr=process.RELAY,
+                    relay_fds=(out.fileno(), err.fileno()),
+                )
+                assert proc.wait() == 0
+        assert out_path.read_bytes() == b"y" * 300000
+        assert err_path.read_bytes() == b"e"
+        # Relayed output is never buffered in the parent
+        assert proc.stdout == b""
+
+    @pytest.mark.parametrize("use_splice,select_pipes", [(True, True), (False, True), (False, False)])
+    def test_closed_destination(self, use_splice, select_pipes):
+        """`capiscio ... | head`: the child still runs to completion and wait() reports EPIPE."""
+        read_end, write_end = os.pipe()
+        os.close(read_end)
+        try:
+            with patch.object(process, "HAVE_SPLICE", use_splice and process.HAVE_SPLICE), \
+                 patch.object(process, "HAVE_PIPE_SELECT", select_pipes):
+                proc = process.CoreProcess(
+                    [PY, "-c", "import sys; sys.stdout.write('y' * 300000)"],
+                    stdout=process.RELAY, relay_fds=(write_end, 2),
+                )
+                outcome = {}
+
+                def wait():
+                    try:
+                        proc.wait()
+                    except BrokenPipeError as e:
+                        outcome["error"] = e
+                waiter = threading.Thread(target=wait, daemon=True)
+                waiter.start()
+                waiter.join(10)
+        finally:
+            os.close(write_end)
+        assert not waiter.is_alive()
+        assert "error" in outcome
+        assert proc.returncode == 0
+
+    def test_stderr_pipe_rejected(self):
+        with pytest.raises(ValueError):
+            spawn([PY, "-c", "pass"], stderr=process.PIPE)
+
+
+class TestIterators:
+    """Tests for incremental consumption of PIPE'd stdout."""
+
+    def test_iter_lines_across_chunk_boundaries(self):
+        script = (
+            "import sys, time\n"
+            "sys.stdout.write('alpha\\nbe'); sys.stdout.flush(); time.sleep(0.05)\n"
+            "sys.stdout.write('ta\\n' + 'z' * 70000 + '\\ngamma')\n"
+        )
+        proc = spawn([PY, "-c", script], stdout=process.PIPE)
+        lines = list(proc.iter_lines())
+        assert proc.wait() == 0
+        assert lines == [b"alpha", b"beta", b"z" * 70000, b"gamma"]
+
+    def test_iter_records_ndjson(self):
+        script = "import json\nfor i in range(3): print(json.dumps({'i': i}))\nprint()"
+        proc = spawn([PY, "-c", script], stdout=process.PIPE)
+        assert [r["i"] for r in proc.iter_records()] == [0, 1, 2]
+        assert proc.wait() == 0
+
+    def test_overlong_line_raises(self):
+        proc = spawn([PY, "-c", "print('x' * 5000)"], stdout=process.PIPE, max_output=1000)
+        with pytest.raises(ValueError):
+            list(proc.iter_lines())
+        proc.wait()
+
+    def test_wait_discards_unconsumed_pipe(self):
+        proc = spawn([PY, "-c", "print('x' * 500000)"], stdout=process.PIPE)
+        assert proc.wait() == 0
+
+
+class TestTelemetry:
+    """Tests for child resource usage and trace output."""
+
+    BUSY = "import time\nbuf = bytearray(32 * 1024 * 1024)\nend = time.time() + 0.3\nwhile time.time() < end: pass"
+
+    @pytest.mark.skipif(not process.HAVE_WAIT4, reason="wait4 not available")
+    def test_rusage_is_recorded(self):
+        result = run([PY, "-c", self.BUSY])
+        usage = result.usage
+        assert usage.wall_ms >= 300
+        assert usage.user_ms + usage.sys_ms > 100
+        assert usage.max_rss_kb > 32 * 1024
+        assert set(usage.to_dict()) == {"wallMs", "userMs", "sysMs", "maxRssKb"}
+
+    @pytest.mark.skipif(not process.HAVE_PROC, reason="/proc not available")
+    def test_proc_sampling(self):
+        result = run([PY, "-c", self.BUSY], sample_interval=0.05)
+        samples = result.usage.samples
+        assert len(samples) >= 3
+        assert [s[0] for s in samples] == sorted(s[0] for s in samples)
+        assert max(s[1] for s in samples) > 32 * 1024
+
+    def test_popen_fallback_records_wall_time(self):
+        with patch.object(process, "HAVE_POSIX_SPAWN", False):
+            result = run([PY, "-c", "pass"])
+        assert result.usage.wall_ms > 0 and result.usage.user_ms is None
+
+    def test_trace_file(self, tmp_path, monkeypatch):
+        trace = tmp_path / "trace.ndjson"
+        monkeypatch.setenv(process.TRACE_ENV, str(trace))
+        run([PY, "-c", "import sys; sys.exit(2)"])
+        process.run_inherited([PY, "-c", "pass"])
+        records = [json.loads(line) for line in trace.read_text().splitlines()]
+        assert [r["exitCode"] for r in records] == [2, 0]
+        assert records[0]["argv"][1:] == ["-c", "import sys; sys.exit(2)"]
+        assert "wallMs" in records[1]["usage"]
+
+    def test_no_trace_by_default(self, monkeypatch, capsys):
+        monkeypatch.delenv(process.TRACE_ENV, raising=False)
+        run([PY, "-c", "pass"])
+        assert capsys.readouterr().err == ""
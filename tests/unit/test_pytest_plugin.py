@@ -0,0 +1,128 @@
+"""Tests for capiscio.pytest_plugin module."""
+import json
+import stat
+import sys
+import time
+import subprocess
+import multiprocessing
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+from capiscio.pytest_plugin import CapiscioRunner, file_lock, install_core
+
+FAKE_CORE = """#!{python}
+import json, sys
+with open({calls!r}, "a") as f:
+    f.write(" ".join(sys.argv[1:]) + "\\n")
+card = json.load(open(sys.argv[2]))
+ok = "name" in card
+print(json.dumps({{"success": ok, "errors": [] if ok else [{{"code": "MISSING_NAME", "message": "name is required"}}]}}))
+sys.exit(0 if ok else 1)
+"""
+
+
+@pytest.fixture
+def fake_core(tmp_path):
+    calls = tmp_path / "calls.txt"
+    binary = tmp_path / "capiscio-core"
+    binary.write_text(FAKE_CORE.format(python=sys.executable, calls=str(calls)))
+    binary.chmod(binary.stat().st_mode | stat.S_IEXEC)
+    return binary, calls
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="fake core is a shebang script")
+class TestCapiscioRunner:
+    def test_validate_file_and_cache_by_content(self, tmp_path, fake_core):
+        binary, calls = fake_core
+        runner = CapiscioRunner(binary, "1.0.0", tmp_path / "cache")
+        card = tmp_path / "card.json"
+        card.write_text(json.dumps({"name": "a"}))
+
+        first = runner.validate(card, "--schema-only")
+        second = runner.validate(card, "--schema-only")
+        assert first.success and first.exit_code == 0 and not first.cached
+        assert second.success and second.cached
+        assert calls.read_text().splitlines() == [f"validate {card} --schema-only --json"]
+
+        # Same content elsewhere is a cache hit; changed content or flags are not
+        copy = tmp_path / "copy.json"
+        copy.write_text(card.read_text())
+        assert runner.validate(copy, "--schema-only").cached
+        card.write_text(json.dumps({"name": "b"}))
+        assert not runner.validate(card, "--schema-only").cached
+        assert not runner.validate(card).cached
+
+    def test_validate_dict_reports_issues(self, tmp_path, fake_core):
+        binary, _ = fake_core
+        runner = CapiscioRunner(binary, "1.0.0", tmp_path / "cache")
+        result = runner.validate({"url": "https://example.com"})
+        assert not result.success
+        assert result.exit_code == 1
+        assert [i.code for i in result.errors] == ["MISSING_NAME"]
+
+    def test_no_cache(self, tmp_path, fake_core):
+        binary, calls = fake_core
+        runner = CapiscioRunner(binary, "1.0.0", None)
+        runner.validate({"name": "a"})
+        runner.validate({"name": "a"})
+        assert len(calls.read_text().splitlines()) == 2
+
+    def test_cache_key_includes_core_version(self, tmp_path, fake_core):
+        binary, calls = fake_core
+        CapiscioRunner(binary, "1.0.0", tmp_path / "cache").validate({"name": "a"})
+        assert not CapiscioRunner(binary, "1.1.0", tmp_path / "cache").validate({"name": "a"}).cached
+
+    def test_validate_many_keeps_order(self, tmp_path, fake_core):
+        binary, _ = fake_core
+        runner = CapiscioRunner(binary, "1.0.0", tmp_path / "cache")
+        cards = [{"name": str(i)} if i % 2 else {"id": i} for i in range(6)]
+        assert [r.success for r in runner.validate_many(cards, jobs=3)] == [bool(i % 2) for i in range(6)]
+
+    def test_non_json_output_falls_back_to_exit_code(self, tmp_path):
+        binary = tmp_path / "capiscio-core"
+        binary.write_text(f"#!{sys.executable}\nimport sys\nprint('boom', file=sys.stderr)\nsys.exit(2)\n")
+        binary.chmod(binary.stat().st_mode | stat.S_IEXEC)
+        result = CapiscioRunner(binary, "1.0.0").validate({"name": "a"})
+        assert not result.success and result.exit_code == 2
+        assert result.errors[0].message == "boom"
+
+
+def _hold_lock(path, out, hold):
+    with file_lock(Path(path)):
+        with open(out, "a") as f:
+            f.write(f"start {time.monotonic()}\n")
+        time.sleep(hold)
+        with open(out, "a") as f:
+            f.write(f"end {time.monotonic()}\n")
+
+
+class TestInstall:
+    def test_file_lock_serialises_processes(self, tmp_path):
+        out = tmp_path / "events.txt"
+        procs = [multiprocessing.Process(target=_hold_lock, args=(str(tmp_path / "x.lock"), str(out), 0.2))
+                 for _ in range(3)]
+        for p in procs:
+            p.start()
+        for p in procs:
+            p.join(10)
+        kinds = [line.split()[0] for line in out.read_text().splitlines()]
+        assert kinds == ["start", "end"] * 3
+
+    def test_plugin_import_is_light(self):
+        """The plugin loads in every pytest session, so it must not pull in the wrapper."""
+        script = (
+            "import sys, capiscio.pytest_plugin\n"
+            "heavy = {'requests', 'rich', 'capiscio.manager', 'capiscio.badges'} & set(sys.modules)\n"
+            "print(sorted(heavy))"
+        )
+        out = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, check=True).stdout
+        assert out.strip() == "[]"
+
+    def test_install_core_downloads_under_lock(self, tmp_path):
+        with patch('capiscio.manager.get_state_dir', return_value=tmp_path), \
+                patch('capiscio.manager.download_binary', return_value=tmp_path / "core") as mock_download:
+            assert install_core("1.0.0") == tmp_path / "core"
+        mock_download.assert_called_once_with("1.0.0")
+        assert (tmp_path / "install-1.0.0.lock").exists()
@@ -0,0 +1,108 @@
+"""Tests for capiscio.results module."""
+import io
+import json
+import sys
+import pytest
+
+from capiscio import process
+from capiscio.results import (
+    Issue,
+    TrustLevel,
+    ValidationResult,
+    iter_json_values,
+    iter_results,
+    iter_issues,
+    summarize,
+)
+
+
+class TestIterJsonValues:
+    """Tests for the incremental JSON stream decoder."""
+
+    def test_ndjson(self):
+        stream = io.BytesIO(b'{"a": 1}\n{"a": 2}\n\n{"a": 3}\n')
+        assert [v["a"] for v in iter_json_values(stream)] == [1, 2, 3]
+
+    def test_concatenated_pretty_printed(self):
+        docs = [{"n": i, "items": list(range(i))} for i in range(4)]
+        text = "".join(json.dumps(d, indent=2) for d in docs)
+        assert list(iter_json_values(io.StringIO(text))) == docs
+
+    def test_values_split_across_tiny_chunks(self):
+        data = json.dumps({"message": "héllo wörld", "n": 12345}).encode() * 3
+        chunks = [data[i:i + 3] for i in range(0, len(data), 3)]
+        assert [v["n"] for v in iter_json_values(chunks)] == [12345] * 3
+
+    def test_trailing_number_is_not_cut(self):
+        assert list(iter_json_values(["12", "34 5"])) == [1234, 5]
+
+    def test_malformed_input_raises(self):
+        with pytest.raises(json.JSONDecodeError):
+            list(iter_json_values(io.StringIO('{"a": 1}\n{"a": ')))
+
+    def test_document_size_limit(self):
+        with pytest.raises(ValueError):
+            list(iter_json_values(['{"a": "' + "x" * 100], max_document=50))
+
+
+class TestValidationResult:
+    """Tests for mapping core JSON onto the typed model."""
+
+    def test_core_report(self):
+        result = ValidationResult.from_dict({
+            "success": False,
+            "score": 42,
+            "trustLevel": "L2",
+            "errors": [{"code": "SCHEMA", "message": "missing name", "field": "name"}],
+            "warnings": ["no description"],
+        })
+        assert not result.success
+        assert result.score == 42.0
+        assert result.trust_level == TrustLevel(2)
+        assert result.errors == (Issue("error", "missing name", "SCHEMA", "name"),)
+        assert result.warnings == (Issue("warning", "no description"),)
+
+    def test_batch_record(self):
+        result = ValidationResult.from_dict({
+            "target": "a.json", "exitCode": 1, "cached": True, "result": None,
+        })
+        assert result.target == "a.json"
+        assert result.success is False
+        assert result.cached
+
+    def test_uses_slots(self):
+        result = ValidationResult.from_dict({"success": True})
+        assert not hasattr(result, "__dict__")
+        with pytest.raises((AttributeError, TypeError)):
+            result.extra = 1
+
+    def test_trust_level_ordering(self):
+        assert TrustLevel.parse({"level": 3, "name": "OV"}) > TrustLevel.parse("1")
+        assert TrustLevel.parse("bogus") is None
+
+
+class TestStreamingAggregation:
+    """Tests for filtering and aggregating without materialising reports."""
+
+    def test_summarize_and_filter(self):
+        def records():
+            for i in range(1000):
+                yield json.dumps({
+                    "target": f"card-{i}.json",
+                    "exitCode": i % 2,
+                    "result": {"success": i % 2 == 0, "errors": [{"code": "E1", "message": "x"}] * (i % 2)},
+                }) + "\n"
+
+        summary = summarize(iter_results(records()))
+        assert (summary.total, summary.passed, summary.failed) == (1000, 500, 500)
+        assert summary.issues_by_code["E1"] == 500
+
+        failing = {t for t, issue in iter_issues(iter_results(records())) if issue.code == "E1"}
+        assert len(failing) == 500
+
+    def test_parses_process_stream(self):
+        script = "import json\nfor i in range(3): print(json.dumps({'success': i != 1}, indent=1))"
+        proc = process.spawn([sys.executable, "-c", script], stdout=process.PIPE)
+        results = list(iter_results(proc.iter_chunks()))
+        assert proc.wait() == 0
+        assert [r.success for r in results] == [True, False, True]
@@ -0,0 +1,140 @@
+"""Tests for capiscio.sharding module."""
+import json
+import sqlite3
+import subprocess
+import sys
+from collections import Counter
+from pathlib import Path
+import pytest
+
+from capiscio.sharding import parse_shard, owner, select, merge
+from capiscio.store import ResultStore, run_results_cli
+
+SRC = str(Path(__file__).resolve().parents[2] / "src")
+
+# One "node": validates its shard of the corpus with a stubbed core and writes NDJSON
+NODE_SCRIPT = """
+import subprocess, sys
+from unittest.mock import patch
+sys.path.insert(0, {src!r})
+from capiscio.batch import run_batch_cli
+
+def fake_core(args):
+    return subprocess.CompletedProcess(args, 0, '{{"success": true}}', "")
+
+with patch("capiscio.batch.download_binary"), patch("capiscio.batch.run_core_captured", side_effect=fake_core):
+    sys.exit(run_batch_cli(["--shard", sys.argv[1], sys.argv[2], "--json"]))
+"""
+
+
+class TestShardAssignment:
+    """Tests for rendezvous hashing."""
+
+    @pytest.mark.parametrize("value", ["0/3", "4/3", "1", "a/b", "1/0"])
+    def test_invalid_shards(self, value):
+        with pytest.raises(ValueError):
+            parse_shard(value)
+
+    def test_every_key_has_exactly_one_owner(self):
+        keys = [f"cards/agent-{i}.json" for i in range(1000)]
+        shards = [select(keys, (i, 4)) for i in range(1, 5)]
+        assert sorted(k for s in shards for k in s) == sorted(keys)
+        # Roughly balanced
+        assert all(180 < len(s) < 320 for s in shards)
+
+    def test_resharding_moves_little_work(self):
+        keys = [f"agent-{i}" for i in range(2000)]
+        moved = sum(owner(k, 4) != owner(k, 5) for k in keys)
+        # Ideal is 1/5 of the keys; modulo hashing would move ~4/5
+        assert moved < 0.3 * len(keys)
+        # Keys that moved all went to the new shard
+        assert {owner(k, 5) for k in keys if owner(k, 4) != owner(k, 5)} == {5}
+
+    def test_select_preserves_order(self):
+        keys = [f"k{i}" for i in range(50)]
+        assert select(keys, (1, 1)) == keys
+        chosen = select(keys, (2, 3))
+        assert chosen == sorted(chosen, key=keys.index)
+
+
+class TestMerge:
+    """Tests for the k-way merge of per-shard outputs."""
+
+    def test_merges_ndjson_and_sqlite(self, tmp_path):
+        a = tmp_path / "a.ndjson"
+        a.write_text("\n".join(json.dumps({"agent": "x", "timestamp": t, "exitCode": 0, "result": {"success": True}})
+                               for t in (1, 4, 7)))
+        db = tmp_path / "b.db"
+        with ResultStore(db) as store:
+            for t in (2, 5, 8):
+                store.add("y", "fail", ts=t)
+        merged = list(merge([a, db]))
+        assert [r["timestamp"] for r in merged] == [1, 2, 4, 5, 7, 8]
+
+    def test_monitor_streams_merge_by_completion(self, tmp_path):
+        # Written as checks finished: start timestamps go backwards, finishedAt does not
+        a = tmp_path / "a.ndjson"
+        a.write_text("\n".join(json.dumps({"agent": n, "timestamp": t, "finishedAt": f, "exitCode": 0})
+                               for n, t, f in (("slow", 1, 9), ("fast", 5, 10))))
+        b = tmp_path / "b.ndjson"
+        b.write_text(json.dumps({"agent": "mid", "timestamp": 3, "finishedAt": 9.5, "exitCode": 0}))
+        assert [r["agent"] for r in merge([a, b])] == ["slow", "mid", "fast"]
+
+    def test_unsorted_input_rejected(self, tmp_path, capsys):
+        a = tmp_path / "a.ndjson"
+        a.write_text("\n".join(json.dumps({"agent": "x", "timestamp": t, "exitCode": 0}) for t in (5, 2)))
+        with pytest.raises(ValueError, match="not in time order"):
+            list(merge([a]))
+        assert run_results_cli(["merge", str(a), "-o", str(tmp_path / "out.ndjson")]) == 1
+        assert "not in time order" in capsys.readouterr().err
+
+    def test_database_inputs_are_opened_read_only(self, tmp_path):
+        db = tmp_path / "b.db"
+        with sqlite3.connect(db) as conn:
+            conn.execute("CREATE TABLE results (id INTEGER PRIMARY KEY, ts REAL, agent TEXT, kind TEXT, status TEXT,"
+                         " trust_level INTEGER, score REAL, exit_code INTEGER, error_count INTEGER, detail TEXT)")
+            conn.execute("INSERT INTO results (ts, agent, kind, status, error_count) VALUES (1, 'y', 'validate', 'pass', 0)")
+        conn.close()
+        before = db.read_bytes()
+        assert [r["agent"] for r in merge([db])] == ["y"]
+        assert db.read_bytes() == before
+        assert sorted(p.name for p in tmp_path.iterdir()) == ["b.db"]
+
+    def test_merge_cli_to_database(self, tmp_path):
+        a = tmp_path / "a.ndjson"
+        a.write_text(json.dumps({"agent": "x", "timestamp": 1, "exitCode": 1, "result": {"success": False}}))
+        out = tmp_path / "merged.db"
+        assert run_results_cli(["merge", str(a), "-o", str(out)]) == 0
+        with ResultStore(out) as store:
+            assert [r.status for r in store.query()] == ["fail"]
+
+
+class TestMultiProcessShards:
+    """Several local processes stand in for CI nodes."""
+
+    def test_shards_cover_corpus_and_merge(self, tmp_path):
+        cards = tmp_path / "cards"
+        cards.mkdir()
+        for i in range(40):
+            (cards / f"agent-{i:02d}.json").write_text(json.dumps({"name": f"agent-{i}"}))
+
+        count = 3
+        nodes = []
+        for i in range(1, count + 1):
+            out = open(tmp_path / f"shard-{i}.ndjson", "w")
+            nodes.append((subprocess.Popen(
+                [sys.executable, "-c", NODE_SCRIPT.format(src=SRC), f"{i}/{count}", str(cards)],
+                stdout=out, stderr=subprocess.PIPE, cwd=tmp_path,
+            ), out))
+        for proc, out in nodes:
+            _, err = proc.communicate(timeout=60)
+            out.close()
+            assert proc.returncode == 0, err.decode()
+
+        outputs = [tmp_path / f"shard-{i}.ndjson" for i in range(1, count + 1)]
+        per_shard = [len(p.read_text().splitlines()) for p in outputs]
+        assert all(n > 0 for n in per_shard)
+
+        merged = [r["target"] for r in merge(outputs)]
+        assert Counter(merged) == Counter(str(p) for p in cards.glob("*.json"))
+        assert merged == sorted(merged)
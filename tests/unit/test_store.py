@@ -0,0 +1,141 @@
+"""Tests for capiscio.store module."""
+import json
+import time
+import pytest
+
+from capiscio.results import ValidationResult
+from capiscio.store import ResultStore, parse_since, run_results_cli
+
+DAY = 86400.0
+NOW = 1_800_000_000.0
+
+
+@pytest.fixture
+def store(tmp_path):
+    s = ResultStore(tmp_path / "results.db", batch_size=100)
+    yield s
+    s.close()
+
+
+def _fill(store):
+    # Three agents over a week: "c" drops from L3 to L1 on the last day
+    for day in range(7):
+        ts = NOW - (7 - day) * DAY
+        store.add("a", "pass", ts=ts, trust_level=3)
+        store.add("b", "fail" if day == 6 else "pass", ts=ts, trust_level=2)
+        store.add("c", "pass", ts=ts, trust_level=1 if day == 6 else 3)
+
+
+class TestResultStore:
+    """Tests for batched writes and indexed queries."""
+
+    def test_uses_wal(self, store):
+        assert store._db.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+
+    def test_batches_are_flushed(self, store):
+        for i in range(250):
+            store.add(f"agent-{i}", "pass", ts=NOW)
+        # Two full batches written, the rest still pending until a query flushes
+        assert store._db.execute("SELECT COUNT(*) FROM results").fetchone()[0] == 200
+        assert len(list(store.query())) == 250
+
+    def test_slow_trickle_is_flushed_by_age(self, tmp_path):
+        with ResultStore(tmp_path / "r.db", batch_size=100, flush_interval=0.05) as store:
+            store.add("a", "pass", ts=NOW)
+            store.flush_if_due()
+            assert store._db.execute("SELECT COUNT(*) FROM results").fetchone()[0] == 0
+            time.sleep(0.06)
+            store.flush_if_due()
+            assert store._db.execute("SELECT COUNT(*) FROM results").fetchone()[0] == 1
+            time.sleep(0.06)
+            store.add("b", "pass", ts=NOW)
+            store.add("c", "pass", ts=NOW)
+            # "b" waited nothing yet when queued; the age runs from the oldest pending row
+            assert store._db.execute("SELECT COUNT(*) FROM results").fetchone()[0] == 1
+
+    def test_agents_below_trust_this_week(self, store):
+        _fill(store)
+        rows = list(store.query(since=NOW - 7 * DAY, below_trust=2, latest=True))
+        assert [r.agent for r in rows] == ["c"]
+
+    def test_latest_failing(self, store):
+        _fill(store)
+        assert [r.agent for r in store.query(status="fail", latest=True)] == ["b"]
+
+    def test_history_for_agent(self, store):
+        _fill(store)
+        rows = list(store.query(agent="a"))
+        assert len(rows) == 7
+        assert rows[0].ts > rows[-1].ts
+
+    def test_agent_query_uses_index(self, store):
+        plan = " ".join(
+            str(r) for r in store._db.execute(
+                "EXPLAIN QUERY PLAN SELECT * FROM results WHERE agent = ? ORDER BY ts DESC", ("a",)
+            )
+        )
+        assert "idx_results_agent_ts" in plan
+
+    def test_compaction_keeps_latest_per_agent(self, store):
+        _fill(store)
+        store.add("gone", "pass", ts=NOW - 30 * DAY)
+        removed = store.compact(NOW - 2 * DAY)
+        assert removed == 5 * 3
+        assert [r.agent for r in store.query(agent="gone")] == ["gone"]
+
+    def test_compaction_keeps_newest_row_not_last_inserted(self, store):
+        store.add("late", "pass", ts=NOW - 35 * DAY)
+        store.add("late", "fail", ts=NOW - 60 * DAY)  # backfilled from an older run
+        assert store.compact(NOW - 30 * DAY) == 1
+        kept = list(store.query(agent="late"))
+        assert [(r.ts, r.status) for r in kept] == [(NOW - 35 * DAY, "pass")]
+
+    def test_add_result_and_record(self, store):
+        store.add_result(ValidationResult.from_dict({"success": False, "trustLevel": 2, "errors": ["bad"]}),
+                         agent="x", ts=NOW)
+        store.add_record({"agent": "y", "target": "https://y", "exitCode": 0, "timestamp": NOW,
+                          "result": {"success": True}})
+        rows = {r.agent: r for r in store.query()}
+        assert rows["x"].status == "fail" and rows["x"].trust_level == 2 and rows["x"].error_count == 1
+        assert rows["y"].status == "pass" and rows["y"].exit_code == 0
+
+
+class TestParseSince:
+    def test_relative_and_absolute(self):
+        assert parse_since("7d", now=NOW) == NOW - 7 * DAY
+        assert parse_since("90m", now=NOW) == NOW - 5400
+        assert parse_since("1700000000") == 1700000000.0
+
+    def test_invalid(self):
+        with pytest.raises(ValueError, match="invalid time 'soon'"):
+            parse_since("soon")
+
+
+class TestResultsCLI:
+    """Tests for `capiscio results`."""
+
+    def test_import_then_query(self, tmp_path, capsys):
+        db = tmp_path / "r.db"
+        ndjson = tmp_path / "run.ndjson"
+        ndjson.write_text("\n".join(json.dumps(r) for r in [
+            {"agent": "a", "exitCode": 0, "timestamp": NOW, "result": {"success": True, "trustLevel": 3}},
+            {"agent": "b", "exitCode": 1, "timestamp": NOW, "result": {"success": False, "trustLevel": 1}},
+        ]))
+        assert run_results_cli(["--db", str(db), "import", str(ndjson)]) == 0
+        assert run_results_cli(["--db", str(db), "query", "--below-trust", "2", "--json"]) == 0
+        out = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+        assert [r["agent"] for r in out] == ["b"]
+
+    @pytest.mark.parametrize("args", [
+        ["query", "--since", "soon"],
+        ["query", "--until", "tomorrow"],
+        ["compact", "--older-than", "a month"],
+    ])
+    def test_invalid_times_are_reported(self, tmp_path, capsys, args):
+        assert run_results_cli(["--db", str(tmp_path / "r.db")] + args) == 1
+        assert capsys.readouterr().err.startswith("Error: invalid time")
+
+    def test_missing_import_file_is_reported(self, tmp_path, capsys):
+        assert run_results_cli(["--db", str(tmp_path / "r.db"), "import", str(tmp_path / "nope.ndjson")]) == 1
+        err = capsys.readouterr().err
+        assert err.startswith("Error: ") and "nope.ndjson" in err
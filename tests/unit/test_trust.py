@@ -0,0 +1,260 @@
+"""Tests for capiscio.trust module."""
+import json
+import base64
+import subprocess
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+import pytest
+import requests
+from requests.adapters import HTTPAdapter
+
+from capiscio.badges import verify_badge
+from capiscio.trust import ANCHORS_ENV, MAX_STALE, TrustKeyCache, load_anchors, parse_anchors, token_header
+
+ISSUER = "https://issuer.test"
+JWKS = ISSUER + "/.well-known/jwks.json"
+ATTACKER = "https://attacker.test"
+
+KEYS = {"keys": [
+    {"kty": "OKP", "crv": "Ed25519", "kid": "k1", "x": "11qYAYKxCrfVS_7TyWQHOg7hcvPapiMlrwIaaPcHURo"},
+    {"kty": "OKP", "crv": "Ed25519", "kid": "k2", "x": "3p7bfXt9wbTTW2HC7OQ1Nz-DQ8hbeGdNrfx-FG-IK08"},
+]}
+
+
+class _KeyServer(BaseHTTPRequestHandler):
+    """Issuer stand-in serving a JWKS with max-age and an ETag."""
+
+    status = 200
+    etag = '"keys-v1"'
+    max_age = 100
+    requests = []
+
+    def do_GET(self):
+        type(self).requests.append((self.path, self.headers.get("If-None-Match")))
+        if self.status != 200:
+            self.send_response(self.status)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        if self.headers.get("If-None-Match") == self.etag:
+            self.send_response(304)
+            self.send_header("Cache-Control", f"max-age={self.max_age}")
+            self.end_headers()
+            return
+        body = json.dumps(KEYS).encode()
+        self.send_response(200)
+        self.send_header("ETag", self.etag)
+        self.send_header("Cache-Control", f"max-age={self.max_age}")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class _Loopback(HTTPAdapter):
+    """Sends requests for an https:// origin to a local plain-HTTP stand-in (anchors must be HTTPS)."""
+
+    def __init__(self, origin: str, local: str):
+        super().__init__()
+        self.origin, self.local = origin, local
+
+    def send(self, request, **kwargs):
+        request.url = self.local + request.url[len(self.origin):]
+        return super().send(request, **kwargs)
+
+
+def _serve():
+    handler = type("Handler", (_KeyServer,), {"requests": []})
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=httpd.serve_forever, args=(0.05,), daemon=True).start()
+    return f"http://127.0.0.1:{httpd.server_address[1]}", handler, httpd
+
+
+@pytest.fixture
+def session():
+    return requests.Session()
+
+
+@pytest.fixture
+def issuer(session):
+    local, handler, httpd = _serve()
+    session.mount(ISSUER, _Loopback(ISSUER, local))
+    yield ISSUER, handler, httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+@pytest.fixture
+def attacker(session):
+    """A key server for an issuer nobody configured, as named by a forged token's iss."""
+    local, handler, httpd = _serve()
+    session.mount(ATTACKER, _Loopback(ATTACKER, local))
+    yield ATTACKER, handler
+    httpd.shutdown()
+    httpd.server_close()
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return _Clock()
+
+
+def _token(header, **claims):
+    def part(data):
+        return base64.urlsafe_b64encode(json.dumps(data).encode()).rstrip(b"=").decode()
+    return f"{part(header)}.{part(claims)}.c2ln"
+
+
+@pytest.fixture
+def make_cache(session):
+    def make(tmp_path, clock, **kwargs):
+        kwargs.setdefault("anchors", {ISSUER: JWKS})
+        return TrustKeyCache(tmp_path / "trust", session=session, clock=clock, background=False, **kwargs)
+    return make
+
+
+class TestHelpers:
+    def test_anchors_must_use_https(self):
+        assert parse_anchors({ISSUER: JWKS}) == {ISSUER: JWKS}
+        with pytest.raises(ValueError, match="https://"):
+            parse_anchors({ISSUER: "http://issuer.test/.well-known/jwks.json"})
+
+    def test_anchors_from_env(self, tmp_path, monkeypatch):
+        monkeypatch.delenv(ANCHORS_ENV, raising=False)
+        assert load_anchors() == {}
+        monkeypatch.setenv(ANCHORS_ENV, json.dumps({ISSUER: JWKS}))
+        assert load_anchors() == {ISSUER: JWKS}
+        path = tmp_path / "anchors.json"
+        path.write_text(json.dumps({ISSUER: JWKS}))
+        monkeypatch.setenv(ANCHORS_ENV, str(path))
+        assert load_anchors() == {ISSUER: JWKS}
+        monkeypatch.setenv(ANCHORS_ENV, "[]")
+        with pytest.raises(ValueError):
+            load_anchors()
+
+    def test_token_header(self):
+        assert token_header(_token({"alg": "EdDSA", "kid": "k1"})) == {"alg": "EdDSA", "kid": "k1"}
+        assert token_header("garbage") == {}
+
+
+class TestTrustKeyCache:
+    def test_fresh_keys_served_from_memory_and_disk(self, make_cache, tmp_path, clock, issuer):
+        url, handler, _ = issuer
+        keyset = make_cache(tmp_path, clock).get(url)
+        assert [k["kid"] for k in keyset.keys] == ["k1", "k2"]
+        assert keyset.expires_at == clock.now + 100
+
+        cache = make_cache(tmp_path, clock)
+        clock.now += 50
+        assert cache.get(url).etag == '"keys-v1"'
+        assert cache.get(url).keys == keyset.keys
+        assert len(handler.requests) == 1
+
+    def test_refresh_before_expiry_revalidates(self, make_cache, tmp_path, clock, issuer):
+        url, handler, _ = issuer
+        cache = make_cache(tmp_path, clock)
+        cache.get(url)
+        clock.now += 85
+        assert cache.get(url).fetched_at == 1000.0  # the cached copy is returned right away...
+        assert handler.requests[-1] == ("/.well-known/jwks.json", '"keys-v1"')
+        assert cache.get(url).expires_at == clock.now + 100  # ...and replaced by the revalidated one
+
+    def test_background_refresh(self, session, tmp_path, clock, issuer):
+        url, handler, _ = issuer
+        cache = TrustKeyCache(tmp_path / "trust", session=session, anchors={ISSUER: JWKS}, clock=clock)
+        cache.get(url)
+        clock.now += 85
+        cache.get(url)
+        for _ in range(100):
+            if len(handler.requests) == 2 and not cache._refreshing:
+                break
+            threading.Event().wait(0.02)
+        assert cache.get(url).fetched_at == clock.now
+
+    def test_expired_keys_used_while_issuer_unreachable(self, make_cache, tmp_path, clock, issuer):
+        url, handler, httpd = issuer
+        cache = make_cache(tmp_path, clock)
+        cache.get(url)
+        handler.status = 503
+        clock.now += 200
+        assert cache.get(url).fetched_at == 1000.0
+        clock.now += MAX_STALE
+        assert cache.get(url) is None
+
+    def test_offline_never_fetches(self, make_cache, tmp_path, clock, issuer, monkeypatch):
+        url, handler, _ = issuer
+        make_cache(tmp_path, clock).get(url)
+        monkeypatch.setenv("CAPISCIO_OFFLINE", "1")
+        clock.now += 500
+        assert make_cache(tmp_path, clock).get(url) is not None
+        assert make_cache(tmp_path, clock).get(url + "/other") is None
+        assert len(handler.requests) == 1
+
+    def test_failed_lookup_is_not_retried_immediately(self, make_cache, tmp_path, clock, issuer):
+        url, handler, _ = issuer
+        handler.status = 404
+        cache = make_cache(tmp_path, clock)
+        assert cache.get(url) is None
+        assert cache.get(url) is None
+        assert len(handler.requests) == 1
+
+    def test_key_file_by_kid(self, make_cache, tmp_path, clock, issuer):
+        url, _, _ = issuer
+        cache = make_cache(tmp_path, clock)
+        path = cache.key_file(_token({"alg": "EdDSA", "kid": "k2"}, iss=url))
+        assert json.loads(path.read_text())["kid"] == "k2"
+        assert cache.key_file(_token({"alg": "EdDSA", "kid": "nope"}, iss=url)) is None
+        assert cache.key_file(_token({"alg": "EdDSA"}, iss=url)) is None  # ambiguous without kid
+        assert cache.key_file(_token({"alg": "EdDSA"}, iss="did:key:z6Mk")) is None
+
+    def test_key_set_cached_for_another_anchor_is_ignored(self, make_cache, tmp_path, clock, issuer):
+        make_cache(tmp_path, clock).get(ISSUER)
+        moved = make_cache(tmp_path, clock, anchors={ISSUER: ISSUER + "/keys.json"})
+        assert moved._load(ISSUER) is None
+
+
+class TestVerifyWithCachedKeys:
+    def _verify(self, token, cache, **kwargs):
+        calls = []
+
+        def core(args):
+            calls.append(args)
+            return subprocess.CompletedProcess(args, 0, "", "")
+
+        with patch("capiscio.badges.run_core_captured", side_effect=core):
+            assert verify_badge(token, use_cache=False, trust=cache, **kwargs).valid
+        return calls[0]
+
+    def test_core_gets_key_and_offline(self, make_cache, tmp_path, clock, issuer):
+        url, _, _ = issuer
+        cache = make_cache(tmp_path, clock)
+        args = self._verify(_token({"alg": "EdDSA", "kid": "k1"}, iss=url), cache, audience="https://api")
+        assert args[:5] == ["badge", "verify", args[2], "--audience", "https://api"]
+        assert args[5] == "--key" and json.loads(open(args[6]).read())["kid"] == "k1"
+        assert args[7:] == ["--offline"]
+
+    def test_unresolvable_issuer_falls_back_to_online(self, make_cache, tmp_path, clock):
+        args = self._verify(_token({"alg": "EdDSA"}, iss="did:key:z6Mk"), make_cache(tmp_path, clock),
+                            accept_self_signed=True)
+        assert args[3:] == ["--accept-self-signed"]
+
+    def test_forged_issuer_never_gets_a_key(self, make_cache, tmp_path, clock, issuer, attacker):
+        """A token naming an attacker's issuer must not make us fetch and trust the attacker's keys."""
+        attacker_url, attacker_handler = attacker
+        forged = _token({"alg": "EdDSA", "kid": "k1"}, iss=attacker_url)
+        cache = make_cache(tmp_path, clock)
+        assert cache.key_file(forged) is None
+        args = self._verify(forged, cache)
+        assert "--key" not in args and "--offline" not in args
+        assert attacker_handler.requests == []
@@ -0,0 +1,169 @@
+"""Tests for capiscio.watch module."""
+import json
+import subprocess
+import sys
+import threading
+import time
+from unittest.mock import patch
+import pytest
+
+from capiscio.batch import CardResult
+from capiscio.watch import PollingWatcher, InotifyWatcher, Watcher, collect, run_watch_cli
+
+
+def _completed(returncode=0, stdout="ok\n"):
+    return subprocess.CompletedProcess(args=[], returncode=returncode, stdout=stdout, stderr="")
+
+
+@pytest.fixture
+def card_dir(tmp_path):
+    card = tmp_path / "agent-card.json"
+    card.write_text(json.dumps({"name": "agent"}))
+    return tmp_path, card
+
+
+def _inotify_or_skip(targets):
+    try:
+        return InotifyWatcher(targets)
+    except OSError:
+        pytest.skip("inotify not available")
+
+
+class TestPollingWatcher:
+    """Tests for the stat-polling fallback."""
+
+    def test_detects_modification(self, card_dir):
+        root, card = card_dir
+        watcher = PollingWatcher([str(root)], interval=0.01)
+        card.write_text(json.dumps({"name": "a much longer agent name"}))
+        assert watcher.read(0.5) == {str(card)}
+
+    def test_times_out_without_changes(self, card_dir):
+        root, _ = card_dir
+        watcher = PollingWatcher([str(root)], interval=0.01)
+        assert watcher.read(0.05) == set()
+
+
+@pytest.mark.skipif(not sys.platform.startswith("linux"), reason="inotify is Linux-only")
+class TestInotifyWatcher:
+    """Tests for the inotify-backed watcher."""
+
+    def test_detects_write_in_directory(self, card_dir):
+        root, card = card_dir
+        watcher = _inotify_or_skip([str(root)])
+        try:
+            card.write_text("{}")
+            assert str(card) in watcher.read(1.0)
+        finally:
+            watcher.close()
+
+    def test_ignores_unrelated_files(self, card_dir):
+        root, _ = card_dir
+        watcher = _inotify_or_skip([str(root)])
+        try:
+            (root / "notes.txt").write_text("x")
+            assert watcher.read(0.1) == set()
+        finally:
+            watcher.close()
+
+    def test_watches_new_subdirectories(self, card_dir):
+        root, _ = card_dir
+        watcher = _inotify_or_skip([str(root)])
+        try:
+            sub = root / "nested"
+            sub.mkdir()
+            watcher.read(0.2)
+            (sub / "card.json").write_text("{}")
+            assert str(sub / "card.json") in watcher.read(1.0)
+        finally:
+            watcher.close()
+
+    def test_atomic_rename_of_single_file_target(self, card_dir):
+        root, card = card_dir
+        watcher = _inotify_or_skip([str(card)])
+        try:
+            tmp = root / ".agent-card.json.swp"
+            tmp.write_text("{}")
+            tmp.replace(card)
+            assert watcher.read(1.0) == {str(card)}
+        finally:
+            watcher.close()
+
+
+class TestCollect:
+    """Tests for debouncing bursts of events."""
+
+    def test_coalesces_burst_into_one_batch(self, card_dir):
+        root, card = card_dir
+        other = root / "other.json"
+        watcher = PollingWatcher([str(root)], interval=0.01)
+
+        def burst():
+            card.write_text('{"v": 1111}')
+            time.sleep(0.03)
+            other.write_text("{}")
+
+        threading.Thread(target=burst).start()
+        changed = collect(watcher, debounce=0.2, max_delay=1.0)
+        assert changed == {str(card), str(other)}
+
+
+class TestWatcherDeltas:
+    """Tests for result delta tracking."""
+
+    @patch('capiscio.watch.validate_card')
+    def test_unchanged_content_is_not_revalidated(self, mock_validate, card_dir):
+        _, card = card_dir
+        mock_validate.side_effect = lambda target, args: CardResult(target, 0, "ok\n", "")
+        session = Watcher([], jobs=1)
+        try:
+            assert len(session.validate([str(card)])) == 1
+            assert session.validate([str(card)]) == []
+            assert mock_validate.call_count == 1
+        finally:
+            session.close()
+
+    @patch('capiscio.watch.validate_card')
+    def test_reports_transition_and_removal(self, mock_validate, card_dir):
+        _, card = card_dir
+        session = Watcher([], jobs=1)
+        try:
+            mock_validate.side_effect = lambda target, args: CardResult(target, 0, "ok\n", "")
+            session.validate([str(card)])
+
+            card.write_text('{"broken": true}')
+            mock_validate.side_effect = lambda target, args: CardResult(target, 1, "FAIL\n", "")
+            [(path, previous, current)] = session.validate([str(card)])
+            assert previous.returncode == 0 and current.returncode == 1
+
+            card.unlink()
+            [(path, previous, current)] = session.validate([str(card)])
+            assert current is None
+        finally:
+            session.close()
+
+
+class TestWatchCli:
+    """Tests for argument handling in `capiscio watch`."""
+
+    @pytest.mark.parametrize("debounce", [["--debounce"], ["--debounce", "fast"], ["--debounce", "-5"]])
+    @patch('capiscio.watch.watch')
+    def test_bad_debounce_is_rejected(self, mock_watch, card_dir, capsys, debounce):
+        _, card = card_dir
+        assert run_watch_cli([str(card)] + debounce) == 1
+        mock_watch.assert_not_called()
+        assert "--debounce expects milliseconds" in capsys.readouterr().err
+
+    @patch('capiscio.watch.watch', return_value=0)
+    def test_debounce_in_milliseconds(self, mock_watch, card_dir):
+        _, card = card_dir
+        assert run_watch_cli(["--debounce", "500", str(card)]) == 0
+        assert mock_watch.call_args.kwargs["debounce"] == 0.5
+
+    @patch('capiscio.watch.download_binary')
+    def test_remote_targets_are_rejected(self, mock_download, card_dir, capsys):
+        _, card = card_dir
+        assert run_watch_cli([str(card), "https://agent.example.com"]) == 1
+        mock_download.assert_not_called()
+        err = capsys.readouterr().err
+        assert "capiscio monitor" in err and "https://agent.example.com" in err